@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, Callable, Optional
+
+from pymongo import ReturnDocument
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    # Refills `rate` tokens per second up to `capacity`; acquire() waits for a token
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1):
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+    def drain(self, seconds: float):
+        # Called when upstream says we are over the limit regardless of our own count
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def is_retryable(error: Exception) -> bool:
+    # Only reached after an AI call failed, so the SDK is loaded by then anyway
+    import groq
+
+    if isinstance(error, (groq.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # Full jitter: uniform in [0, min(cap, base * 2^(attempt-1))]
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class AIJobQueue:
+    # Jobs live in MongoDB so any worker process can claim them. A claim is a
+    # lease: a job whose worker dies is picked up again once the lease lapses.
+    # Each claim gets a fresh lease token, and results are only written under
+    # it, so a worker whose lease lapsed can't overwrite the one that took over.
+    def __init__(
+        self,
+        handler: Callable[[str, str], Awaitable[str]],
+        workers: int = 2,
+        max_attempts: int = 5,
+        lease_seconds: float = 120,
+        poll_interval: float = 1.0,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.collection = None
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._reaped_at = 0.0
+
+    def start(self, collection, consume: bool = True):
+        # consume=False still serves submit/get, e.g. on a process without an AI client
+        self.collection = collection
+        if consume:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, user_id: str, task: str, text: str) -> dict:
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "task": task,
+            "text": text,
+            "status": "queued",
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "run_after": now,
+            "lease_until": None,
+            "lease_token": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+        await self.collection.insert_one(dict(job))
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str, user_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id, "user_id": user_id}, {"_id": 0, "text": 0})
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_after": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$lt": self.max_attempts}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "lease_token": str(uuid.uuid4()),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_after", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fail_expired(self) -> int:
+        # A lease that lapses on the last attempt can't be claimed again; without
+        # this the job would stay `running` (and out of the TTL index) forever
+        now = datetime.now(timezone.utc)
+        result = await self.collection.update_many(
+            {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {
+                "status": "failed",
+                "error": f"Worker lease expired on attempt {self.max_attempts}",
+                "lease_until": None,
+                "lease_token": None,
+                "updated_at": now,
+                "finished_at": now,
+            }},
+        )
+        return result.modified_count
+
+    async def _finish(self, job: dict, update: dict) -> bool:
+        now = datetime.now(timezone.utc)
+        result = await self.collection.update_one(
+            {"id": job["id"], "status": "running", "lease_token": job.get("lease_token")},
+            {"$set": {**update, "lease_until": None, "lease_token": None, "updated_at": now}},
+        )
+        if not result.matched_count:
+            logger.warning(f"AI job {job['id']} attempt {job['attempts']} lost its lease; discarding its outcome")
+        return bool(result.matched_count)
+
+    async def run_job(self, job: dict):
+        try:
+            result = await self.handler(job["task"], job["text"])
+        except Exception as e:
+            retry_after = retry_after_seconds(e)
+            if is_retryable(e) and job["attempts"] < self.max_attempts:
+                delay = max(retry_after or 0, backoff_delay(job["attempts"], self.backoff_base, self.backoff_cap))
+                logger.warning(f"AI job {job['id']} attempt {job['attempts']} failed ({e}); retrying in {delay:.1f}s")
+                await self._finish(job, {
+                    "status": "queued",
+                    "error": str(e),
+                    "run_after": datetime.now(timezone.utc) + timedelta(seconds=delay),
+                })
+            else:
+                await self._finish(job, {"status": "failed", "error": str(e), "finished_at": datetime.now(timezone.utc)})
+            return
+        await self._finish(job, {"status": "succeeded", "result": result, "error": None, "finished_at": datetime.now(timezone.utc)})
+
+    async def _work(self):
+        while True:
+            try:
+                if time.monotonic() - self._reaped_at >= self.poll_interval:
+                    self._reaped_at = time.monotonic()
+                    await self.fail_expired()
+                job = await self.claim()
+            except Exception as e:
+                logger.error(f"AI job claim failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            try:
+                await self.run_job(job)
+            except Exception as e:
+                # Usually a failed write of the outcome; the lease lapses and the job is retried
+                logger.error(f"AI job {job['id']} failed to record its outcome: {e}")
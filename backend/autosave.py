@@ -0,0 +1,110 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+
+class TextOpError(ValueError):
+    pass
+
+
+def apply_text_op(content: str, word_count: int, offset: int, delete: int, insert: str) -> Tuple[str, int]:
+    # Offsets count Unicode code points, matching Python string indexing
+    if offset < 0 or delete < 0 or offset + delete > len(content):
+        raise TextOpError(f"Op at offset {offset} deleting {delete} falls outside the {len(content)}-character text")
+    # Widen the edited span to whitespace boundaries so only the words touching it are recounted
+    start = offset
+    while start > 0 and not content[start - 1].isspace():
+        start -= 1
+    end = offset + delete
+    while end < len(content) and not content[end].isspace():
+        end += 1
+    old_span = content[start:end]
+    new_span = content[start:offset] + insert + content[offset + delete:end]
+    word_count += len(new_span.split()) - len(old_span.split())
+    return content[:offset] + insert + content[offset + delete:], word_count
+
+
+class PatchCoalescer:
+    # Serializes patches per key. A patch for an idle key is written right away;
+    # patches that arrive while that write is in flight, or within `delay`
+    # seconds after it, are applied in order to one loaded document and
+    # persisted with a single write.
+    #   load(key) -> current document or None
+    #   apply(doc, patch) -> patched copy of doc (raises to reject that patch only)
+    #   store(key, base, doc) -> False if `base` was changed underneath us
+    def __init__(
+        self,
+        load: Callable[[Hashable], Awaitable[Optional[dict]]],
+        apply: Callable[[Optional[dict], object], dict],
+        store: Callable[[Hashable, dict, dict], Awaitable[bool]],
+        delay: float = 0.2,
+        max_conflict_retries: int = 3,
+    ):
+        self.load = load
+        self.apply = apply
+        self.store = store
+        self.delay = delay
+        self.max_conflict_retries = max_conflict_retries
+        self._queues: Dict[Hashable, List[Tuple[object, asyncio.Future]]] = {}
+        # Strong references: the loop only keeps weak ones to running tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self.writes = 0
+        self.patches = 0
+
+    async def submit(self, key: Hashable, patch) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = []
+            task = asyncio.create_task(self._drain(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        queue.append((patch, future))
+        return await future
+
+    async def close(self):
+        # Lets open batches finish; each one waits at most `delay` plus its write
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _drain(self, key: Hashable):
+        try:
+            while True:
+                batch = self._queues[key]
+                if not batch and self.delay:
+                    # Keep the batch open for a burst of keystrokes
+                    await asyncio.sleep(self.delay)
+                    batch = self._queues[key]
+                if not batch:
+                    break
+                self._queues[key] = []
+                await self._commit(key, batch)
+        finally:
+            self._queues.pop(key, None)
+
+    async def _commit(self, key: Hashable, batch: List[Tuple[object, asyncio.Future]]):
+        try:
+            for _ in range(self.max_conflict_retries + 1):
+                base = await self.load(key)
+                doc, outcomes = base, []
+                for patch, _future in batch:
+                    try:
+                        doc = self.apply(doc, patch)
+                        outcomes.append((doc, None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+                if doc is base or await self.store(key, base, doc):
+                    break
+            else:
+                raise RuntimeError("Document kept changing while applying patches")
+        except Exception as e:
+            outcomes = [(None, e)] * len(batch)
+        else:
+            self.writes += doc is not base
+            self.patches += len(batch)
+
+        for (_patch, future), (result, error) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import zipfile
+import zlib
+from typing import AsyncIterator, Iterable, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+CHUNK_BYTES = 64 * 1024
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def dump_line(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record, default=str) + b"\n"
+    return json.dumps(record, ensure_ascii=False, default=str).encode() + b"\n"
+
+
+async def ndjson_chunks(records: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    # Group lines into ~64 KiB chunks so the response isn't one write per document
+    buffer, size = [], 0
+    async for record in records:
+        line = dump_line(record)
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ChunkSink:
+    # Write-only, unseekable file object: zipfile then writes data descriptors
+    # and we hand each compressed piece to the response as soon as it exists
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def zip_chunks(members: Iterable[Tuple[str, AsyncIterator[bytes]]]) -> AsyncIterator[bytes]:
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in members:
+            with archive.open(name, "w", force_zip64=True) as member:
+                async for chunk in chunks:
+                    member.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    yield sink.drain()
+
+
+async def inflate_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # Accepts gzip or zlib framing; output is bounded per step so a small,
+    # highly compressed upload can't expand into one huge buffer
+    decompressor = zlib.decompressobj(47)
+    try:
+        async for chunk in chunks:
+            data = decompressor.decompress(chunk, CHUNK_BYTES)
+            while data:
+                yield data
+                data = decompressor.decompress(decompressor.unconsumed_tail, CHUNK_BYTES)
+        data = decompressor.flush()
+    except zlib.error as e:
+        raise ImportFormatError(f"Upload is not valid gzip: {e}")
+    if data:
+        yield data
+
+
+async def zip_member_chunks(archive: zipfile.ZipFile, name: str) -> AsyncIterator[bytes]:
+    with archive.open(name) as member:
+        while True:
+            data = await asyncio.to_thread(member.read, CHUNK_BYTES)
+            if not data:
+                return
+            yield data
+
+
+async def ndjson_records(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: int,
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    # Yields (line number, record, error) as lines complete; blank lines are skipped
+    pending = b""
+    line_number = 0
+
+    def parse(line: bytes):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            return None, f"line {line_number}: invalid JSON ({e})"
+        if not isinstance(record, dict):
+            return None, f"line {line_number}: expected a JSON object"
+        return record, None
+
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        if len(pending) > max_line_bytes:
+            raise ImportFormatError(f"Line {line_number + len(lines) + 1} is longer than {max_line_bytes} bytes")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield (line_number, *parse(line))
+    if pending.strip():
+        line_number += 1
+        yield (line_number, *parse(pending))
@@ -0,0 +1,394 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+
+# Runs the app in-process (no uvicorn, no network) against a throwaway MongoDB
+# database or mongomock, with the fake Groq client, seeds realistic data and
+# reports per-route latency percentiles and throughput as JSON:
+#
+#   python benchmark.py --entries 10000 --requests 1000 --concurrency 32 > run.json
+#   python benchmark.py --mongomock --scenarios entries.list,stats.yearly
+#   python benchmark.py --compare run.json
+#
+# Numbers from mongomock only say something about the Python side; use a real
+# MongoDB for anything involving queries.
+
+WORDS = (
+    "today morning evening walk work friend family coffee rain sun tired happy "
+    "meeting project idea book read wrote call dinner lunch gym run music movie "
+    "plan week weekend travel city home garden cook learn class talk quiet busy "
+    "grateful worried excited calm late early long short good hard small new"
+).split()
+MOODS = ["happy", "sad", "neutral", "excited", "anxious", "calm", None]
+
+SEED_BATCH_SIZE = 1000
+
+logger = logging.getLogger("benchmark")
+
+
+def paragraph(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    # Nearest-rank on an already sorted list
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchUser:
+    def __init__(self, email: str, password: str):
+        self.email = email
+        self.password = password
+        self.id = None
+        self.headers = {}
+        self.entry_ids: List[str] = []
+        self.cursor = None
+
+
+async def seed_user(server, http: httpx.AsyncClient, index: int, args, rng: random.Random) -> BenchUser:
+    user = BenchUser(f"bench{index}@example.com", "bench-password")
+    response = await http.post("/api/auth/register", json={"email": user.email, "password": user.password, "name": f"Bench {index}"})
+    response.raise_for_status()
+    body = response.json()
+    user.id = body["user"]["id"]
+    user.headers = {"Authorization": f"Bearer {body['access_token']}"}
+
+    # Written straight to the database: going through the API would take
+    # minutes at 100k entries and would date everything today
+    today = datetime.now(timezone.utc)
+    entries = []
+    for i in range(args.entries):
+        doc = server.new_entry_doc(user.id, server.EntryCreate(
+            title=paragraph(rng, 2, 6),
+            content=paragraph(rng, 50, 400),
+            mood=rng.choice(MOODS),
+        ))
+        written = today - timedelta(days=rng.randint(0, args.days), seconds=rng.randint(0, 86399))
+        doc.update(date=written.date().isoformat(), created_at=written.isoformat(), updated_at=written.isoformat())
+        entries.append(doc)
+        user.entry_ids.append(doc["id"])
+        if len(entries) >= SEED_BATCH_SIZE:
+            await server.db.entries.insert_many(entries)
+            entries = []
+    if entries:
+        await server.db.entries.insert_many(entries)
+
+    todos = []
+    for i in range(args.entries // 5):
+        doc = server.new_todo_doc(user.id, server.TodoCreate(
+            text=paragraph(rng, 3, 10),
+            due_date=(today + timedelta(days=rng.randint(-30, 60))).date().isoformat() if rng.random() < 0.5 else None,
+            source_entry_id=rng.choice(user.entry_ids) if user.entry_ids and rng.random() < 0.3 else None,
+        ))
+        doc["completed"] = rng.random() < 0.6
+        todos.append(doc)
+    reminders = []
+    for i in range(args.entries // 10):
+        remind_at = today + timedelta(days=rng.randint(-60, 60), minutes=rng.randint(0, 1439))
+        reminders.append(server.new_reminder_doc(user.id, server.ReminderCreate(
+            text=paragraph(rng, 3, 10),
+            reminder_date=remind_at.isoformat(),
+        )))
+    for collection, docs in (("todos", todos), ("reminders", reminders)):
+        for start in range(0, len(docs), SEED_BATCH_SIZE):
+            await server.db[collection].insert_many(docs[start:start + SEED_BATCH_SIZE])
+
+    await server.rebuild_rollups(user.id)
+    return user
+
+
+def build_scenarios(mongomock: bool) -> Dict[str, Callable[[httpx.AsyncClient, BenchUser, int, random.Random], Awaitable[httpx.Response]]]:
+    today = date.today()
+
+    async def auth_login(http, user, n, rng):
+        return await http.post("/api/auth/login", json={"email": user.email, "password": user.password})
+
+    async def auth_me(http, user, n, rng):
+        return await http.get("/api/auth/me", headers=user.headers)
+
+    async def entries_list(http, user, n, rng):
+        return await http.get("/api/entries", params={"limit": 20}, headers=user.headers)
+
+    async def entries_preview(http, user, n, rng):
+        return await http.get("/api/entries", params={"limit": 50, "fields": "preview"}, headers=user.headers)
+
+    async def entries_page(http, user, n, rng):
+        # Each user walks its own cursor chain and starts over at the end
+        params = {"limit": 50}
+        if user.cursor:
+            params["cursor"] = user.cursor
+        response = await http.get("/api/entries", params=params, headers=user.headers)
+        user.cursor = response.headers.get("X-Next-Cursor")
+        return response
+
+    async def entries_get(http, user, n, rng):
+        return await http.get(f"/api/entries/{rng.choice(user.entry_ids)}", headers=user.headers)
+
+    async def entries_search(http, user, n, rng):
+        return await http.get("/api/entries/search", params={"q": rng.choice(WORDS)}, headers=user.headers)
+
+    async def entries_create(http, user, n, rng):
+        body = {"title": paragraph(rng, 2, 6), "content": paragraph(rng, 50, 400), "mood": rng.choice(MOODS)}
+        response = await http.post("/api/entries", json=body, headers=user.headers)
+        if response.status_code == 200:
+            user.entry_ids.append(response.json()["id"])
+        return response
+
+    async def entries_update(http, user, n, rng):
+        return await http.put(f"/api/entries/{rng.choice(user.entry_ids)}", json={"title": paragraph(rng, 2, 6)}, headers=user.headers)
+
+    async def todos_list(http, user, n, rng):
+        return await http.get("/api/todos", params={"status": "pending"}, headers=user.headers)
+
+    async def todos_counts(http, user, n, rng):
+        return await http.get("/api/todos/counts", headers=user.headers)
+
+    async def reminders_list(http, user, n, rng):
+        return await http.get("/api/reminders", headers=user.headers)
+
+    def stats(window):
+        async def run(http, user, n, rng):
+            return await http.get(f"/api/stats/{window}", headers=user.headers)
+        return run
+
+    async def stats_custom(http, user, n, rng):
+        params = {"from": (today - timedelta(days=365)).isoformat(), "to": today.isoformat(), "granularity": "month"}
+        return await http.get("/api/stats", params=params, headers=user.headers)
+
+    async def ai_summarize(http, user, n, rng):
+        # A fresh text per request so every call misses the response cache
+        return await http.post("/api/ai/summarize", json={"text": f"{n} {paragraph(rng, 50, 200)}"}, headers=user.headers)
+
+    async def ai_summarize_cached(http, user, n, rng):
+        return await http.post("/api/ai/summarize", json={"text": "The same entry every time."}, headers=user.headers)
+
+    async def ai_stream(http, user, n, rng):
+        async with http.stream("POST", "/api/ai/summarize/stream", json={"text": f"{n} {paragraph(rng, 50, 200)}"}, headers=user.headers) as response:
+            await response.aread()
+        return response
+
+    scenarios = {
+        "auth.login": auth_login,
+        "auth.me": auth_me,
+        "entries.list": entries_list,
+        "entries.preview": entries_preview,
+        "entries.page": entries_page,
+        "entries.get": entries_get,
+        "entries.search": entries_search,
+        "entries.create": entries_create,
+        "entries.update": entries_update,
+        "todos.list": todos_list,
+        "todos.counts": todos_counts,
+        "reminders.list": reminders_list,
+        "stats.weekly": stats("weekly"),
+        "stats.monthly": stats("monthly"),
+        "stats.yearly": stats("yearly"),
+        "stats.custom": stats_custom,
+        "ai.summarize": ai_summarize,
+        "ai.summarize.cached": ai_summarize_cached,
+        "ai.stream": ai_stream,
+    }
+    if mongomock:
+        # mongomock supports neither $text nor the $substrCP preview projection
+        del scenarios["entries.search"]
+        del scenarios["entries.preview"]
+    return scenarios
+
+
+async def run_scenario(http: httpx.AsyncClient, users: List[BenchUser], scenario, requests: int, concurrency: int, rng: random.Random) -> dict:
+    latencies, statuses, errors = [], {}, 0
+    issued = 0
+
+    async def worker():
+        nonlocal issued, errors
+        while issued < requests:
+            n = issued
+            issued += 1
+            user = users[n % len(users)]
+            started = time.perf_counter()
+            try:
+                response = await scenario(http, user, n, rng)
+                status = str(response.status_code)
+            except Exception as e:
+                logger.debug(f"Request failed: {e!r}")
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not status.isdigit() or int(status) >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status": statuses,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+    }
+
+
+def compare(report: dict, baseline: dict):
+    # Human-readable deltas on stderr; stdout stays valid JSON
+    print(f"{'scenario':<22}{'p50 ms':>18}{'p95 ms':>18}{'rps':>18}", file=sys.stderr)
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "throughput_rps"):
+            change = (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            cells.append(f"{result[key]:>9.1f} {change:+6.1f}%")
+        print(f"{name:<22}" + "".join(f"{cell:>18}" for cell in cells), file=sys.stderr)
+
+
+def configure_environment(args) -> str:
+    # Must run before `import server`, which reads its settings at import time
+    db_name = args.db_name or f"deardiary_bench_{uuid.uuid4().hex[:8]}"
+    os.environ["DB_NAME"] = db_name
+    os.environ["AI_PROVIDER"] = "fake"
+    os.environ.setdefault("MONGO_URL", args.mongo_url)
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-" + uuid.uuid4().hex)
+    os.environ.setdefault("GROQ_API_KEY", "")
+    os.environ.setdefault("FAKE_GROQ_LATENCY_MS", str(args.ai_latency_ms))
+    # The upstream AI budget would otherwise be the only thing measured
+    os.environ.setdefault("AI_RATE_LIMIT_PER_MINUTE", "1000000")
+    os.environ.setdefault("AI_RATE_LIMIT_BURST", "1000000")
+    os.environ.setdefault("RATE_LIMITS_ENABLED", "false")
+    os.environ.setdefault("REMINDER_SCHEDULER_ENABLED", "false")
+    os.environ.setdefault("SLOW_REQUEST_MS", "0")
+    return db_name
+
+
+async def benchmark(args) -> dict:
+    db_name = configure_environment(args)
+    import server
+
+    if args.mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.db = AsyncMongoMockClient()[db_name]
+
+    rng = random.Random(args.seed)
+    scenarios = build_scenarios(args.mongomock)
+    if args.scenarios:
+        unknown = set(args.scenarios) - set(scenarios)
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))} (available: {', '.join(scenarios)})")
+        scenarios = {name: scenarios[name] for name in args.scenarios}
+
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with server.lifespan(server.app), httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as http:
+            started = time.perf_counter()
+            users = [await seed_user(server, http, i, args, rng) for i in range(args.users)]
+            seed_seconds = time.perf_counter() - started
+            logger.info(f"Seeded {args.users} users x {args.entries} entries in {seed_seconds:.1f}s")
+
+            results = {}
+            for name, scenario in scenarios.items():
+                if args.warmup:
+                    await run_scenario(http, users, scenario, args.warmup, args.concurrency, rng)
+                results[name] = await run_scenario(http, users, scenario, args.requests, args.concurrency, rng)
+                logger.info(f"{name}: p50 {results[name]['p50_ms']}ms p99 {results[name]['p99_ms']}ms {results[name]['throughput_rps']} req/s")
+    finally:
+        if not args.mongomock and not args.keep:
+            # Shutdown closed the app's client; drop the scratch database with a fresh one
+            from motor.motor_asyncio import AsyncIOMotorClient
+            cleanup = AsyncIOMotorClient(os.environ["MONGO_URL"])
+            await cleanup.drop_database(db_name)
+            cleanup.close()
+
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": "mongomock" if args.mongomock else "mongodb",
+        "config": {
+            "users": args.users,
+            "entries_per_user": args.entries,
+            "days": args.days,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "ai_latency_ms": args.ai_latency_ms,
+            "seed": args.seed,
+        },
+        "startup_ms": {phase: round(seconds * 1000, 1) for phase, seconds in server.app.state.startup["phases"].items()},
+        "seed_seconds": round(seed_seconds, 2),
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DearDiary in-process load benchmark")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017", help="Used unless MONGO_URL is set")
+    parser.add_argument("--mongomock", action="store_true", help="Use mongomock-motor instead of a MongoDB server")
+    parser.add_argument("--db-name", default=None, help="Scratch database (default: a random deardiary_bench_* name)")
+    parser.add_argument("--keep", action="store_true", help="Don't drop the scratch database afterwards")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--entries", type=int, default=1000, help="Entries per user; todos and reminders scale with it")
+    parser.add_argument("--days", type=int, default=730, help="Spread entry dates over this many past days")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--ai-latency-ms", type=float, default=300, help="Simulated upstream AI latency")
+    parser.add_argument("--scenarios", type=lambda value: [s for s in value.split(",") if s], default=None, help="Comma-separated subset")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", default=None, help="Earlier JSON report to print deltas against")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    # Keep per-request logs from the app and httpx out of the timings
+    logging.getLogger().setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+
+    report = asyncio.run(benchmark(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
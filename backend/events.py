@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from pymongo.errors import PyMongoError
+
+
+logger = logging.getLogger(__name__)
+
+# Scheduler bookkeeping on reminders; updates touching only these aren't user-visible changes
+SCHEDULER_FIELDS = {"lease_until", "lease_owner", "notify_attempts", "notify_error", "notified_at"}
+# Set when /api/sync numbers a pending write; that write was already published
+SYNC_FIELDS = {"sync_version"}
+
+
+class EventBus:
+    # Per-user fan-out to the WebSocket connections of this process. Each
+    # connection gets a bounded queue; one that falls behind is cleared and told
+    # to resync rather than holding events in memory indefinitely.
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, set] = defaultdict(set)
+
+    @contextmanager
+    def subscribe(self, user_id: str):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[user_id].discard(queue)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id: str, event: dict):
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+    def has_subscribers(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    def connections(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+class ChangeStreamRelay:
+    # Multi-worker mode: every worker watches the collections and feeds its own
+    # bus, so a write on one worker reaches sockets held by the others. Deletes
+    # carry the owner only when pre-images are enabled on the collection.
+    def __init__(self, bus: EventBus, build_event: Callable[[str, str, dict], dict], retry_delay: float = 5.0):
+        self.bus = bus
+        self.build_event = build_event
+        self.retry_delay = retry_delay
+        self._tasks = []
+
+    def start(self, collections: Dict[str, object]):
+        # collections: event kind -> Motor collection
+        self._tasks = [asyncio.create_task(self._watch(kind, collection)) for kind, collection in collections.items()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def to_event(self, kind: str, change: dict) -> Optional[tuple]:
+        operation = change["operationType"]
+        if operation == "delete":
+            doc = change.get("fullDocumentBeforeChange")
+            return (doc["user_id"], self.build_event(kind, "deleted", doc)) if doc else None
+        doc = change.get("fullDocument")
+        if not doc:
+            return None
+        if operation == "insert":
+            return doc["user_id"], self.build_event(kind, "created", doc)
+        updated = set(change.get("updateDescription", {}).get("updatedFields", {}))
+        if operation == "update" and updated and updated <= SYNC_FIELDS:
+            return None
+        if operation == "update" and updated and updated <= SCHEDULER_FIELDS:
+            if "notified_at" in updated and doc.get("notified_at"):
+                return doc["user_id"], self.build_event(kind, "due", doc)
+            return None
+        return doc["user_id"], self.build_event(kind, "updated", doc)
+
+    async def _watch(self, kind: str, collection):
+        resume_token = None
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        while True:
+            try:
+                async with collection.watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    full_document_before_change="whenAvailable",
+                    resume_after=resume_token,
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        routed = self.to_event(kind, change)
+                        if routed:
+                            self.bus.publish(*routed)
+            except PyMongoError as e:
+                logger.error(f"Change stream on {collection.name} failed: {e}; retrying in {self.retry_delay}s")
+                await asyncio.sleep(self.retry_delay)
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import random
+from types import SimpleNamespace
+
+import groq
+import httpx
+
+
+# Stand-in for groq.AsyncGroq used when AI_PROVIDER=fake. It answers instantly
+# (or after FAKE_GROQ_LATENCY_MS) with deterministic text and can inject
+# upstream failures via FAKE_GROQ_FAILURE_RATE for exercising retries.
+class FakeCompletions:
+    def __init__(self, latency: float, failure_rate: float):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    def _respond(self, messages) -> str:
+        system = messages[0]["content"].lower()
+        text = messages[-1]["content"]
+        if "task extraction" in system:
+            return "1. Review today's entry\n2. Plan tomorrow"
+        if "growth coach" in system:
+            return "1. Take a short walk\n2. Write three things you are grateful for"
+        if "summarizer" in system:
+            return " ".join(text.split()[:20])
+        return text
+
+    def _maybe_fail(self):
+        if self.failure_rate and random.random() < self.failure_rate:
+            request = httpx.Request("POST", "https://fake-groq.local/openai/v1/chat/completions")
+            response = httpx.Response(429, request=request, headers={"retry-after": "1"})
+            raise groq.RateLimitError("Fake rate limit", response=response, body=None)
+
+    async def create(self, model, messages, temperature=None, max_tokens=None, stream=False, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self._maybe_fail()
+
+        content = self._respond(messages)
+        prompt_tokens = sum(len(m["content"].split()) for m in messages)
+        completion_tokens = len(content.split())
+        if stream:
+            return FakeStream(content)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, message=SimpleNamespace(role="assistant", content=content), finish_reason="stop")],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
+
+
+class FakeStream:
+    def __init__(self, content: str):
+        self.words = content.split(" ")
+        self.closed = False
+
+    async def __aiter__(self):
+        for i, word in enumerate(self.words):
+            if self.closed:
+                return
+            delta = word if i == 0 else " " + word
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=delta), finish_reason=None)])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeAsyncGroq:
+    def __init__(self, latency: float = None, failure_rate: float = None):
+        latency = latency if latency is not None else float(os.environ.get('FAKE_GROQ_LATENCY_MS', '0')) / 1000
+        failure_rate = failure_rate if failure_rate is not None else float(os.environ.get('FAKE_GROQ_FAILURE_RATE', '0'))
+        self.chat = SimpleNamespace(completions=FakeCompletions(latency, failure_rate))
@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+
+import server
+
+
+async def rebuild_rollups(args):
+    rebuilt = await server.rebuild_rollups(args.user_id)
+    scope = f"user {args.user_id}" if args.user_id else "all users"
+    print(f"Rebuilt {rebuilt} daily rollups for {scope}")
+    return 0
+
+
+async def backfill_reminders(args):
+    stamped = await server.backfill_remind_at()
+    print(f"Scheduled {stamped} reminders created before the reminder scheduler")
+    return 0
+
+
+async def ensure_indexes(args):
+    await server.ensure_indexes()
+    print(f"Indexes ensured on {len(server.INDEXES)} collections")
+    return 0
+
+
+async def check_indexes(args):
+    collscans = await server.find_collscans()
+    for name, stages in collscans.items():
+        print(f"COLLSCAN in {name}: {' <- '.join(stages)}")
+    if collscans:
+        return 1
+    print(f"All {len(server.QUERY_SHAPES)} query shapes use an index")
+    return 0
+
+
+async def run(args):
+    # Same shared state as the API, so cache invalidations reach running workers
+    await server.shared_state.start(server.db.shared_state)
+    return await args.handler(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DearDiary maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rollups_parser = subparsers.add_parser("rebuild-rollups", help="Recompute per-day stats rollups from entries")
+    rollups_parser.add_argument("--user-id", default=None, help="Only rebuild rollups for this user")
+    rollups_parser.set_defaults(handler=rebuild_rollups)
+
+    reminders_parser = subparsers.add_parser("backfill-reminders", help="Give reminders from before the scheduler a remind_at")
+    reminders_parser.set_defaults(handler=backfill_reminders)
+
+    ensure_parser = subparsers.add_parser("ensure-indexes", help="Create missing indexes")
+    ensure_parser.set_defaults(handler=ensure_indexes)
+
+    check_parser = subparsers.add_parser("check-indexes", help="Fail if any handler query shape plans a COLLSCAN")
+    check_parser.set_defaults(handler=check_indexes)
+
+    args = parser.parse_args()
+    server.connect_mongo()
+    try:
+        return asyncio.run(run(args))
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
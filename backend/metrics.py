@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+from starlette.datastructures import MutableHeaders
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Phase durations (seconds) of the request being handled, e.g. {"db": 0.012, "ai": 0.8}.
+# Motor copies the context into its executor threads, so command listeners see it too.
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def add_timing(name: str, seconds: float):
+    timings = request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        # Updated from request handlers and from pymongo's executor threads
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> str:
+        return f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> str:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + "".join(
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}\n" for key, value in items
+        )
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> str:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + "".join(
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}\n" for key, value in items
+        )
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, sum, count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> str:
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        lines = [self.header()]
+        inf = 'le="+Inf"'
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}\n")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, inf)} {count}\n")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}\n")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}\n")
+        return "".join(lines)
+
+
+class Registry:
+    # Just enough of the Prometheus client for a single process: every worker
+    # exposes its own numbers and the scraper aggregates them
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], None]):
+        # Called before each render to refresh gauges that are cheaper to read than to track
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        return "".join(metric.render() for metric in self._metrics)
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time from request start to the end of the response body", ("method", "route", "status")
+)
+http_requests_in_progress = registry.gauge("http_requests_in_progress", "Requests currently being handled")
+mongodb_command_duration = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trips as reported by the driver", ("command", "collection", "outcome")
+)
+ai_request_duration = registry.histogram(
+    "ai_request_duration_seconds", "Upstream AI completions, including streamed ones", ("task", "outcome")
+)
+ai_tokens = registry.counter("ai_tokens", "Tokens reported by the AI provider", ("task", "kind"))
+ai_cache_lookups = registry.counter("ai_cache_lookups", "AI response cache lookups by the tier that answered", ("result",))
+ai_cache_entries = registry.gauge("ai_cache_entries", "AI responses held in this worker's memory cache")
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+event_loop_lag_last = registry.gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample")
+startup_duration = registry.gauge("app_startup_seconds", "Time spent in each cold-start phase of this worker", ("phase",))
+
+
+class CommandTimer(monitoring.CommandListener):
+    # Pass to the Motor client as event_listeners=[...]. Collection names only
+    # appear on the started event, so they are kept until the reply arrives.
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        value = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = value if isinstance(value, str) else ""
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        seconds = event.duration_micros / 1e6
+        mongodb_command_duration.observe(seconds, command=event.command_name, collection=collection, outcome=outcome)
+        add_timing("db", seconds)
+
+
+class LoopLagMonitor:
+    # Sleeps for `interval` and records how much later than asked it woke up;
+    # sustained lag means something is blocking the event loop
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            event_loop_lag.observe(lag)
+            event_loop_lag_last.set(lag)
+
+
+class MetricsMiddleware:
+    # Records request latency per route template (unmatched paths share one
+    # label so scanners can't blow up the series count), optionally adds a
+    # Server-Timing header and logs requests slower than `slow_request_seconds`.
+    #   route_label(scope) -> route template, called after the app has routed the request
+    def __init__(
+        self,
+        app,
+        route_label: Callable[[dict], str],
+        server_timing: bool = False,
+        slow_request_seconds: float = 1.0,
+        excluded_paths: Sequence[str] = ("/metrics",),
+    ):
+        self.app = app
+        self.route_label = route_label
+        self.server_timing = server_timing
+        self.slow_request_seconds = slow_request_seconds
+        self.excluded_paths = tuple(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = {}
+        token = request_timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    # Phases still running (e.g. a streamed body) are reported as far as they got
+                    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+                    entries.append(f"app;dur={(time.perf_counter() - started) * 1000:.1f}")
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", ", ".join(entries))
+            await send(message)
+
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            http_requests_in_progress.dec()
+            request_timings.reset(token)
+            elapsed = time.perf_counter() - started
+            route = self.route_label(scope)
+            http_request_duration.observe(elapsed, method=scope["method"], route=route, status=status)
+            if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+                phases = " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in timings.items())
+                logger.warning(
+                    f"Slow request: {scope['method']} {scope['path']} ({route}) -> {status} in {elapsed * 1000:.0f}ms {phases}".rstrip()
+                )
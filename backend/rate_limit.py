@@ -0,0 +1,74 @@
+import logging
+import math
+from typing import Dict, NamedTuple, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from shared_state import SharedState, WindowResult
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitPolicy(NamedTuple):
+    # `limit` cost units per `window` seconds for each key (a user id or client IP)
+    limit: int
+    window: float
+
+
+class RateLimiter:
+    # Sliding-window budgets kept in the shared state, so with the MongoDB
+    # backend a user's budget is the same whichever worker serves them
+    def __init__(self, state: SharedState, policies: Dict[str, RateLimitPolicy], enabled: bool = True):
+        self.state = state
+        self.policies = policies
+        self.enabled = enabled
+
+    async def check(self, policy: str, key: str, cost: float = 1) -> Optional[WindowResult]:
+        if not self.enabled:
+            return None
+        limit, window = self.policies[policy]
+        try:
+            return await self.state.hit(f"ratelimit:{policy}:{key}", cost, limit, window)
+        except Exception as e:
+            # Fail open: losing the limiter's store shouldn't take the API down with it
+            logger.warning(f"Rate limit check for {policy} failed, allowing request: {e}")
+            return None
+
+    def headers(self, policy: str, result: WindowResult) -> Dict[str, str]:
+        # Fields from the IETF RateLimit header draft; reset and retry are delta seconds
+        headers = {
+            "RateLimit-Limit": str(result.limit),
+            "RateLimit-Remaining": str(result.remaining),
+            "RateLimit-Reset": str(math.ceil(result.reset)),
+            "RateLimit-Policy": f"{result.limit};w={int(self.policies[policy].window)}",
+        }
+        if not result.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(result.retry_after)))
+        return headers
+
+
+class RateLimitHeadersMiddleware:
+    # Handlers leave the headers of their last check in request.state; they are
+    # added here so streamed, 304 and error responses carry them as well
+    def __init__(self, app, state_key: str = "rate_limit_headers"):
+        self.app = app
+        self.state_key = state_key
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Created up front so request.state further down writes into this same dict
+        state = scope.setdefault("state", {})
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                values = state.get(self.state_key)
+                if values:
+                    headers = MutableHeaders(scope=message)
+                    for name, value in values.items():
+                        headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from typing import Callable, List, Optional
+
+import httpx
+from pymongo import ReturnDocument
+
+from ai_jobs import backoff_delay
+
+
+logger = logging.getLogger(__name__)
+
+# Fields of a reminder handed to notifiers
+PAYLOAD_FIELDS = ("id", "user_id", "text", "reminder_date", "completed", "created_at", "version")
+
+
+def as_utc(value: datetime) -> datetime:
+    # Motor hands back naive datetimes that are already UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class LogNotifier:
+    # Logs due reminders and keeps the most recent ones, which is handy in tests
+    def __init__(self, history: int = 100):
+        self.sent = deque(maxlen=history)
+
+    async def notify(self, reminder: dict):
+        self.sent.append(reminder)
+        logger.info(f"Reminder {reminder['id']} due for user {reminder['user_id']}: {reminder['text']}")
+
+    async def close(self):
+        pass
+
+
+class WebhookNotifier:
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    async def notify(self, reminder: dict):
+        response = await self.client.post(self.url, json={"type": "reminder.due", "reminder": reminder})
+        response.raise_for_status()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class WebSocketNotifier:
+    # Hands a reminder.due event to the owner's open WebSocket connections
+    def __init__(self, publish: Callable[[str, dict], None]):
+        self.publish = publish
+
+    async def notify(self, reminder: dict):
+        self.publish(reminder["user_id"], {"type": "reminder.due", "id": reminder["id"], "data": reminder})
+
+    async def close(self):
+        pass
+
+
+class ReminderScheduler:
+    # Each worker keeps a min-heap of reminders due within `horizon` seconds,
+    # refilled from MongoDB every `poll_interval` and on local writes. Firing
+    # starts with an atomic lease on the reminder, so when several workers hold
+    # the same reminder only one of them notifies. A failed delivery keeps the
+    # lease until the retry time; the next refresh picks the reminder up again.
+    def __init__(
+        self,
+        notifiers: List,
+        poll_interval: float = 30.0,
+        horizon: float = 600.0,
+        lease_seconds: float = 60.0,
+        max_lateness: float = 24 * 3600,
+        max_attempts: int = 5,
+        batch_size: int = 1000,
+        backoff_base: float = 5.0,
+        backoff_cap: float = 300.0,
+    ):
+        self.notifiers = notifiers
+        self.poll_interval = poll_interval
+        self.horizon = horizon
+        self.lease_seconds = lease_seconds
+        self.max_lateness = max_lateness
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.owner = str(uuid.uuid4())
+        self.collection = None
+        self.fired = 0
+        self._heap = []
+        self._scheduled = {}
+        self._refreshed_at = None
+        self._task = None
+        self._wakeup = asyncio.Event()
+
+    def start(self, collection):
+        self.collection = collection
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for notifier in self.notifiers:
+            await notifier.close()
+
+    def schedule(self, reminder_id: str, remind_at: Optional[datetime]):
+        # Called after local writes so near-term reminders don't wait for the next refresh
+        if remind_at is None or self._task is None:
+            return
+        remind_at = as_utc(remind_at)
+        due_in = (remind_at - datetime.now(timezone.utc)).total_seconds()
+        if -self.max_lateness <= due_in <= self.horizon:
+            self._push(reminder_id, remind_at)
+            self._wakeup.set()
+
+    def _push(self, reminder_id: str, remind_at: datetime):
+        if self._scheduled.get(reminder_id) != remind_at:
+            self._scheduled[reminder_id] = remind_at
+            heapq.heappush(self._heap, (remind_at, reminder_id))
+
+    def _pending_filter(self, now: datetime) -> dict:
+        return {
+            "completed": False,
+            "notified_at": None,
+            "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}],
+        }
+
+    async def refresh(self):
+        now = datetime.now(timezone.utc)
+        cursor = self.collection.find(
+            {
+                "completed": False,
+                "notified_at": None,
+                "remind_at": {
+                    "$gte": now - timedelta(seconds=self.max_lateness),
+                    "$lte": now + timedelta(seconds=self.horizon),
+                },
+            },
+            {"_id": 0, "id": 1, "remind_at": 1},
+        ).sort("remind_at", 1).limit(self.batch_size)
+        async for doc in cursor:
+            self._push(doc["id"], as_utc(doc["remind_at"]))
+        self._refreshed_at = time.monotonic()
+
+    async def claim(self, reminder_id: str, remind_at: datetime) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        # Matching remind_at drops heap entries made stale by an edit
+        return await self.collection.find_one_and_update(
+            {"id": reminder_id, "remind_at": remind_at, **self._pending_filter(now)},
+            {
+                "$set": {"lease_until": now + timedelta(seconds=self.lease_seconds), "lease_owner": self.owner},
+                "$inc": {"notify_attempts": 1},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fire(self, reminder_id: str, remind_at: datetime):
+        reminder = await self.claim(reminder_id, remind_at)
+        if reminder is None:
+            return
+        payload = {field: reminder.get(field) for field in PAYLOAD_FIELDS}
+        errors = []
+        for notifier in self.notifiers:
+            try:
+                await notifier.notify(payload)
+            except Exception as e:
+                logger.warning(f"{type(notifier).__name__} failed for reminder {reminder_id}: {e}")
+                errors.append(str(e))
+
+        now = datetime.now(timezone.utc)
+        attempts = reminder.get("notify_attempts", 1)
+        if self.notifiers and len(errors) == len(self.notifiers) and attempts < self.max_attempts:
+            retry_at = now + timedelta(seconds=backoff_delay(attempts, self.backoff_base, self.backoff_cap))
+            update = {"lease_until": retry_at, "notify_error": errors[0]}
+        else:
+            update = {"notified_at": now, "lease_until": None, "notify_error": errors[0] if errors else None}
+            self.fired += 1
+        await self.collection.update_one({"id": reminder_id, "lease_owner": self.owner}, {"$set": update})
+
+    async def _fire_due(self):
+        now = datetime.now(timezone.utc)
+        while self._heap and self._heap[0][0] <= now:
+            remind_at, reminder_id = heapq.heappop(self._heap)
+            if self._scheduled.get(reminder_id) != remind_at:
+                continue
+            del self._scheduled[reminder_id]
+            await self.fire(reminder_id, remind_at)
+
+    async def _run(self):
+        while True:
+            try:
+                if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.poll_interval:
+                    await self.refresh()
+                await self._fire_due()
+            except Exception as e:
+                logger.error(f"Reminder scheduler pass failed: {e}")
+
+            delay = self.poll_interval - (time.monotonic() - (self._refreshed_at or time.monotonic()))
+            if self._heap:
+                delay = min(delay, (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0.01))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
@@ -0,0 +1,45 @@
+import logging
+import os
+from pathlib import Path
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+# Production entry point: python serve.py
+#
+# Loads .env before uvicorn forks, so settings that are read at import time by
+# libraries (MOTOR_MAX_WORKERS) reach every worker too. With more than one
+# worker, state that has to be agreed on (stats cache, AI budget, startup
+# locks) moves to MongoDB unless SHARED_STATE_BACKEND says otherwise.
+
+logger = logging.getLogger("serve")
+
+
+def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+    if workers > 1:
+        os.environ.setdefault('SHARED_STATE_BACKEND', 'mongodb')
+        if os.environ.get('EVENTS_BACKEND', 'local') != 'changestream':
+            logger.warning("EVENTS_BACKEND=local with several workers: /api/ws only sees writes made by its own worker")
+
+    uvicorn.run(
+        "server:app",
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', '8000')),
+        workers=workers,
+        # Behind a load balancer or PaaS router; client IPs come from X-Forwarded-For
+        proxy_headers=True,
+        forwarded_allow_ips=os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1'),
+        timeout_keep_alive=int(os.environ.get('KEEP_ALIVE_SECONDS', '5')),
+        timeout_graceful_shutdown=int(os.environ.get('GRACEFUL_SHUTDOWN_SECONDS', '30')),
+        limit_concurrency=int(os.environ['LIMIT_CONCURRENCY']) if os.environ.get('LIMIT_CONCURRENCY') else None,
+        access_log=os.environ.get('ACCESS_LOG', 'true').lower() == 'true',
+    )
+
+
+if __name__ == "__main__":
+    main()
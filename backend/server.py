@@ -1,41 +1,280 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+import time
+
+# Taken before the heavy imports so cold-start numbers include them
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.requests import HTTPConnection
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, DeleteOne, IndexModel, InsertOne, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 import os
+import asyncio
+import base64
+import hashlib
+import json
+import math
 import logging
+import re
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Union
 import uuid
+import tempfile
+try:
+    import orjson
+except ImportError:
+    orjson = None
+import zipfile
+from contextlib import asynccontextmanager
+from functools import partial
 from datetime import datetime, timezone, timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import bcrypt
 import jwt
-from groq import AsyncGroq
+
+from backup import ImportFormatError, gzip_chunks, inflate_chunks, ndjson_chunks, ndjson_records, zip_chunks, zip_member_chunks
+from reminder_scheduler import LogNotifier, ReminderScheduler, WebhookNotifier, WebSocketNotifier
+from events import ChangeStreamRelay, EventBus
+from compression import CompressionMiddleware
+from metrics import CommandTimer, LoopLagMonitor, MetricsMiddleware, add_timing, ai_cache_entries, ai_cache_lookups, ai_request_duration, ai_tokens, registry, startup_duration
+from autosave import PatchCoalescer, TextOpError, apply_text_op
+from ai_jobs import AIJobQueue, TokenBucket, is_rate_limited, retry_after_seconds
+from cache import TTLCache
+from shared_state import build_shared_state
+from rate_limit import RateLimitHeadersMiddleware, RateLimiter, RateLimitPolicy
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Configure logging before anything below can log
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# MongoDB connection, opened by connect_mongo() during startup. Pool limits apply
+# per worker process, so the server sees up to WEB_CONCURRENCY x MONGO_MAX_POOL_SIZE
+# connections; Motor also runs at most MOTOR_MAX_WORKERS (default 5 per CPU)
+# operations at once per process. Command timings feed /metrics and Server-Timing.
+mongo_url = os.environ.get('MONGO_URL')
+DB_NAME = os.environ.get('DB_NAME')
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ['MONGO_MAX_IDLE_TIME_MS']) if os.environ.get('MONGO_MAX_IDLE_TIME_MS') else None
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '20000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ['MONGO_SOCKET_TIMEOUT_MS']) if os.environ.get('MONGO_SOCKET_TIMEOUT_MS') else None
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ['MONGO_WAIT_QUEUE_TIMEOUT_MS']) if os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS') else None
+# Connections opened at startup so the first requests don't pay for the handshakes
+MONGO_WARMUP_CONNECTIONS = int(os.environ.get('MONGO_WARMUP_CONNECTIONS', str(max(MONGO_MIN_POOL_SIZE, 1))))
+client = None
+db = None
+
+def connect_mongo():
+    # Deferred because building the client resolves mongodb+srv:// records and
+    # starts monitor threads. Leaves an already assigned `db` alone (tests, benchmarks).
+    global client, db
+    if db is not None:
+        return db
+    if not mongo_url or not DB_NAME:
+        raise RuntimeError("MONGO_URL and DB_NAME must be set")
+    client = AsyncIOMotorClient(
+        mongo_url,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        event_listeners=[CommandTimer()],
+    )
+    db = client[DB_NAME]
+    return db
 
 # JWT settings
-JWT_SECRET = os.environ['JWT_SECRET_KEY']
+# Checked at startup rather than import, so tooling can import this module without it
+JWT_SECRET = os.environ.get('JWT_SECRET_KEY')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 720
 
-# Groq AI client (free tier)
-GROQ_API_KEY = os.environ['GROQ_API_KEY']
-groq_client = AsyncGroq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
+# Password hashing runs off the event loop in a bounded pool; requests beyond
+# PASSWORD_HASH_MAX_PENDING queued jobs are rejected with 429
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '64'))
+
+# Groq AI client (free tier); AI_PROVIDER=fake swaps in a local stand-in for tests.
+# Built at startup only when a provider is configured, so processes without AI
+# never import the Groq SDK or start AI job workers.
+GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
+AI_PROVIDER = os.environ.get('AI_PROVIDER', 'groq')
+
+def build_ai_client():
+    if AI_PROVIDER == 'fake':
+        from fake_groq import FakeAsyncGroq
+        return FakeAsyncGroq()
+    if GROQ_API_KEY:
+        from groq import AsyncGroq
+        return AsyncGroq(api_key=GROQ_API_KEY)
+    return None
+AI_MODEL = "llama-3.3-70b-versatile"
+
+# Upstream request budget shared by every completion this process makes
+AI_RATE_LIMIT_PER_MINUTE = float(os.environ.get('AI_RATE_LIMIT_PER_MINUTE', '30'))
+AI_RATE_LIMIT_BURST = float(os.environ.get('AI_RATE_LIMIT_BURST', '5'))
+
+# AI responses are cached by a hash of the full request; the optional MongoDB
+# tier survives restarts and is shared between workers
+AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', '2048'))
+AI_CACHE_TTL_SECONDS = int(os.environ.get('AI_CACHE_TTL_SECONDS', '86400'))
+AI_CACHE_PERSISTENT = os.environ.get('AI_CACHE_PERSISTENT', 'false').lower() == 'true'
+ai_cache = TTLCache(maxsize=AI_CACHE_MAX_ENTRIES, ttl=AI_CACHE_TTL_SECONDS)
+# Upper bound on concurrent upstream completions across all AI endpoints
+AI_MAX_CONCURRENCY = int(os.environ.get('AI_MAX_CONCURRENCY', '8'))
+
+# Background AI jobs: queued in MongoDB, drained by AI_JOB_WORKERS tasks per process
+AI_JOB_WORKERS = int(os.environ.get('AI_JOB_WORKERS', '2'))
+AI_JOB_MAX_ATTEMPTS = int(os.environ.get('AI_JOB_MAX_ATTEMPTS', '5'))
+AI_JOB_RETENTION_SECONDS = int(os.environ.get('AI_JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
 
 security = HTTPBearer()
 
-# Create the main app without a prefix
-app = FastAPI()
+# Verified tokens and user profiles are cached per process. Revocations are
+# stored in MongoDB; other workers see them once their cached entry lapses,
+# so TOKEN_CACHE_TTL_SECONDS bounds how long a revoked token stays usable there.
+TOKEN_CACHE_TTL_SECONDS = float(os.environ.get('TOKEN_CACHE_TTL_SECONDS', '60'))
+token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS)
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '300'))
+user_cache = TTLCache(maxsize=10000, ttl=USER_CACHE_TTL_SECONDS)
+
+# Caches, rate-limit counters and locks that all workers must agree on: "memory"
+# for a single process, "mongodb" when running several workers (serve.py picks
+# it automatically for WEB_CONCURRENCY > 1)
+SHARED_STATE_BACKEND = os.environ.get('SHARED_STATE_BACKEND', 'memory')
+shared_state = build_shared_state(SHARED_STATE_BACKEND)
+
+# Per-user budgets for expensive routes, in cost units per minute; auth routes are
+# budgeted per client IP. An AI task costs 1 (/ai/analyze pays for each task it
+# runs) and stats cost 1 per started 90 days of window, so /stats/yearly costs 5.
+RATE_LIMITS_ENABLED = os.environ.get('RATE_LIMITS_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_AI_PER_MINUTE = int(os.environ.get('RATE_LIMIT_AI_PER_MINUTE', '20'))
+RATE_LIMIT_AUTH_PER_MINUTE = int(os.environ.get('RATE_LIMIT_AUTH_PER_MINUTE', '10'))
+RATE_LIMIT_STATS_PER_MINUTE = int(os.environ.get('RATE_LIMIT_STATS_PER_MINUTE', '60'))
+rate_limiter = RateLimiter(
+    shared_state,
+    {
+        "ai": RateLimitPolicy(RATE_LIMIT_AI_PER_MINUTE, 60),
+        "auth": RateLimitPolicy(RATE_LIMIT_AUTH_PER_MINUTE, 60),
+        "stats": RateLimitPolicy(RATE_LIMIT_STATS_PER_MINUTE, 60),
+    },
+    enabled=RATE_LIMITS_ENABLED,
+)
+
+# Per-user stats results, dropped whenever that user's rollups change
+STATS_CACHE_TTL_SECONDS = float(os.environ.get('STATS_CACHE_TTL_SECONDS', '60'))
+
+# Upper bound on operations in one /bulk request
+BULK_MAX_OPERATIONS = int(os.environ.get('BULK_MAX_OPERATIONS', '500'))
+
+# Export/import: cursor batch size, documents per insert_many, longest accepted NDJSON line
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+IMPORT_MAX_LINE_BYTES = int(os.environ.get('IMPORT_MAX_LINE_BYTES', str(1024 * 1024)))
+IMPORT_RETENTION_SECONDS = int(os.environ.get('IMPORT_RETENTION_SECONDS', str(7 * 24 * 3600)))
+
+# Reminder scheduler: comma-separated notifiers (log, webhook), refresh interval,
+# look-ahead window, and how overdue a reminder may be and still fire
+REMINDER_SCHEDULER_ENABLED = os.environ.get('REMINDER_SCHEDULER_ENABLED', 'true').lower() == 'true'
+REMINDER_NOTIFIERS = [n.strip() for n in os.environ.get('REMINDER_NOTIFIERS', 'log,websocket').split(',') if n.strip()]
+REMINDER_WEBHOOK_URL = os.environ.get('REMINDER_WEBHOOK_URL')
+REMINDER_POLL_SECONDS = float(os.environ.get('REMINDER_POLL_SECONDS', '30'))
+REMINDER_HORIZON_SECONDS = float(os.environ.get('REMINDER_HORIZON_SECONDS', '600'))
+REMINDER_MAX_LATENESS_SECONDS = float(os.environ.get('REMINDER_MAX_LATENESS_SECONDS', str(24 * 3600)))
+
+# Change events for /api/ws: "local" fans out inside this process, "changestream"
+# relays MongoDB change streams so every worker sees every write (replica set required)
+EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'local')
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', '1000'))
+WS_AUTH_TIMEOUT_SECONDS = float(os.environ.get('WS_AUTH_TIMEOUT_SECONDS', '10'))
+# Open connections re-validate their token this often (and at its expiry)
+WS_AUTH_RECHECK_SECONDS = float(os.environ.get('WS_AUTH_RECHECK_SECONDS', '60'))
+
+# Delete markers for /api/sync are kept this long; clients offline longer do a full sync
+SYNC_TOMBSTONE_RETENTION_SECONDS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_SECONDS', str(30 * 24 * 3600)))
+SYNC_MAX_CHANGES = int(os.environ.get('SYNC_MAX_CHANGES', '1000'))
+
+# Opt-in: list endpoints serialize documents straight from MongoDB with orjson
+# instead of building and re-validating a response model per document
+JSON_FAST_PATH = os.environ.get('JSON_FAST_PATH', 'false').lower() == 'true'
+# Responses at least this large are gzip/Brotli compressed when the client accepts it (0 disables)
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get('COMPRESSION_MINIMUM_SIZE', '1024'))
+
+# Prometheus metrics at /metrics; Server-Timing adds per-request db/ai/app durations
+# to responses, and requests slower than SLOW_REQUEST_MS are logged (0 disables)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '1000'))
+LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get('LOOP_LAG_INTERVAL_SECONDS', '0.5'))
+
+# After an autosave write, PATCHes for the same entry arriving within this window share the next one
+AUTOSAVE_COALESCE_MS = float(os.environ.get('AUTOSAVE_COALESCE_MS', '200'))
+
+# Pools, background workers and the event bus belong to one app: the lifespan
+# builds them and keeps them on app.state, and endpoints get them through
+# Depends(get_services). A second app in the same process (tests, benchmarks)
+# starts with its own instead of one the first app already shut down.
+class Services:
+    def __init__(self):
+        if PASSWORD_HASH_EXECUTOR == 'process':
+            self.password_hash_pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            self.password_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='bcrypt')
+        self.password_hash_pending = 0
+        self.ai_client = build_ai_client()
+        self.ai_rate_limiter = TokenBucket(rate=AI_RATE_LIMIT_PER_MINUTE / 60, capacity=AI_RATE_LIMIT_BURST)
+        self.ai_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+        self.ai_job_queue = AIJobQueue(partial(complete_ai_task, self), workers=AI_JOB_WORKERS, max_attempts=AI_JOB_MAX_ATTEMPTS)
+        self.event_bus = EventBus(queue_size=EVENTS_QUEUE_SIZE)
+        self.change_stream_relay = ChangeStreamRelay(self.event_bus, change_event)
+        self.reminder_scheduler = ReminderScheduler(
+            build_notifiers(self),
+            poll_interval=REMINDER_POLL_SECONDS,
+            horizon=REMINDER_HORIZON_SECONDS,
+            max_lateness=REMINDER_MAX_LATENESS_SECONDS
+        )
+        self.entry_patches = PatchCoalescer(
+            load_patch_entry, apply_entry_patch, partial(store_patched_entry, self), delay=AUTOSAVE_COALESCE_MS / 1000
+        )
+        self.loop_lag_monitor = LoopLagMonitor(interval=LOOP_LAG_INTERVAL_SECONDS)
+
+    async def start(self):
+        self.ai_job_queue.start(db.ai_jobs, consume=self.ai_client is not None)
+        if EVENTS_BACKEND == "changestream":
+            await start_change_stream_relay(self.change_stream_relay)
+        if REMINDER_SCHEDULER_ENABLED:
+            self.reminder_scheduler.start(db.reminders)
+        if METRICS_ENABLED:
+            self.loop_lag_monitor.start()
+
+    async def stop(self):
+        await self.entry_patches.close()
+        await self.loop_lag_monitor.stop()
+        await self.reminder_scheduler.stop()
+        await self.change_stream_relay.stop()
+        await self.ai_job_queue.stop()
+        self.password_hash_pool.shutdown(wait=False)
+
+def get_services(connection: HTTPConnection) -> Services:
+    return connection.app.state.services
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -71,6 +310,20 @@ class EntryUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
     mood: Optional[str] = None
+    # Expected current version; alternative to an If-Match header
+    version: Optional[int] = None
+
+class TextOp(BaseModel):
+    # Replace `delete` characters at `offset` (Unicode code points) with `insert`
+    offset: int = Field(ge=0)
+    delete: int = Field(default=0, ge=0)
+    insert: str = ""
+
+class EntryPatch(BaseModel):
+    ops: List[TextOp] = Field(default_factory=list, max_length=1000)
+    title: Optional[str] = None
+    mood: Optional[str] = None
+    version: Optional[int] = None
 
 class EntryResponse(BaseModel):
     id: str
@@ -82,6 +335,32 @@ class EntryResponse(BaseModel):
     word_count: int
     created_at: str
     updated_at: str
+    version: int = 0
+
+class EntryPreviewResponse(BaseModel):
+    id: str
+    user_id: str
+    date: str
+    title: str
+    preview: str
+    mood: Optional[str] = None
+    word_count: int
+    created_at: str
+    updated_at: str
+    version: int = 0
+
+class EntrySearchHit(BaseModel):
+    id: str
+    date: str
+    title: str
+    mood: Optional[str] = None
+    word_count: int
+    created_at: str
+    updated_at: str
+    score: float
+    snippet: str
+    # [start, end) character offsets of matched terms within `snippet`
+    highlights: List[List[int]]
 
 class TodoCreate(BaseModel):
     text: str
@@ -92,6 +371,7 @@ class TodoUpdate(BaseModel):
     text: Optional[str] = None
     completed: Optional[bool] = None
     due_date: Optional[str] = None
+    version: Optional[int] = None
 
 class TodoResponse(BaseModel):
     id: str
@@ -101,6 +381,12 @@ class TodoResponse(BaseModel):
     due_date: Optional[str] = None
     source_entry_id: Optional[str] = None
     created_at: str
+    version: int = 0
+
+class StatusCounts(BaseModel):
+    total: int
+    completed: int
+    pending: int
 
 class ReminderCreate(BaseModel):
     text: str
@@ -110,6 +396,7 @@ class ReminderUpdate(BaseModel):
     text: Optional[str] = None
     reminder_date: Optional[str] = None
     completed: Optional[bool] = None
+    version: Optional[int] = None
 
 class ReminderResponse(BaseModel):
     id: str
@@ -118,6 +405,7 @@ class ReminderResponse(BaseModel):
     reminder_date: str
     completed: bool
     created_at: str
+    version: int = 0
 
 class AIRequest(BaseModel):
     text: str
@@ -125,6 +413,34 @@ class AIRequest(BaseModel):
 class AIResponse(BaseModel):
     result: str
 
+AITask = Literal["improve-text", "summarize", "extract-todos", "generate-suggestions"]
+
+class AIAnalyzeRequest(BaseModel):
+    text: str
+    tasks: List[AITask] = ["summarize", "extract-todos", "generate-suggestions"]
+    entry_id: Optional[str] = None
+    save_todos: bool = False
+
+class AIAnalyzeResponse(BaseModel):
+    results: Dict[str, str]
+    errors: Dict[str, str]
+    todos: List[TodoResponse] = []
+
+class AIJobCreate(BaseModel):
+    task: AITask
+    text: str
+
+class AIJobResponse(BaseModel):
+    id: str
+    task: str
+    status: str
+    attempts: int
+    result: Optional[str] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
+    finished_at: Optional[str] = None
+
 class StatsResponse(BaseModel):
     period: str
     entry_count: int
@@ -132,39 +448,897 @@ class StatsResponse(BaseModel):
     avg_words_per_entry: float
     most_active_day: Optional[str] = None
 
+class StatsBucket(BaseModel):
+    period: str
+    entry_count: int
+    total_words: int
+
+class WindowStatsResponse(BaseModel):
+    from_date: str
+    to_date: str
+    granularity: str
+    entry_count: int
+    total_words: int
+    avg_words_per_entry: float
+    most_active_day: Optional[str] = None
+    buckets: List[StatsBucket]
+    moods: Dict[str, int]
+    current_streak: int
+    longest_streak: int
+
+class ImportResponse(BaseModel):
+    id: str
+    status: str
+    bytes_read: int
+    lines: int
+    inserted: Dict[str, int]
+    skipped: Dict[str, int]
+    errors: int
+    error_samples: List[str]
+    created_at: str
+    updated_at: str
+    finished_at: Optional[str] = None
+
+class SyncResponse(BaseModel):
+    # Pass back as `since` on the next call
+    version: int
+    has_more: bool
+    entries: List[EntryResponse]
+    todos: List[TodoResponse]
+    reminders: List[ReminderResponse]
+    # Collection name -> ids deleted since `since`
+    deleted: Dict[str, List[str]]
+
+class BulkOperation(BaseModel):
+    op: Literal["insert", "update", "delete"]
+    # Target of update/delete
+    id: Optional[str] = None
+    # Fields of the matching create/update model
+    data: Dict[str, Any] = Field(default_factory=dict)
+    # Expected current version for update/delete
+    version: Optional[int] = None
+
+class BulkRequest(BaseModel):
+    # Ordered batches stop at the first failed operation, unordered ones run everything
+    ordered: bool = True
+    operations: List[BulkOperation] = Field(min_length=1, max_length=BULK_MAX_OPERATIONS)
+
+class BulkItemResult(BaseModel):
+    index: int
+    op: str
+    id: Optional[str] = None
+    status_code: int
+    error: Optional[str] = None
+    version: Optional[int] = None
+
+class BulkResponse(BaseModel):
+    ordered: bool
+    inserted: int
+    updated: int
+    deleted: int
+    results: List[BulkItemResult]
+
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def hash_password_blocking(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
 
-def verify_password(password: str, hashed: str) -> bool:
+def verify_password_blocking(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+async def run_password_job(services: Services, func, *args):
+    if services.password_hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    services.password_hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(services.password_hash_pool, func, *args)
+    finally:
+        services.password_hash_pending -= 1
+
+async def hash_password(services: Services, password: str) -> str:
+    return await run_password_job(services, hash_password_blocking, password, BCRYPT_ROUNDS)
+
+async def verify_password(services: Services, password: str, hashed: str) -> bool:
+    return await run_password_job(services, verify_password_blocking, password, hashed)
+
+def password_needs_rehash(hashed: str) -> bool:
+    # bcrypt hashes look like $2b$<rounds>$<salt+digest>
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
 def create_jwt_token(user_id: str) -> str:
     expiration = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     payload = {
         'user_id': user_id,
-        'exp': expiration
+        'exp': expiration,
+        # Unique per token so revoking one session never revokes another
+        'jti': str(uuid.uuid4())
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    return await authenticate_token(credentials.credentials)
+
+async def authenticate_token(token: str) -> str:
+    key = token_hash(token)
+    cached = token_cache.get(key)
+    if cached:
+        user_id, exp = cached
+        if exp > datetime.now(timezone.utc).timestamp():
+            return user_id
+        token_cache.pop(key)
+    
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get('user_id')
         if not user_id:
             raise HTTPException(status_code=401, detail='Invalid token')
-        return user_id
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail='Token expired')
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail='Invalid token')
+    
+    if await db.revoked_tokens.find_one({"token_hash": key}, {"_id": 1}):
+        raise HTTPException(status_code=401, detail='Token revoked')
+    
+    exp = payload['exp']
+    token_cache.set(key, (user_id, exp), ttl=min(TOKEN_CACHE_TTL_SECONDS, exp - datetime.now(timezone.utc).timestamp()))
+    return user_id
+
+async def revoke_token(token: str):
+    key = token_hash(token)
+    payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    # Kept only until the token would have expired anyway (TTL index on expires_at)
+    await db.revoked_tokens.update_one(
+        {"token_hash": key},
+        {"$set": {"token_hash": key, "user_id": payload.get('user_id'), "expires_at": datetime.fromtimestamp(payload['exp'], timezone.utc)}},
+        upsert=True
+    )
+    token_cache.pop(key)
+
+async def get_user_profile(user_id: str) -> Optional[dict]:
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
+        if user:
+            user_cache.set(user_id, user)
+    return user
+
+
+# Keyset pagination: cursors are the sort-key values of the last item returned,
+# encoded so clients treat them as opaque strings
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_filter(sort: list, values: list) -> dict:
+    # Everything strictly after `values` in `sort` order
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$lt" if direction == DESCENDING else "$gt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+async def fetch_keyset_page(collection, query: dict, sort: list, limit: int, cursor: Optional[str], response: Response, projection: Optional[dict] = None, skip: int = 0) -> list:
+    # Reads one extra document to learn whether another page follows
+    if cursor:
+        query = {**query, **keyset_filter(sort, decode_cursor(cursor, len(sort)))}
+    docs = await collection.find(query, projection or {"_id": 0}).sort(sort).skip(skip).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor([docs[-1][field] for field, _ in sort])
+    return docs
+
+# Fast path: the projection already gives each document the response model's
+# shape, so only defaults for fields older documents lack need filling in
+def model_projection(model) -> dict:
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+def fast_json(docs: list, model, response: Response) -> Response:
+    defaults = {name: field.default for name, field in model.model_fields.items() if not field.is_required()}
+    for doc in docs:
+        for name, default in defaults.items():
+            doc.setdefault(name, default)
+    headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+    response_class = ORJSONResponse if orjson is not None else JSONResponse
+    return response_class(docs, headers=headers)
+
+def status_filter(status: str) -> dict:
+    if status == "completed":
+        return {"completed": True}
+    if status == "pending":
+        return {"completed": False}
+    return {}
+
+def range_filter(field: str, start: Optional[str], end: Optional[str]) -> dict:
+    bounds = {}
+    if start:
+        bounds["$gte"] = start
+    if end:
+        bounds["$lte"] = end
+    return {field: bounds} if bounds else {}
+
+async def count_by_status(collection, query: dict) -> StatusCounts:
+    counts = {True: 0, False: 0}
+    async for row in collection.aggregate([
+        {"$match": query},
+        {"$group": {"_id": "$completed", "count": {"$sum": 1}}}
+    ]):
+        counts[bool(row["_id"])] += row["count"]
+    return StatusCounts(total=counts[True] + counts[False], completed=counts[True], pending=counts[False])
+
+# List sort orders; `id` breaks ties between equal sort values
+ENTRY_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+ENTRY_PREVIEW_CHARS = 200
+ENTRY_PREVIEW_PROJECTION = {
+    "_id": 0, "id": 1, "user_id": 1, "date": 1, "title": 1, "mood": 1,
+    "word_count": 1, "created_at": 1, "updated_at": 1, "version": 1,
+    "preview": {"$substrCP": ["$content", 0, ENTRY_PREVIEW_CHARS]},
+}
+SEARCH_SORT = [("score", DESCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]
+TODO_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+REMINDER_SORT = [("reminder_date", ASCENDING), ("id", ASCENDING)]
+
+
+# Optimistic concurrency: every document carries a `version` bumped on each
+# write. Clients pass the version they edited via If-Match or a `version` field;
+# documents written before versioning count as version 0.
+def expected_version(if_match: Optional[str], body_version: Optional[int]) -> Optional[int]:
+    if if_match and if_match.strip() != '*':
+        try:
+            return int(if_match.strip().removeprefix('W/').strip('"'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="If-Match must be a version ETag")
+    return body_version
+
+def version_filter(version: Optional[int]) -> dict:
+    if version is None:
+        return {}
+    return {"version": {"$in": [0, None]}} if version == 0 else {"version": version}
+
+def set_etag(response: Response, doc: dict):
+    response.headers["ETag"] = f'"{doc.get("version", 0)}"'
+
+async def raise_update_failure(collection, doc_id: str, user_id: str, name: str):
+    # The atomic update matched nothing: either the document is gone or its version moved on
+    current = await collection.find_one({"id": doc_id, "user_id": user_id}, {"_id": 0, "version": 1})
+    if not current:
+        raise HTTPException(status_code=404, detail=f"{name} not found")
+    raise HTTPException(
+        status_code=412,
+        detail=f"{name} was modified by another request (current version {current.get('version', 0)})",
+        headers={"ETag": f'"{current.get("version", 0)}"'}
+    )
+
+# Change tracking: each user has one sequence in sync_counters plus a counter per
+# collection. Writes clear `sync_version` in the same update and deletes leave a
+# tombstone without one; /api/sync then numbers whatever is pending before it
+# reads. Numbering at read time means no number is handed out for a write that
+# hasn't landed yet, so a sync can't report a version past a missing document.
+# Every document gets its own number: /api/sync pages by sequence, so a number
+# shared by more documents than a page would split a page in the middle of it.
+async def next_sync_version(user_id: str, count: int = 1) -> int:
+    # Returns the first of `count` consecutive sequence numbers
+    counters = await db.sync_counters.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counters["seq"] - count + 1
+
+async def stamp_changes(user_id: str) -> int:
+    # Returns a version every number up to which has landed. Numbers handed out
+    # before `seq` was read belong to documents that were still pending when
+    # this scan ran, so stamping them here (or losing the race to the other
+    # sync) settles them. Past that, only our own blocks count, and only while
+    # no other sync reserved numbers in between.
+    counters = await db.sync_counters.find_one({"user_id": user_id}, {"_id": 0, "seq": 1}) or {}
+    version = counters.get("seq", 0)
+    for collection in (db.entries, db.todos, db.reminders, db.tombstones):
+        while True:
+            ids = [doc["_id"] for doc in await collection.find(
+                {"user_id": user_id, "sync_version": None}, {"_id": 1}
+            ).limit(SYNC_MAX_CHANGES).to_list(SYNC_MAX_CHANGES)]
+            if ids:
+                seq = await next_sync_version(user_id, len(ids))
+                await collection.bulk_write([
+                    UpdateOne({"_id": _id, "sync_version": None}, {"$set": {"sync_version": seq + offset}})
+                    for offset, _id in enumerate(ids)
+                ], ordered=False)
+                if seq == version + 1:
+                    version = seq + len(ids) - 1
+            if len(ids) < SYNC_MAX_CHANGES:
+                break
+    return version
+
+# Collection counters drive list and stats ETags. They move only once a write
+# and everything derived from it (rollups, stats cache) has landed: a GET that
+# reads the old counter may return newer data, never the other way round.
+async def mark_changed(user_id: str, collection: str):
+    await db.sync_counters.update_one({"user_id": user_id}, {"$inc": {collection: 1}}, upsert=True)
+
+async def record_deletions(user_id: str, collection: str, ids: List[str]):
+    if not ids:
+        return
+    now = datetime.now(timezone.utc)
+    await db.tombstones.insert_many([
+        {"user_id": user_id, "collection": collection, "id": doc_id, "sync_version": None, "deleted_at": now}
+        for doc_id in ids
+    ])
+
+async def not_modified(request: Request, response: Response, user_id: str, collection: str, extra: str = "") -> Optional[Response]:
+    # Lists and stats only change when the collection counter moves, so a
+    # matching If-None-Match is answered without running the query
+    counters = await db.sync_counters.find_one({"user_id": user_id}, {"_id": 0, collection: 1}) or {}
+    key = f"{user_id}:{collection}:{counters.get(collection, 0)}:{request.url.path}?{request.url.query}:{extra}"
+    etag = f'W/"{hashlib.sha256(key.encode()).hexdigest()[:20]}"'
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+async def versioned_update(collection, doc_id: str, user_id: str, name: str, update_data: dict, version: Optional[int], return_document=ReturnDocument.AFTER) -> dict:
+    update_data = {**update_data, "sync_version": None}
+    doc = await collection.find_one_and_update(
+        {"id": doc_id, "user_id": user_id, **version_filter(version)},
+        {"$set": update_data, "$inc": {"version": 1}},
+        return_document=return_document
+    )
+    if not doc:
+        await raise_update_failure(collection, doc_id, user_id, name)
+    doc.pop("_id", None)
+    return doc
+
+
+# Change events pushed to /api/ws subscribers, e.g. {"type": "todo.updated", "id": ..., "data": {...}}
+EVENT_MODELS = {"entry": EntryResponse, "todo": TodoResponse, "reminder": ReminderResponse}
+
+def change_event(kind: str, action: str, doc: dict) -> dict:
+    event = {"type": f"{kind}.{action}", "id": doc["id"]}
+    if action != "deleted":
+        event["data"] = EVENT_MODELS[kind](**doc).model_dump()
+    return event
+
+def publish_event(services: Services, user_id: str, event: dict):
+    # With change streams the relay publishes every write, including this one
+    if EVENTS_BACKEND == "local":
+        services.event_bus.publish(user_id, event)
+
+def publish_change(services: Services, user_id: str, kind: str, action: str, doc: dict):
+    if EVENTS_BACKEND == "local" and services.event_bus.has_subscribers(user_id):
+        services.event_bus.publish(user_id, change_event(kind, action, doc))
+
+async def publish_bulk_changes(services: Services, collection, kind: str, user_id: str, applied: List[tuple]):
+    if EVENTS_BACKEND != "local" or not services.event_bus.has_subscribers(user_id):
+        return
+    # Bulk update pre-images are partial snapshots, so updated documents are read back once
+    updated_ids = [op.id for _, op, _, _ in applied if op.op == "update"]
+    updated = {}
+    if updated_ids:
+        async for doc in collection.find({"user_id": user_id, "id": {"$in": updated_ids}}, {"_id": 0}):
+            updated[doc["id"]] = doc
+    for _, op, _before, after in applied:
+        if op.op == "insert":
+            publish_change(services, user_id, kind, "created", after)
+        elif op.op == "delete":
+            publish_change(services, user_id, kind, "deleted", {"id": op.id})
+        elif op.id in updated:
+            publish_change(services, user_id, kind, "updated", updated[op.id])
+
+
+# Bulk writes: every operation is checked against one snapshot read of its
+# target, then the batch goes to MongoDB as a single bulk_write. Updates and
+# deletes are conditional on the snapshot version, so anything that changed in
+# between is reported per item instead of being overwritten.
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in error.errors())
+
+async def run_bulk(
+    services: Services,
+    collection,
+    name: str,
+    user_id: str,
+    request: BulkRequest,
+    create_model,
+    update_model,
+    new_doc,
+    prepare_update=None,
+    snapshot_fields=("version",),
+    on_applied=None
+) -> BulkResponse:
+    operations = request.operations
+    target_ids = list({op.id for op in operations if op.op != "insert" and op.id})
+    snapshots = {}
+    if target_ids:
+        projection = {"_id": 0, "id": 1, **{field: 1 for field in snapshot_fields}}
+        async for doc in collection.find({"user_id": user_id, "id": {"$in": target_ids}}, projection):
+            snapshots[doc["id"]] = doc
+    
+    results: List[Optional[BulkItemResult]] = [None] * len(operations)
+    writes, planned = [], []
+    seen = set()
+    for index, op in enumerate(operations):
+        try:
+            if op.op == "insert":
+                doc = {**new_doc(user_id, create_model(**op.data)), "sync_version": None}
+                writes.append(InsertOne(doc))
+                planned.append((index, op, None, doc))
+                continue
+            if not op.id:
+                raise HTTPException(status_code=422, detail=f"{op.op} needs an id")
+            if op.id in seen:
+                raise HTTPException(status_code=422, detail=f"{name} appears more than once in this batch")
+            seen.add(op.id)
+            before = snapshots.get(op.id)
+            if before is None:
+                raise HTTPException(status_code=404, detail=f"{name} not found")
+            if op.version is not None and before.get("version", 0) != op.version:
+                raise HTTPException(status_code=412, detail=f"{name} was modified by another request (current version {before.get('version', 0)})")
+            condition = {"id": op.id, "user_id": user_id, **version_filter(before.get("version", 0))}
+            if op.op == "delete":
+                writes.append(DeleteOne(condition))
+                planned.append((index, op, before, None))
+                continue
+            update_data = {k: v for k, v in update_model(**op.data).model_dump(exclude={"version"}).items() if v is not None}
+            if prepare_update:
+                prepare_update(update_data)
+            writes.append(UpdateOne(condition, {"$set": {**update_data, "sync_version": None}, "$inc": {"version": 1}}))
+            planned.append((index, op, before, {**before, **update_data, "version": before.get("version", 0) + 1}))
+        except ValidationError as e:
+            results[index] = BulkItemResult(index=index, op=op.op, id=op.id, status_code=422, error=validation_message(e))
+        except HTTPException as e:
+            results[index] = BulkItemResult(index=index, op=op.op, id=op.id, status_code=e.status_code, error=e.detail)
+        if request.ordered and results[index] is not None:
+            break
+    
+    write_errors = {}
+    stopped_at = None
+    if writes:
+        try:
+            result = await collection.bulk_write(writes, ordered=request.ordered)
+            matched, removed = result.matched_count, result.deleted_count
+        except BulkWriteError as e:
+            write_errors = {err["index"]: err.get("errmsg", "Write failed") for err in e.details.get("writeErrors", [])}
+            if request.ordered and write_errors:
+                stopped_at = min(write_errors)
+            matched, removed = e.details.get("nMatched", 0), e.details.get("nRemoved", 0)
+    
+    applied = []
+    for position, (index, op, before, after) in enumerate(planned):
+        if position in write_errors:
+            results[index] = BulkItemResult(index=index, op=op.op, id=op.id, status_code=409, error=write_errors[position])
+        elif stopped_at is None or position < stopped_at:
+            applied.append((index, op, before, after))
+    
+    # Conditional updates/deletes that matched nothing lost a race with another
+    # writer; a second read tells which ones
+    exact = (
+        matched == sum(1 for _, op, _, _ in applied if op.op == "update")
+        and removed == sum(1 for _, op, _, _ in applied if op.op == "delete")
+    ) if writes else True
+    if not exact:
+        current = {}
+        async for doc in collection.find({"user_id": user_id, "id": {"$in": target_ids}}, {"_id": 0, "id": 1, "version": 1}):
+            current[doc["id"]] = doc.get("version", 0)
+        confirmed = []
+        for index, op, before, after in applied:
+            lost = (op.op == "update" and current.get(op.id) != after["version"]) or (op.op == "delete" and op.id in current)
+            if lost:
+                results[index] = BulkItemResult(index=index, op=op.op, id=op.id, status_code=412, error=f"{name} was modified by another request")
+            else:
+                confirmed.append((index, op, before, after))
+        applied = confirmed
+    
+    counts = {"insert": 0, "update": 0, "delete": 0}
+    for index, op, before, after in applied:
+        counts[op.op] += 1
+        results[index] = BulkItemResult(
+            index=index,
+            op=op.op,
+            id=after["id"] if after else op.id,
+            status_code=201 if op.op == "insert" else 200,
+            version=after.get("version") if after else None
+        )
+    for index, op in enumerate(operations):
+        if results[index] is None:
+            results[index] = BulkItemResult(index=index, op=op.op, id=op.id, status_code=424, error="Not executed because an earlier operation failed")
+    
+    await record_deletions(user_id, collection.name, [op.id for _, op, _, _ in applied if op.op == "delete"])
+    if on_applied and applied:
+        await on_applied(user_id, [(before, after) for _, _, before, after in applied], exact)
+    if applied:
+        await mark_changed(user_id, collection.name)
+    await publish_bulk_changes(services, collection, name.lower(), user_id, applied)
+    
+    return BulkResponse(
+        ordered=request.ordered,
+        inserted=counts["insert"],
+        updated=counts["update"],
+        deleted=counts["delete"],
+        results=results
+    )
+
+
+# Search snippets: a window of the entry around the first matched term
+SEARCH_SNIPPET_CHARS = 200
+
+def search_terms(q: str) -> List[str]:
+    # Negated terms (-word) never appear in results, so they are not highlighted
+    return [t.lower() for t in re.findall(r'(?<![\w-])\w+', q.replace('"', ' '))]
+
+def highlight_snippet(text: str, terms: List[str]) -> tuple:
+    if not terms:
+        return text[:SEARCH_SNIPPET_CHARS], []
+    # Match on word prefixes so stemmed hits ("walking" for "walk") are marked too
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(t) for t in terms) + r')\w*', re.IGNORECASE)
+    first = pattern.search(text)
+    start = max(0, first.start() - SEARCH_SNIPPET_CHARS // 4) if first else 0
+    if start > 0:
+        # Don't cut the leading word in half
+        space = text.find(' ', start)
+        start = space + 1 if 0 <= space < (first.start() if first else start) else start
+    snippet = text[start:start + SEARCH_SNIPPET_CHARS]
+    highlights = [[m.start(), m.end()] for m in pattern.finditer(snippet)]
+    return snippet, highlights
+
+
+# Stats rollups: one small document per user per day, kept in step with entry writes.
+# `date` is the entry date string used for range matching, `day` the same date as a
+# BSON datetime for bucketing in aggregation pipelines.
+def mood_key(mood: Optional[str]) -> Optional[str]:
+    # Moods become field names inside the rollup's `moods` sub-document
+    if not mood or '.' in mood or mood.startswith('$'):
+        return None
+    return mood
+
+async def apply_rollup_delta(user_id: str, date: str, entry_delta: int, word_delta: int, mood_deltas: Optional[Dict[str, int]] = None):
+    inc = {"entry_count": entry_delta, "total_words": word_delta}
+    for mood, delta in (mood_deltas or {}).items():
+        key = mood_key(mood)
+        if key and delta:
+            inc[f"moods.{key}"] = inc.get(f"moods.{key}", 0) + delta
+    inc = {k: v for k, v in inc.items() if v != 0}
+    if not inc:
+        return
+    
+    await db.entry_rollups.update_one(
+        {"user_id": user_id, "date": date},
+        {"$inc": inc, "$setOnInsert": {"day": datetime.fromisoformat(date)}},
+        upsert=True
+    )
+    if entry_delta < 0:
+        # Drop empty days so windows only ever read days that have entries
+        await db.entry_rollups.delete_one({"user_id": user_id, "date": date, "entry_count": {"$lte": 0}})
+    
+    await invalidate_stats(user_id)
+
+# Cached windows live under stats:{user_id}:{generation}:...; a write moves the
+# user to a new generation instead of editing shared values, so a slow reader
+# can only ever store its result under the generation it started from
+async def stats_generation(user_id: str) -> str:
+    generation = await shared_state.get(f"stats:{user_id}:generation")
+    if generation is None:
+        generation = uuid.uuid4().hex[:12]
+        await shared_state.set(f"stats:{user_id}:generation", generation, ttl=STATS_CACHE_TTL_SECONDS)
+    return generation
+
+async def invalidate_stats(user_id: Optional[str] = None):
+    if user_id:
+        await shared_state.set(f"stats:{user_id}:generation", uuid.uuid4().hex[:12], ttl=STATS_CACHE_TTL_SECONDS)
+    else:
+        await shared_state.delete_prefix("stats:")
+
+# Rollups are replaced in place rather than dropped and re-inserted, so live
+# apply_rollup_delta upserts never collide with a half-rebuilt collection.
+# Days left without entries are the only rollups deleted.
+async def rebuild_rollups(user_id: Optional[str] = None) -> int:
+    match = {"user_id": user_id} if user_id else {}
+    rebuild_id = uuid.uuid4().hex
+    
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "date": "$date"},
+            "entry_count": {"$sum": 1},
+            "total_words": {"$sum": {"$ifNull": ["$word_count", 0]}},
+            "moods": {"$push": "$mood"}
+        }}
+    ]
+    
+    rebuilt = 0
+    batch = []
+    async for row in db.entries.aggregate(pipeline):
+        moods = {}
+        for mood in row["moods"]:
+            key = mood_key(mood)
+            if key:
+                moods[key] = moods.get(key, 0) + 1
+        key = {"user_id": row["_id"]["user_id"], "date": row["_id"]["date"]}
+        batch.append(ReplaceOne(key, {
+            **key,
+            "day": datetime.fromisoformat(row["_id"]["date"]),
+            "entry_count": row["entry_count"],
+            "total_words": row["total_words"],
+            "moods": moods,
+            "rebuild_id": rebuild_id
+        }, upsert=True))
+        if len(batch) >= 1000:
+            await db.entry_rollups.bulk_write(batch, ordered=False)
+            rebuilt += len(batch)
+            batch = []
+    if batch:
+        await db.entry_rollups.bulk_write(batch, ordered=False)
+        rebuilt += len(batch)
+    
+    # Rollups this pass didn't write are either stale or were created by a
+    # write that landed after the aggregation; only the first kind goes
+    async for rollup in db.entry_rollups.find({**match, "rebuild_id": {"$ne": rebuild_id}}, {"moods": 0}):
+        if not await db.entries.find_one({"user_id": rollup["user_id"], "date": rollup["date"]}, {"_id": 1}):
+            # Unless a delta moved it since it was read
+            await db.entry_rollups.delete_one({k: rollup.get(k) for k in ("_id", "entry_count", "total_words", "rebuild_id")})
+    
+    await invalidate_stats(user_id)
+    # Stats ETags follow the entries counter
+    if user_id:
+        await mark_changed(user_id, "entries")
+    else:
+        await db.sync_counters.update_many({}, {"$inc": {"entries": 1}})
+    return rebuilt
+
+STATS_BUCKET_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+}
+
+def streaks(active_days: List[str], to_date: str) -> tuple:
+    longest = run = 0
+    previous = None
+    for day in active_days:
+        current = datetime.fromisoformat(day).date()
+        run = run + 1 if previous and current - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = current
+    
+    # The current streak may end on `to_date` or, if nothing is written yet that day, the day before
+    end = datetime.fromisoformat(to_date).date()
+    if previous is None or end - previous > timedelta(days=1):
+        return 0, longest
+    return run, longest
+
+async def query_window_stats(user_id: str, from_date: str, to_date: str, granularity: str) -> WindowStatsResponse:
+    generation = await stats_generation(user_id)
+    cache_key = f"stats:{user_id}:{generation}:{from_date}|{to_date}|{granularity}"
+    cached = await shared_state.get(cache_key)
+    if cached:
+        return WindowStatsResponse(**cached)
+    
+    bucket = {"$dateToString": {"format": STATS_BUCKET_FORMATS[granularity], "date": "$day"}}
+    pipeline = [
+        {"$match": {"user_id": user_id, "date": {"$gte": from_date, "$lte": to_date}}},
+        {"$project": {"_id": 0, "date": 1, "day": 1, "entry_count": 1, "total_words": 1, "moods": 1}},
+        {"$facet": {
+            "buckets": [
+                {"$group": {"_id": bucket, "entry_count": {"$sum": "$entry_count"}, "total_words": {"$sum": "$total_words"}}},
+                {"$sort": {"_id": 1}}
+            ],
+            "moods": [
+                {"$project": {"moods": {"$objectToArray": {"$ifNull": ["$moods", {}]}}}},
+                {"$unwind": "$moods"},
+                {"$group": {"_id": "$moods.k", "count": {"$sum": "$moods.v"}}}
+            ],
+            "days": [
+                {"$match": {"entry_count": {"$gt": 0}}},
+                {"$sort": {"date": 1}},
+                {"$project": {"date": 1, "entry_count": 1}}
+            ]
+        }}
+    ]
+    result = (await db.entry_rollups.aggregate(pipeline).to_list(1))[0]
+    
+    buckets = [StatsBucket(period=b["_id"], entry_count=b["entry_count"], total_words=b["total_words"]) for b in result["buckets"]]
+    entry_count = sum(b.entry_count for b in buckets)
+    total_words = sum(b.total_words for b in buckets)
+    avg_words = total_words / entry_count if entry_count > 0 else 0
+    # Earliest day wins ties
+    most_active_day = max(result["days"], key=lambda d: d["entry_count"])["date"] if result["days"] else None
+    current_streak, longest_streak = streaks([d["date"] for d in result["days"]], to_date)
+    
+    stats = WindowStatsResponse(
+        from_date=from_date,
+        to_date=to_date,
+        granularity=granularity,
+        entry_count=entry_count,
+        total_words=total_words,
+        avg_words_per_entry=round(avg_words, 1),
+        most_active_day=most_active_day,
+        buckets=buckets,
+        moods={m["_id"]: m["count"] for m in result["moods"] if m["count"] > 0},
+        current_streak=current_streak,
+        longest_streak=longest_streak
+    )
+    
+    await shared_state.set(cache_key, stats.model_dump(), ttl=STATS_CACHE_TTL_SECONDS)
+    return stats
+
+async def compute_window_stats(user_id: str, period: str, days: int) -> StatsResponse:
+    today = datetime.now(timezone.utc).date()
+    since = (today - timedelta(days=days)).isoformat()
+    stats = await query_window_stats(user_id, since, today.isoformat(), "day")
+    
+    return StatsResponse(
+        period=period,
+        entry_count=stats.entry_count,
+        total_words=stats.total_words,
+        avg_words_per_entry=stats.avg_words_per_entry,
+        most_active_day=stats.most_active_day
+    )
+
+
+# Indexes: every handler filters on user_id and sorts on a date field; single
+# documents are addressed by their `id` and users by `email`
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "entries": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("sync_version", ASCENDING)]),
+        # Prefixed with user_id so a search only walks the caller's entries
+        IndexModel(
+            [("user_id", ASCENDING), ("title", TEXT), ("content", TEXT)],
+            weights={"title": 5, "content": 1},
+            name="entries_text"
+        ),
+    ],
+    "entry_rollups": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], unique=True),
+    ],
+    "revoked_tokens": [
+        IndexModel([("token_hash", ASCENDING)], unique=True),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "shared_state": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "ai_cache": [
+        IndexModel([("key", ASCENDING)], unique=True),
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=AI_CACHE_TTL_SECONDS),
+    ],
+    "ai_jobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("run_after", ASCENDING)]),
+        IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=AI_JOB_RETENTION_SECONDS),
+    ],
+    "sync_counters": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    "tombstones": [
+        IndexModel([("user_id", ASCENDING), ("sync_version", ASCENDING)]),
+        IndexModel([("deleted_at", ASCENDING)], expireAfterSeconds=SYNC_TOMBSTONE_RETENTION_SECONDS),
+    ],
+    "imports": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=IMPORT_RETENTION_SECONDS),
+    ],
+    "todos": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("completed", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("source_entry_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("sync_version", ASCENDING)]),
+    ],
+    "reminders": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("reminder_date", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("completed", ASCENDING), ("reminder_date", ASCENDING), ("id", ASCENDING)]),
+        # Scheduler scan for reminders coming due
+        IndexModel([("completed", ASCENDING), ("notified_at", ASCENDING), ("remind_at", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("sync_version", ASCENDING)]),
+    ],
+}
+
+# (collection, filter, sort) for each query the handlers issue
+QUERY_SHAPES = {
+    "auth.login": ("users", {"email": "explain@example.com"}, None),
+    "auth.me": ("users", {"id": "explain"}, None),
+    "auth.revoked": ("revoked_tokens", {"token_hash": "explain"}, None),
+    "entries.list": ("entries", {"user_id": "explain"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    "entries.list_after": ("entries", {"user_id": "explain", **keyset_filter(ENTRY_SORT, ["2000-01-01T00:00:00+00:00", "explain"])}, ENTRY_SORT),
+    "entries.get": ("entries", {"id": "explain", "user_id": "explain"}, None),
+    "entries.search": ("entries", {"user_id": "explain", "$text": {"$search": "explain"}}, None),
+    "entries.stats_rebuild": ("entries", {"user_id": "explain"}, None),
+    "rollups.window": ("entry_rollups", {"user_id": "explain", "date": {"$gte": "2000-01-01", "$lte": "2000-12-31"}}, None),
+    "ai_jobs.get": ("ai_jobs", {"id": "explain", "user_id": "explain"}, None),
+    "ai_jobs.claim": ("ai_jobs", {"status": "queued", "run_after": {"$lte": datetime(2000, 1, 1)}}, [("run_after", ASCENDING)]),
+    "todos.list": ("todos", {"user_id": "explain"}, TODO_SORT),
+    "todos.list_pending": ("todos", {"user_id": "explain", "completed": False}, TODO_SORT),
+    "todos.by_entry": ("todos", {"user_id": "explain", "source_entry_id": "explain"}, TODO_SORT),
+    "todos.get": ("todos", {"id": "explain", "user_id": "explain"}, None),
+    "reminders.list": ("reminders", {"user_id": "explain"}, REMINDER_SORT),
+    "reminders.list_pending": ("reminders", {"user_id": "explain", "completed": False}, REMINDER_SORT),
+    "reminders.get": ("reminders", {"id": "explain", "user_id": "explain"}, None),
+    "reminders.due": ("reminders", {"completed": False, "notified_at": None, "remind_at": {"$gte": datetime(2000, 1, 1), "$lte": datetime(2000, 1, 2)}}, [("remind_at", ASCENDING)]),
+}
+
+async def ensure_indexes():
+    # create_indexes is a no-op for indexes that already exist with the same spec
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+def plan_stages(plan) -> List[str]:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+async def find_collscans() -> Dict[str, List[str]]:
+    plans = {}
+    for name, (collection, query, sort) in QUERY_SHAPES.items():
+        cursor = db[collection].find(query, {"_id": 0})
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        plans[name] = plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+    return {name: stages for name, stages in plans.items() if "COLLSCAN" in stages}
 
 
 # Auth endpoints
-@api_router.post("/auth/register", response_model=TokenResponse)
-async def register(user_data: UserRegister):
+async def enforce_rate_limit(request: Request, policy: str, key: str, cost: float = 1):
+    result = await rate_limiter.check(policy, key, cost)
+    if result is None:
+        return
+    headers = rate_limiter.headers(policy, result)
+    # RateLimitHeadersMiddleware copies these onto the response
+    request.state.rate_limit_headers = headers
+    if not result.allowed:
+        raise HTTPException(status_code=429, detail="Too many requests, please retry later", headers=headers)
+
+def limit_by_user(policy: str, cost: float = 1):
+    async def check(request: Request, user_id: str = Depends(get_current_user)):
+        await enforce_rate_limit(request, policy, user_id, cost)
+    return Depends(check)
+
+def limit_by_ip(policy: str, cost: float = 1):
+    # request.client is the X-Forwarded-For address when uvicorn trusts the proxy
+    async def check(request: Request):
+        await enforce_rate_limit(request, policy, request.client.host if request.client else "unknown", cost)
+    return Depends(check)
+
+def stats_cost(days: int) -> int:
+    return max(1, math.ceil(days / 90))
+
+@api_router.post("/auth/register", response_model=TokenResponse, dependencies=[limit_by_ip("auth")])
+async def register(user_data: UserRegister, services: Services = Depends(get_services)):
     # Check if user exists
     existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
     if existing_user:
@@ -175,12 +1349,13 @@ async def register(user_data: UserRegister):
     user_doc = {
         "id": user_id,
         "email": user_data.email,
-        "password_hash": hash_password(user_data.password),
+        "password_hash": await hash_password(services, user_data.password),
         "name": user_data.name,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.users.insert_one(user_doc)
+    await db.users.insert_one(dict(user_doc))
+    user_cache.set(user_id, {k: v for k, v in user_doc.items() if k != "password_hash"})
     
     # Generate token
     token = create_jwt_token(user_id)
@@ -195,12 +1370,22 @@ async def register(user_data: UserRegister):
         )
     )
 
-@api_router.post("/auth/login", response_model=TokenResponse)
-async def login(credentials: UserLogin):
+@api_router.post("/auth/login", response_model=TokenResponse, dependencies=[limit_by_ip("auth")])
+async def login(credentials: UserLogin, services: Services = Depends(get_services)):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user['password_hash']):
+    if not user or not await verify_password(services, credentials.password, user['password_hash']):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
+    # Upgrade hashes made with a different cost factor while we have the plaintext
+    if password_needs_rehash(user['password_hash']):
+        try:
+            new_hash = await hash_password(services, credentials.password)
+            await db.users.update_one({"id": user['id']}, {"$set": {"password_hash": new_hash}})
+            user_cache.pop(user['id'])
+        except HTTPException:
+            # Pool saturated; the next login will try again
+            pass
+    
     token = create_jwt_token(user['id'])
     
     return TokenResponse(
@@ -213,9 +1398,14 @@ async def login(credentials: UserLogin):
         )
     )
 
+@api_router.post("/auth/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security), user_id: str = Depends(get_current_user)):
+    await revoke_token(credentials.credentials)
+    return {"message": "Logged out successfully"}
+
 @api_router.get("/auth/me", response_model=UserResponse)
 async def get_me(user_id: str = Depends(get_current_user)):
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    user = await get_user_profile(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -228,344 +1418,1343 @@ async def get_me(user_id: str = Depends(get_current_user)):
 
 
 # Entry endpoints
-@api_router.post("/entries", response_model=EntryResponse)
-async def create_entry(entry_data: EntryCreate, user_id: str = Depends(get_current_user)):
-    entry_id = str(uuid.uuid4())
+def new_entry_doc(user_id: str, entry_data: EntryCreate) -> dict:
     now = datetime.now(timezone.utc).isoformat()
-    word_count = len(entry_data.content.split())
-    
-    entry_doc = {
-        "id": entry_id,
+    return {
+        "id": str(uuid.uuid4()),
         "user_id": user_id,
         "date": datetime.now(timezone.utc).date().isoformat(),
         "title": entry_data.title,
         "content": entry_data.content,
         "mood": entry_data.mood,
-        "word_count": word_count,
+        "word_count": len(entry_data.content.split()),
         "created_at": now,
-        "updated_at": now
+        "updated_at": now,
+        "version": 1
     }
+
+def set_entry_word_count(update_data: dict):
+    if 'content' in update_data:
+        update_data['word_count'] = len(update_data['content'].split())
+
+@api_router.post("/entries", response_model=EntryResponse)
+async def create_entry(entry_data: EntryCreate, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    entry_doc = new_entry_doc(user_id, entry_data)
+    entry_doc["sync_version"] = None
     
     await db.entries.insert_one(entry_doc)
+    await apply_rollup_delta(user_id, entry_doc["date"], 1, entry_doc["word_count"], {entry_doc["mood"]: 1} if entry_doc["mood"] else None)
+    await mark_changed(user_id, "entries")
+    publish_change(services, user_id, "entry", "created", entry_doc)
     
     return EntryResponse(**entry_doc)
 
-@api_router.get("/entries", response_model=List[EntryResponse])
-async def get_entries(user_id: str = Depends(get_current_user), skip: int = 0, limit: int = 50):
-    entries = await db.entries.find(
-        {"user_id": user_id},
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+async def apply_entry_bulk_rollups(user_id: str, changes: List[tuple], exact: bool):
+    if not exact:
+        # Some pre-images are unreliable after a lost race; recount this user's days
+        await rebuild_rollups(user_id)
+        return
+    days = {}
+    for before, after in changes:
+        for doc, sign in ((before, -1), (after, 1)):
+            if doc is None:
+                continue
+            day = days.setdefault(doc['date'], {"entries": 0, "words": 0, "moods": {}})
+            day["entries"] += sign
+            day["words"] += sign * doc.get('word_count', 0)
+            if doc.get('mood'):
+                day["moods"][doc['mood']] = day["moods"].get(doc['mood'], 0) + sign
+    for date, day in days.items():
+        await apply_rollup_delta(user_id, date, day["entries"], day["words"], day["moods"])
+
+@api_router.post("/entries/bulk", response_model=BulkResponse)
+async def bulk_entries(request: BulkRequest, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    return await run_bulk(
+        services, db.entries, "Entry", user_id, request, EntryCreate, EntryUpdate, new_entry_doc,
+        prepare_update=set_entry_word_count,
+        snapshot_fields=("version", "date", "word_count", "mood"),
+        on_applied=apply_entry_bulk_rollups
+    )
+
+@api_router.get("/entries", response_model=Union[List[EntryResponse], List[EntryPreviewResponse]])
+async def get_entries(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Literal["full", "preview"] = "full"
+):
+    cached = await not_modified(request, response, user_id, "entries")
+    if cached:
+        return cached
+    
+    # With a cursor, `skip` is ignored and the page starts right after the cursor
+    projection = ENTRY_PREVIEW_PROJECTION if fields == "preview" else model_projection(EntryResponse)
+    entries = await fetch_keyset_page(
+        db.entries, {"user_id": user_id}, ENTRY_SORT, limit, cursor, response,
+        projection=projection, skip=0 if cursor else skip
+    )
     
+    if JSON_FAST_PATH:
+        return fast_json(entries, EntryPreviewResponse if fields == "preview" else EntryResponse, response)
+    if fields == "preview":
+        return [EntryPreviewResponse(**entry) for entry in entries]
     return [EntryResponse(**entry) for entry in entries]
 
+@api_router.get("/entries/search", response_model=List[EntrySearchHit])
+async def search_entries(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    user_id: str = Depends(get_current_user),
+    mood: Optional[str] = None,
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = None
+):
+    # $text must lead the first $match for the text index to be used
+    match = {"user_id": user_id, "$text": {"$search": q}, **range_filter("date", from_date, to_date)}
+    if mood:
+        match["mood"] = mood
+    
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "_id": 0, "id": 1, "date": 1, "title": 1, "content": 1, "mood": 1,
+            "word_count": 1, "created_at": 1, "updated_at": 1,
+            "score": {"$meta": "textScore"}
+        }},
+    ]
+    if cursor:
+        pipeline.append({"$match": keyset_filter(SEARCH_SORT, decode_cursor(cursor, len(SEARCH_SORT)))})
+    pipeline += [
+        {"$sort": {field: direction for field, direction in SEARCH_SORT}},
+        {"$limit": limit + 1},
+    ]
+    hits = await db.entries.aggregate(pipeline).to_list(limit + 1)
+    
+    if len(hits) > limit:
+        hits = hits[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor([hits[-1][field] for field, _ in SEARCH_SORT])
+    
+    terms = search_terms(q)
+    results = []
+    for hit in hits:
+        snippet, highlights = highlight_snippet(hit.pop("content"), terms)
+        results.append(EntrySearchHit(**hit, snippet=snippet, highlights=highlights))
+    return results
+
 @api_router.get("/entries/{entry_id}", response_model=EntryResponse)
-async def get_entry(entry_id: str, user_id: str = Depends(get_current_user)):
+async def get_entry(entry_id: str, response: Response, user_id: str = Depends(get_current_user)):
     entry = await db.entries.find_one({"id": entry_id, "user_id": user_id}, {"_id": 0})
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
+    set_etag(response, entry)
     return EntryResponse(**entry)
 
 @api_router.put("/entries/{entry_id}", response_model=EntryResponse)
-async def update_entry(entry_id: str, entry_data: EntryUpdate, user_id: str = Depends(get_current_user)):
-    entry = await db.entries.find_one({"id": entry_id, "user_id": user_id}, {"_id": 0})
-    if not entry:
-        raise HTTPException(status_code=404, detail="Entry not found")
-    
-    update_data = {k: v for k, v in entry_data.model_dump().items() if v is not None}
-    
-    if 'content' in update_data:
-        update_data['word_count'] = len(update_data['content'].split())
-    
+async def update_entry(
+    entry_id: str,
+    entry_data: EntryUpdate,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    services: Services = Depends(get_services),
+    if_match: Optional[str] = Header(None)
+):
+    version = expected_version(if_match, entry_data.version)
+    update_data = {k: v for k, v in entry_data.model_dump(exclude={"version"}).items() if v is not None}
+    set_entry_word_count(update_data)
     update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
     
-    await db.entries.update_one({"id": entry_id}, {"$set": update_data})
+    # One round trip: the pre-image feeds the rollup deltas, the post-image is derived from it
+    entry = await versioned_update(db.entries, entry_id, user_id, "Entry", update_data, version, ReturnDocument.BEFORE)
+    updated_entry = {**entry, **update_data, "version": entry.get("version", 0) + 1}
     
-    updated_entry = await db.entries.find_one({"id": entry_id}, {"_id": 0})
+    await apply_entry_change(user_id, entry, updated_entry)
+    await mark_changed(user_id, "entries")
+    publish_change(services, user_id, "entry", "updated", updated_entry)
+    
+    set_etag(response, updated_entry)
     return EntryResponse(**updated_entry)
 
+async def apply_entry_change(user_id: str, before: dict, after: dict):
+    word_delta = after.get('word_count', 0) - before.get('word_count', 0)
+    mood_deltas = {}
+    if after.get('mood') != before.get('mood'):
+        if before.get('mood'):
+            mood_deltas[before['mood']] = -1
+        if after.get('mood'):
+            mood_deltas[after['mood']] = 1
+    await apply_rollup_delta(user_id, before['date'], 0, word_delta, mood_deltas)
+
+# Autosave: clients send text deltas against the version they last saw instead
+# of the whole entry. The stored word_count is adjusted from the edited spans.
+def apply_entry_patch(entry: Optional[dict], patch: EntryPatch) -> dict:
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    if entry.get('version', 0) != patch.version:
+        raise HTTPException(
+            status_code=412,
+            detail=f"Entry was modified by another request (current version {entry.get('version', 0)})",
+            headers={"ETag": f'"{entry.get("version", 0)}"'}
+        )
+    content = entry['content']
+    word_count = entry.get('word_count', len(content.split()))
+    try:
+        for op in patch.ops:
+            content, word_count = apply_text_op(content, word_count, op.offset, op.delete, op.insert)
+    except TextOpError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    patched = {**entry, 'content': content, 'word_count': word_count, 'version': patch.version + 1}
+    if patch.title is not None:
+        patched['title'] = patch.title
+    if patch.mood is not None:
+        patched['mood'] = patch.mood
+    patched['updated_at'] = datetime.now(timezone.utc).isoformat()
+    return patched
+
+async def load_patch_entry(key):
+    user_id, entry_id = key
+    return await db.entries.find_one({"id": entry_id, "user_id": user_id}, {"_id": 0})
+
+async def store_patched_entry(services: Services, key, before: dict, after: dict) -> bool:
+    user_id, entry_id = key
+    fields = {k: after[k] for k in ('content', 'word_count', 'title', 'mood', 'updated_at', 'version')}
+    fields['sync_version'] = None
+    result = await db.entries.update_one(
+        {"id": entry_id, "user_id": user_id, **version_filter(before.get('version', 0))},
+        {"$set": fields}
+    )
+    if not result.matched_count:
+        return False
+    await apply_entry_change(user_id, before, after)
+    await mark_changed(user_id, "entries")
+    publish_change(services, user_id, "entry", "updated", after)
+    return True
+
+@api_router.patch("/entries/{entry_id}", response_model=EntryResponse)
+async def patch_entry(
+    entry_id: str,
+    patch: EntryPatch,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    services: Services = Depends(get_services),
+    if_match: Optional[str] = Header(None)
+):
+    patch.version = expected_version(if_match, patch.version)
+    if patch.version is None:
+        raise HTTPException(status_code=428, detail="PATCH needs the base version via If-Match or a version field")
+    
+    patched = await services.entry_patches.submit((user_id, entry_id), patch)
+    set_etag(response, patched)
+    return EntryResponse(**patched)
+
 @api_router.delete("/entries/{entry_id}")
-async def delete_entry(entry_id: str, user_id: str = Depends(get_current_user)):
-    result = await db.entries.delete_one({"id": entry_id, "user_id": user_id})
-    if result.deleted_count == 0:
+async def delete_entry(entry_id: str, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    deleted = await db.entries.find_one_and_delete(
+        {"id": entry_id, "user_id": user_id},
+        {"_id": 0, "date": 1, "word_count": 1, "mood": 1}
+    )
+    if not deleted:
         raise HTTPException(status_code=404, detail="Entry not found")
     
+    await apply_rollup_delta(user_id, deleted['date'], -1, -deleted.get('word_count', 0), {deleted['mood']: -1} if deleted.get('mood') else None)
+    await record_deletions(user_id, "entries", [entry_id])
+    await mark_changed(user_id, "entries")
+    publish_change(services, user_id, "entry", "deleted", {"id": entry_id})
+    
     return {"message": "Entry deleted successfully"}
 
 
 # AI endpoints
-@api_router.post("/ai/improve-text", response_model=AIResponse)
-async def improve_text(request: AIRequest, user_id: str = Depends(get_current_user)):
-    if not groq_client:
-        raise HTTPException(status_code=503, detail="AI service not configured. Please set GROQ_API_KEY in .env")
+AI_TASKS = {
+    "improve-text": {
+        "system": "You are an English writing assistant. Improve the given text for grammar, clarity, and style while maintaining the original meaning and tone. Return only the improved text without explanations.",
+        "temperature": 0.7,
+        "max_tokens": 2000,
+    },
+    "summarize": {
+        "system": "You are a diary entry summarizer. Create a concise, meaningful summary of the given diary entry. Capture the key events, emotions, and insights. Return only the summary without explanations.",
+        "temperature": 0.7,
+        "max_tokens": 500,
+    },
+    "extract-todos": {
+        "system": "You are a task extraction assistant. Analyze the diary entry and extract actionable tasks or to-dos mentioned. Return them as a simple numbered list. If no tasks are found, return 'No tasks found'.",
+        "temperature": 0.5,
+        "max_tokens": 500,
+    },
+    "generate-suggestions": {
+        "system": "You are a personal growth coach. Based on the diary entry, provide 2-3 thoughtful suggestions for personal improvement, productivity, or well-being. Be encouraging and specific. Format as a simple numbered list.",
+        "temperature": 0.8,
+        "max_tokens": 600,
+    },
+}
+
+def ai_cache_key(task: str, text: str) -> str:
+    spec = AI_TASKS[task]
+    payload = json.dumps([task, AI_MODEL, spec["system"], spec["temperature"], spec["max_tokens"], text])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+async def get_cached_ai_result(key: str) -> Optional[str]:
+    result = ai_cache.get(key)
+    if result is not None:
+        ai_cache_lookups.inc(result="memory_hit")
+        return result
+    if AI_CACHE_PERSISTENT:
+        doc = await db.ai_cache.find_one({"key": key}, {"_id": 0, "result": 1})
+        if doc:
+            ai_cache_lookups.inc(result="persistent_hit")
+            ai_cache.set(key, doc["result"])
+            return doc["result"]
+    ai_cache_lookups.inc(result="miss")
+    return None
+
+async def store_ai_result(key: str, result: str):
+    ai_cache.set(key, result)
+    if AI_CACHE_PERSISTENT:
+        await db.ai_cache.update_one(
+            {"key": key},
+            {"$set": {"result": result, "created_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+async def acquire_ai_budget(services: Services):
+    # The local bucket smooths bursts; with several workers the shared window
+    # keeps all of them together under the upstream per-minute limit
+    await services.ai_rate_limiter.acquire()
+    if SHARED_STATE_BACKEND != "memory":
+        await shared_state.throttle("ratelimit:ai-upstream", int(AI_RATE_LIMIT_PER_MINUTE), 60)
+
+def ai_outcome(error: Exception) -> str:
+    return "rate_limited" if is_rate_limited(error) else "error"
+
+def record_ai_call(task: str, started: float, outcome: str, usage=None):
+    seconds = time.perf_counter() - started
+    ai_request_duration.observe(seconds, task=task, outcome=outcome)
+    add_timing("ai", seconds)
+    if usage is not None:
+        ai_tokens.inc(usage.prompt_tokens or 0, task=task, kind="prompt")
+        ai_tokens.inc(usage.completion_tokens or 0, task=task, kind="completion")
+
+async def complete_ai_task(services: Services, task: str, text: str) -> str:
+    # Raises upstream errors unchanged so callers can tell rate limits from failures
+    key = ai_cache_key(task, text)
+    cached = await get_cached_ai_result(key)
+    if cached is not None:
+        return cached
     
+    spec = AI_TASKS[task]
+    await acquire_ai_budget(services)
     try:
-        completion = await groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are an English writing assistant. Improve the given text for grammar, clarity, and style while maintaining the original meaning and tone. Return only the improved text without explanations."},
-                {"role": "user", "content": request.text}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
-        return AIResponse(result=completion.choices[0].message.content)
+        async with services.ai_semaphore:
+            started = time.perf_counter()
+            completion = await services.ai_client.chat.completions.create(
+                model=AI_MODEL,
+                messages=[
+                    {"role": "system", "content": spec["system"]},
+                    {"role": "user", "content": text}
+                ],
+                temperature=spec["temperature"],
+                max_tokens=spec["max_tokens"]
+            )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
+        record_ai_call(task, started, ai_outcome(e))
+        retry_after = retry_after_seconds(e)
+        if retry_after:
+            services.ai_rate_limiter.drain(retry_after)
+        raise
+    record_ai_call(task, started, "ok", completion.usage)
+    result = completion.choices[0].message.content
+    
+    await store_ai_result(key, result)
+    return result
 
-@api_router.post("/ai/summarize", response_model=AIResponse)
-async def summarize_text(request: AIRequest, user_id: str = Depends(get_current_user)):
-    if not groq_client:
+async def run_ai_task(services: Services, task: str, text: str) -> AIResponse:
+    if not services.ai_client:
         raise HTTPException(status_code=503, detail="AI service not configured. Please set GROQ_API_KEY in .env")
     
     try:
-        completion = await groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a diary entry summarizer. Create a concise, meaningful summary of the given diary entry. Capture the key events, emotions, and insights. Return only the summary without explanations."},
-                {"role": "user", "content": request.text}
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        return AIResponse(result=completion.choices[0].message.content)
+        return AIResponse(result=await complete_ai_task(services, task, text))
     except Exception as e:
+        if is_rate_limited(e):
+            retry_after = retry_after_seconds(e)
+            raise HTTPException(
+                status_code=429,
+                detail="AI service is busy, please retry shortly or submit a background job",
+                headers={"Retry-After": str(int(retry_after or 1))}
+            )
         raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
 
-@api_router.post("/ai/extract-todos", response_model=AIResponse)
-async def extract_todos(request: AIRequest, user_id: str = Depends(get_current_user)):
-    if not groq_client:
-        raise HTTPException(status_code=503, detail="AI service not configured. Please set GROQ_API_KEY in .env")
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def stream_ai_task(services: Services, task: str, text: str, request: Request):
+    key = ai_cache_key(task, text)
+    cached = await get_cached_ai_result(key)
+    if cached is not None:
+        yield sse_event({"delta": cached})
+        yield sse_event({"result": cached}, event="done")
+        return
     
+    spec = AI_TASKS[task]
+    stream = None
+    parts = []
+    usage = None
+    outcome = "cancelled"
+    await acquire_ai_budget(services)
+    await services.ai_semaphore.acquire()
+    started = time.perf_counter()
     try:
-        completion = await groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        stream = await services.ai_client.chat.completions.create(
+            model=AI_MODEL,
             messages=[
-                {"role": "system", "content": "You are a task extraction assistant. Analyze the diary entry and extract actionable tasks or to-dos mentioned. Return them as a simple numbered list. If no tasks are found, return 'No tasks found'."},
-                {"role": "user", "content": request.text}
+                {"role": "system", "content": spec["system"]},
+                {"role": "user", "content": text}
             ],
-            temperature=0.5,
-            max_tokens=500
+            temperature=spec["temperature"],
+            max_tokens=spec["max_tokens"],
+            stream=True
         )
-        return AIResponse(result=completion.choices[0].message.content)
+        async for chunk in stream:
+            if await request.is_disconnected():
+                return
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+            # Groq reports usage on the final chunk
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+        outcome = "ok"
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
+        outcome = ai_outcome(e)
+        yield sse_event({"detail": f"AI service error: {str(e)}"}, event="error")
+        return
+    finally:
+        # Closing the upstream response stops generation when the client goes away
+        if stream is not None:
+            await stream.close()
+        services.ai_semaphore.release()
+        record_ai_call(task, started, outcome, usage)
+    
+    result = "".join(parts)
+    await store_ai_result(key, result)
+    yield sse_event({"result": result}, event="done")
+
+@api_router.post("/ai/{task}/stream", dependencies=[limit_by_user("ai")])
+async def stream_ai(task: str, body: AIRequest, request: Request, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    if task not in AI_TASKS:
+        raise HTTPException(status_code=404, detail="Unknown AI task")
+    if not services.ai_client:
+        raise HTTPException(status_code=503, detail="AI service not configured. Please set GROQ_API_KEY in .env")
+    
+    return StreamingResponse(
+        stream_ai_task(services, task, body.text, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/ai/improve-text", response_model=AIResponse, dependencies=[limit_by_user("ai")])
+async def improve_text(request: AIRequest, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    return await run_ai_task(services, "improve-text", request.text)
+
+@api_router.post("/ai/summarize", response_model=AIResponse, dependencies=[limit_by_user("ai")])
+async def summarize_text(request: AIRequest, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    return await run_ai_task(services, "summarize", request.text)
+
+@api_router.post("/ai/extract-todos", response_model=AIResponse, dependencies=[limit_by_user("ai")])
+async def extract_todos(request: AIRequest, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    return await run_ai_task(services, "extract-todos", request.text)
 
-@api_router.post("/ai/generate-suggestions", response_model=AIResponse)
-async def generate_suggestions(request: AIRequest, user_id: str = Depends(get_current_user)):
-    if not groq_client:
+@api_router.post("/ai/generate-suggestions", response_model=AIResponse, dependencies=[limit_by_user("ai")])
+async def generate_suggestions(request: AIRequest, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    return await run_ai_task(services, "generate-suggestions", request.text)
+
+TODO_LINE = re.compile(r'^\s*\d+[.)]\s+(.+)$')
+
+def parse_todo_lines(result: str) -> List[str]:
+    return [m.group(1).strip() for m in map(TODO_LINE.match, result.splitlines()) if m]
+
+@api_router.post("/ai/analyze", response_model=AIAnalyzeResponse)
+async def analyze_entry(request: AIAnalyzeRequest, http_request: Request, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    if not services.ai_client:
         raise HTTPException(status_code=503, detail="AI service not configured. Please set GROQ_API_KEY in .env")
+    await enforce_rate_limit(http_request, "ai", user_id, cost=max(1, len(set(request.tasks))))
+    if request.entry_id and not await db.entries.find_one({"id": request.entry_id, "user_id": user_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Entry not found")
     
-    try:
-        completion = await groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a personal growth coach. Based on the diary entry, provide 2-3 thoughtful suggestions for personal improvement, productivity, or well-being. Be encouraging and specific. Format as a simple numbered list."},
-                {"role": "user", "content": request.text}
-            ],
-            temperature=0.8,
-            max_tokens=600
-        )
-        return AIResponse(result=completion.choices[0].message.content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
+    # Tasks run concurrently; ai_semaphore keeps the upstream fan-out bounded
+    tasks = list(dict.fromkeys(request.tasks))
+    outcomes = await asyncio.gather(*(run_ai_task(services, task, request.text) for task in tasks), return_exceptions=True)
+    
+    results, errors = {}, {}
+    for task, outcome in zip(tasks, outcomes):
+        if isinstance(outcome, HTTPException):
+            errors[task] = outcome.detail
+        elif isinstance(outcome, Exception):
+            raise outcome
+        else:
+            results[task] = outcome.result
+    
+    todos = []
+    if request.save_todos and "extract-todos" in results:
+        now = datetime.now(timezone.utc).isoformat()
+        todo_docs = [{
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "text": text,
+            "completed": False,
+            "due_date": None,
+            "source_entry_id": request.entry_id,
+            "created_at": now,
+            "version": 1
+        } for text in parse_todo_lines(results["extract-todos"])]
+        if todo_docs:
+            await db.todos.insert_many([{**doc, "sync_version": None} for doc in todo_docs])
+            await mark_changed(user_id, "todos")
+            for doc in todo_docs:
+                publish_change(services, user_id, "todo", "created", doc)
+        todos = [TodoResponse(**doc) for doc in todo_docs]
+    
+    return AIAnalyzeResponse(results=results, errors=errors, todos=todos)
+
+def job_response(job: dict) -> AIJobResponse:
+    dates = {k: job[k].isoformat() if job.get(k) else None for k in ("created_at", "updated_at", "finished_at")}
+    return AIJobResponse(
+        id=job["id"],
+        task=job["task"],
+        status=job["status"],
+        attempts=job["attempts"],
+        result=job.get("result"),
+        error=job.get("error"),
+        **dates
+    )
+
+@api_router.post("/ai/jobs", response_model=AIJobResponse, status_code=status.HTTP_202_ACCEPTED, dependencies=[limit_by_user("ai")])
+async def submit_ai_job(request: AIJobCreate, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    if not services.ai_client:
+        raise HTTPException(status_code=503, detail="AI service not configured. Please set GROQ_API_KEY in .env")
+    
+    job = await services.ai_job_queue.submit(user_id, request.task, request.text)
+    return job_response(job)
+
+@api_router.get("/ai/jobs/{job_id}", response_model=AIJobResponse)
+async def get_ai_job(job_id: str, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    job = await services.ai_job_queue.get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job_response(job)
+
+async def stream_ai_job(services: Services, job_id: str, user_id: str, request: Request):
+    last_status = None
+    while not await request.is_disconnected():
+        job = await services.ai_job_queue.get(job_id, user_id)
+        if not job:
+            yield sse_event({"detail": "Job not found"}, event="error")
+            return
+        if job["status"] != last_status or job["status"] in ("succeeded", "failed"):
+            last_status = job["status"]
+            yield sse_event(job_response(job).model_dump(), event=job["status"])
+            if job["status"] in ("succeeded", "failed"):
+                return
+        await asyncio.sleep(0.5)
+
+@api_router.get("/ai/jobs/{job_id}/events")
+async def get_ai_job_events(job_id: str, request: Request, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    if not await services.ai_job_queue.get(job_id, user_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return StreamingResponse(
+        stream_ai_job(services, job_id, user_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # Todo endpoints
+def todo_filter(user_id: str, status: str, due_from: Optional[str], due_to: Optional[str], source_entry_id: Optional[str]) -> dict:
+    query = {"user_id": user_id, **status_filter(status), **range_filter("due_date", due_from, due_to)}
+    if source_entry_id:
+        query["source_entry_id"] = source_entry_id
+    return query
+
 @api_router.get("/todos", response_model=List[TodoResponse])
-async def get_todos(user_id: str = Depends(get_current_user)):
-    todos = await db.todos.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+async def get_todos(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    status: Literal["all", "completed", "pending"] = "all",
+    due_from: Optional[str] = None,
+    due_to: Optional[str] = None,
+    source_entry_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    cached = await not_modified(request, response, user_id, "todos")
+    if cached:
+        return cached
+    
+    query = todo_filter(user_id, status, due_from, due_to, source_entry_id)
+    todos = await fetch_keyset_page(db.todos, query, TODO_SORT, limit, cursor, response, projection=model_projection(TodoResponse))
+    if JSON_FAST_PATH:
+        return fast_json(todos, TodoResponse, response)
     return [TodoResponse(**todo) for todo in todos]
 
-@api_router.post("/todos", response_model=TodoResponse)
-async def create_todo(todo_data: TodoCreate, user_id: str = Depends(get_current_user)):
-    todo_id = str(uuid.uuid4())
-    
-    todo_doc = {
-        "id": todo_id,
+@api_router.get("/todos/counts", response_model=StatusCounts)
+async def get_todo_counts(
+    user_id: str = Depends(get_current_user),
+    due_from: Optional[str] = None,
+    due_to: Optional[str] = None,
+    source_entry_id: Optional[str] = None
+):
+    return await count_by_status(db.todos, todo_filter(user_id, "all", due_from, due_to, source_entry_id))
+
+def new_todo_doc(user_id: str, todo_data: TodoCreate) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
         "user_id": user_id,
         "text": todo_data.text,
         "completed": False,
         "due_date": todo_data.due_date,
         "source_entry_id": todo_data.source_entry_id,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "version": 1
     }
+
+@api_router.post("/todos", response_model=TodoResponse)
+async def create_todo(todo_data: TodoCreate, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    todo_doc = new_todo_doc(user_id, todo_data)
+    todo_doc["sync_version"] = None
     
     await db.todos.insert_one(todo_doc)
+    await mark_changed(user_id, "todos")
+    publish_change(services, user_id, "todo", "created", todo_doc)
     return TodoResponse(**todo_doc)
 
+@api_router.post("/todos/bulk", response_model=BulkResponse)
+async def bulk_todos(request: BulkRequest, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    return await run_bulk(services, db.todos, "Todo", user_id, request, TodoCreate, TodoUpdate, new_todo_doc)
+
 @api_router.put("/todos/{todo_id}", response_model=TodoResponse)
-async def update_todo(todo_id: str, todo_data: TodoUpdate, user_id: str = Depends(get_current_user)):
-    todo = await db.todos.find_one({"id": todo_id, "user_id": user_id}, {"_id": 0})
-    if not todo:
-        raise HTTPException(status_code=404, detail="Todo not found")
+async def update_todo(
+    todo_id: str,
+    todo_data: TodoUpdate,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    services: Services = Depends(get_services),
+    if_match: Optional[str] = Header(None)
+):
+    version = expected_version(if_match, todo_data.version)
+    update_data = {k: v for k, v in todo_data.model_dump(exclude={"version"}).items() if v is not None}
     
-    update_data = {k: v for k, v in todo_data.model_dump().items() if v is not None}
-    await db.todos.update_one({"id": todo_id}, {"$set": update_data})
-    
-    updated_todo = await db.todos.find_one({"id": todo_id}, {"_id": 0})
+    updated_todo = await versioned_update(db.todos, todo_id, user_id, "Todo", update_data, version)
+    await mark_changed(user_id, "todos")
+    publish_change(services, user_id, "todo", "updated", updated_todo)
+    set_etag(response, updated_todo)
     return TodoResponse(**updated_todo)
 
 @api_router.delete("/todos/{todo_id}")
-async def delete_todo(todo_id: str, user_id: str = Depends(get_current_user)):
+async def delete_todo(todo_id: str, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
     result = await db.todos.delete_one({"id": todo_id, "user_id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Todo not found")
+    await record_deletions(user_id, "todos", [todo_id])
+    await mark_changed(user_id, "todos")
+    publish_change(services, user_id, "todo", "deleted", {"id": todo_id})
     
     return {"message": "Todo deleted successfully"}
 
 
 # Reminder endpoints
 @api_router.get("/reminders", response_model=List[ReminderResponse])
-async def get_reminders(user_id: str = Depends(get_current_user)):
-    reminders = await db.reminders.find({"user_id": user_id}, {"_id": 0}).sort("reminder_date", 1).to_list(1000)
+async def get_reminders(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    status: Literal["all", "completed", "pending"] = "all",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    cached = await not_modified(request, response, user_id, "reminders")
+    if cached:
+        return cached
+    
+    query = {"user_id": user_id, **status_filter(status), **range_filter("reminder_date", date_from, date_to)}
+    reminders = await fetch_keyset_page(db.reminders, query, REMINDER_SORT, limit, cursor, response, projection=model_projection(ReminderResponse))
+    if JSON_FAST_PATH:
+        return fast_json(reminders, ReminderResponse, response)
     return [ReminderResponse(**reminder) for reminder in reminders]
 
-@api_router.post("/reminders", response_model=ReminderResponse)
-async def create_reminder(reminder_data: ReminderCreate, user_id: str = Depends(get_current_user)):
-    reminder_id = str(uuid.uuid4())
-    
-    reminder_doc = {
-        "id": reminder_id,
+@api_router.get("/reminders/counts", response_model=StatusCounts)
+async def get_reminder_counts(
+    user_id: str = Depends(get_current_user),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    query = {"user_id": user_id, **range_filter("reminder_date", date_from, date_to)}
+    return await count_by_status(db.reminders, query)
+
+def build_notifiers(services: Services) -> list:
+    notifiers = []
+    for name in REMINDER_NOTIFIERS:
+        if name == "log":
+            notifiers.append(LogNotifier())
+        elif name == "websocket":
+            notifiers.append(WebSocketNotifier(partial(publish_event, services)))
+        elif name == "webhook" and REMINDER_WEBHOOK_URL:
+            notifiers.append(WebhookNotifier(REMINDER_WEBHOOK_URL))
+        else:
+            logger.warning(f"Ignoring reminder notifier {name!r}")
+    return notifiers
+
+def parse_remind_at(reminder_date: str) -> Optional[datetime]:
+    # The web client sends UTC instants (toISOString); values without an offset are taken as UTC
+    try:
+        remind_at = datetime.fromisoformat(reminder_date)
+    except ValueError:
+        return None
+    if remind_at.tzinfo is None:
+        remind_at = remind_at.replace(tzinfo=timezone.utc)
+    # BSON dates keep milliseconds, and the scheduler matches on this value
+    return remind_at.astimezone(timezone.utc).replace(microsecond=remind_at.microsecond // 1000 * 1000)
+
+def reminder_schedule_fields(reminder_date: str) -> dict:
+    return {"remind_at": parse_remind_at(reminder_date), "notified_at": None}
+
+async def backfill_remind_at() -> int:
+    # Reminders created before the scheduler existed have no remind_at, so its
+    # range scan never sees them. Unparseable dates are stamped with None.
+    stamped = 0
+    while True:
+        docs = await db.reminders.find(
+            {"remind_at": {"$exists": False}}, {"_id": 0, "id": 1, "reminder_date": 1}
+        ).limit(1000).to_list(1000)
+        if not docs:
+            return stamped
+        await db.reminders.bulk_write([
+            UpdateOne({"id": doc["id"], "remind_at": {"$exists": False}}, {"$set": reminder_schedule_fields(doc.get("reminder_date", ""))})
+            for doc in docs
+        ], ordered=False)
+        stamped += len(docs)
+
+def prepare_reminder_update(update_data: dict):
+    if 'reminder_date' in update_data:
+        update_data.update(reminder_schedule_fields(update_data['reminder_date']))
+
+async def schedule_bulk_reminders(services: Services, user_id: str, changes: List[tuple], exact: bool):
+    for _before, after in changes:
+        if after is not None:
+            services.reminder_scheduler.schedule(after["id"], after.get("remind_at"))
+
+def new_reminder_doc(user_id: str, reminder_data: ReminderCreate) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
         "user_id": user_id,
         "text": reminder_data.text,
         "reminder_date": reminder_data.reminder_date,
         "completed": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "version": 1,
+        **reminder_schedule_fields(reminder_data.reminder_date)
     }
+
+@api_router.post("/reminders", response_model=ReminderResponse)
+async def create_reminder(reminder_data: ReminderCreate, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    reminder_doc = new_reminder_doc(user_id, reminder_data)
+    reminder_doc["sync_version"] = None
     
     await db.reminders.insert_one(reminder_doc)
+    await mark_changed(user_id, "reminders")
+    services.reminder_scheduler.schedule(reminder_doc["id"], reminder_doc["remind_at"])
+    publish_change(services, user_id, "reminder", "created", reminder_doc)
     return ReminderResponse(**reminder_doc)
 
+@api_router.post("/reminders/bulk", response_model=BulkResponse)
+async def bulk_reminders(request: BulkRequest, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
+    return await run_bulk(
+        services, db.reminders, "Reminder", user_id, request, ReminderCreate, ReminderUpdate, new_reminder_doc,
+        prepare_update=prepare_reminder_update,
+        on_applied=partial(schedule_bulk_reminders, services)
+    )
+
 @api_router.put("/reminders/{reminder_id}", response_model=ReminderResponse)
-async def update_reminder(reminder_id: str, reminder_data: ReminderUpdate, user_id: str = Depends(get_current_user)):
-    reminder = await db.reminders.find_one({"id": reminder_id, "user_id": user_id}, {"_id": 0})
-    if not reminder:
-        raise HTTPException(status_code=404, detail="Reminder not found")
-    
-    update_data = {k: v for k, v in reminder_data.model_dump().items() if v is not None}
-    await db.reminders.update_one({"id": reminder_id}, {"$set": update_data})
+async def update_reminder(
+    reminder_id: str,
+    reminder_data: ReminderUpdate,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    services: Services = Depends(get_services),
+    if_match: Optional[str] = Header(None)
+):
+    version = expected_version(if_match, reminder_data.version)
+    update_data = {k: v for k, v in reminder_data.model_dump(exclude={"version"}).items() if v is not None}
+    prepare_reminder_update(update_data)
     
-    updated_reminder = await db.reminders.find_one({"id": reminder_id}, {"_id": 0})
+    updated_reminder = await versioned_update(db.reminders, reminder_id, user_id, "Reminder", update_data, version)
+    await mark_changed(user_id, "reminders")
+    services.reminder_scheduler.schedule(reminder_id, updated_reminder.get("remind_at"))
+    publish_change(services, user_id, "reminder", "updated", updated_reminder)
+    set_etag(response, updated_reminder)
     return ReminderResponse(**updated_reminder)
 
 @api_router.delete("/reminders/{reminder_id}")
-async def delete_reminder(reminder_id: str, user_id: str = Depends(get_current_user)):
+async def delete_reminder(reminder_id: str, user_id: str = Depends(get_current_user), services: Services = Depends(get_services)):
     result = await db.reminders.delete_one({"id": reminder_id, "user_id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Reminder not found")
+    await record_deletions(user_id, "reminders", [reminder_id])
+    await mark_changed(user_id, "reminders")
+    publish_change(services, user_id, "reminder", "deleted", {"id": reminder_id})
     
     return {"message": "Reminder deleted successfully"}
 
 
-# Statistics endpoints
-@api_router.get("/stats/weekly", response_model=StatsResponse)
-async def get_weekly_stats(user_id: str = Depends(get_current_user)):
-    # Get entries from last 7 days
-    seven_days_ago = (datetime.now(timezone.utc) - timedelta(days=7)).date().isoformat()
-    entries = await db.entries.find(
-        {"user_id": user_id, "date": {"$gte": seven_days_ago}},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    entry_count = len(entries)
-    total_words = sum(entry.get('word_count', 0) for entry in entries)
-    avg_words = total_words / entry_count if entry_count > 0 else 0
+# Export / import
+# One NDJSON line per document, tagged with its type. Exports stream straight
+# from the cursors; imports are parsed as the upload arrives and written in
+# insert_many batches, with progress kept in the imports collection.
+EXPORT_KINDS = {
+    "entry": ("entries", ENTRY_SORT, EntryResponse),
+    "todo": ("todos", TODO_SORT, TodoResponse),
+    "reminder": ("reminders", REMINDER_SORT, ReminderResponse),
+}
+# Scheduler bookkeeping is derived on import, so it stays out of the file
+EXPORT_PROJECTION = {"_id": 0, "user_id": 0, "sync_version": 0, "remind_at": 0, "notified_at": 0, "lease_until": 0, "lease_owner": 0, "notify_attempts": 0, "notify_error": 0}
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "ndjson.gz": ("application/gzip", "ndjson.gz"),
+    "zip": ("application/zip", "zip"),
+}
+
+async def export_records(user_id: str, kinds) -> AsyncIterator[dict]:
+    for kind in kinds:
+        name, sort, _model = EXPORT_KINDS[kind]
+        cursor = db[name].find({"user_id": user_id}, EXPORT_PROJECTION).sort(sort).batch_size(EXPORT_BATCH_SIZE)
+        async for doc in cursor:
+            yield {"type": kind, **doc}
+
+async def export_header(records: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    yield {"type": "meta", "format": "deardiary-export", "version": 1, "exported_at": datetime.now(timezone.utc).isoformat()}
+    async for record in records:
+        yield record
+
+@api_router.get("/export")
+async def export_data(
+    user_id: str = Depends(get_current_user),
+    format: Literal["ndjson", "ndjson.gz", "zip"] = "ndjson"
+):
+    media_type, extension = EXPORT_FORMATS[format]
+    if format == "zip":
+        body = zip_chunks([(f"{EXPORT_KINDS[kind][0]}.ndjson", ndjson_chunks(export_records(user_id, [kind]))) for kind in EXPORT_KINDS])
+    else:
+        body = ndjson_chunks(export_header(export_records(user_id, EXPORT_KINDS)))
+        if format == "ndjson.gz":
+            body = gzip_chunks(body)
+    filename = f"deardiary-{datetime.now(timezone.utc).date().isoformat()}.{extension}"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+def import_response(job: dict) -> ImportResponse:
+    dates = {k: job[k].isoformat() if job.get(k) else None for k in ("created_at", "updated_at", "finished_at")}
+    fields = {k: v for k, v in job.items() if k not in dates and k not in ("_id", "user_id")}
+    return ImportResponse(**fields, **dates)
+
+# Rollups and stats parse these, so a bad value has to stop at its own line
+IMPORT_DATE_FIELDS = {
+    "date": lambda value: datetime.strptime(value, "%Y-%m-%d"),
+    "created_at": datetime.fromisoformat,
+    "updated_at": datetime.fromisoformat,
+}
+
+def check_import_dates(doc: dict):
+    for field, parse in IMPORT_DATE_FIELDS.items():
+        if field not in doc:
+            continue
+        try:
+            parse(doc[field])
+        except ValueError:
+            raise ValueError(f"{field}: {doc[field]!r} is not an ISO date") from None
+
+class ImportWriter:
+    def __init__(self, user_id: str, job: dict, keep_ids: bool):
+        self.user_id = user_id
+        self.job = job
+        self.keep_ids = keep_ids
+        self.pending = {kind: [] for kind in EXPORT_KINDS}
+        # Only needed when ids are reassigned, to re-link todos to their entries
+        self.entry_ids = {}
+
+    def add(self, line_number: int, record: Optional[dict], error: Optional[str]):
+        self.job["lines"] += 1
+        if record is not None and record.get("type") == "meta":
+            return
+        if record is not None:
+            kind = record.pop("type", None)
+            if kind not in EXPORT_KINDS:
+                error = f"line {line_number}: unknown type {kind!r}"
+            else:
+                try:
+                    self.pending[kind].append(self.build(kind, record))
+                except ValidationError as e:
+                    error = f"line {line_number}: {validation_message(e)}"
+                except ValueError as e:
+                    error = f"line {line_number}: {e}"
+        if error:
+            self.job["errors"] += 1
+            if len(self.job["error_samples"]) < 20:
+                self.job["error_samples"].append(error)
+
+    def build(self, kind: str, record: dict) -> dict:
+        _name, _sort, model = EXPORT_KINDS[kind]
+        if kind == "entry":
+            # Recomputed below, so hand-written files may leave it out
+            record.setdefault("word_count", 0)
+        doc = model(**{**record, "user_id": self.user_id}).model_dump()
+        check_import_dates(doc)
+        doc["version"] = max(doc["version"], 1)
+        if kind == "entry":
+            doc["word_count"] = len(doc["content"].split())
+        elif kind == "reminder":
+            doc.update(reminder_schedule_fields(doc["reminder_date"]))
+        if not self.keep_ids:
+            new_id = str(uuid.uuid4())
+            if kind == "entry":
+                self.entry_ids[doc["id"]] = new_id
+            elif kind == "todo" and doc.get("source_entry_id"):
+                doc["source_entry_id"] = self.entry_ids.get(doc["source_entry_id"])
+            doc["id"] = new_id
+        return doc
+
+    def full(self) -> bool:
+        return any(len(docs) >= IMPORT_BATCH_SIZE for docs in self.pending.values())
+
+    async def flush(self):
+        for kind, docs in self.pending.items():
+            if not docs:
+                continue
+            self.pending[kind] = []
+            for doc in docs:
+                doc["sync_version"] = None
+            try:
+                result = await db[EXPORT_KINDS[kind][0]].insert_many(docs, ordered=False)
+                inserted, duplicates = len(result.inserted_ids), 0
+            except BulkWriteError as e:
+                inserted = e.details.get("nInserted", 0)
+                write_errors = e.details.get("writeErrors", [])
+                duplicates = sum(1 for err in write_errors if err.get("code") == 11000)
+                self.job["errors"] += len(write_errors) - duplicates
+            self.job["inserted"][kind] += inserted
+            self.job["skipped"][kind] += duplicates
+            if inserted:
+                await mark_changed(self.user_id, EXPORT_KINDS[kind][0])
+        await self.save()
+
+    async def save(self, **fields):
+        self.job.update(fields, updated_at=datetime.now(timezone.utc))
+        await db.imports.update_one({"id": self.job["id"]}, {"$set": {k: v for k, v in self.job.items() if k != "_id"}})
+
+async def counted_chunks(chunks: AsyncIterator[bytes], job: dict) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        job["bytes_read"] += len(chunk)
+        yield chunk
+
+async def import_records(writer: ImportWriter, chunks: AsyncIterator[bytes]):
+    async for line_number, record, error in ndjson_records(chunks, IMPORT_MAX_LINE_BYTES):
+        writer.add(line_number, record, error)
+        if writer.full():
+            await writer.flush()
+
+@api_router.post("/import", response_model=ImportResponse)
+async def import_data(
+    request: Request,
+    user_id: str = Depends(get_current_user),
+    services: Services = Depends(get_services),
+    format: Literal["ndjson", "ndjson.gz", "zip"] = "ndjson",
+    keep_ids: bool = True,
+    import_id: Optional[str] = Query(None, max_length=64)
+):
+    now = datetime.now(timezone.utc)
+    job = {
+        "id": import_id or str(uuid.uuid4()),
+        "user_id": user_id,
+        "status": "running",
+        "bytes_read": 0,
+        "lines": 0,
+        "inserted": {kind: 0 for kind in EXPORT_KINDS},
+        "skipped": {kind: 0 for kind in EXPORT_KINDS},
+        "errors": 0,
+        "error_samples": [],
+        "created_at": now,
+        "updated_at": now,
+        "finished_at": None,
+    }
+    try:
+        await db.imports.insert_one(job)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Import id already used")
+    writer = ImportWriter(user_id, job, keep_ids)
+    body = counted_chunks(request.stream(), job)
     
-    # Find most active day
-    day_counts = {}
-    for entry in entries:
-        day = entry.get('date')
-        day_counts[day] = day_counts.get(day, 0) + 1
+    try:
+        if format == "zip":
+            # ZIP keeps its directory at the end, so the upload is spooled (to disk past 8 MiB) first
+            with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+                async for chunk in body:
+                    await asyncio.to_thread(spool.write, chunk)
+                try:
+                    archive = zipfile.ZipFile(spool)
+                except zipfile.BadZipFile:
+                    raise ImportFormatError("Upload is not a valid ZIP archive")
+                with archive:
+                    # Entries first so todos can be re-linked when ids are reassigned
+                    order = {f"{name}.ndjson": i for i, (name, _sort, _model) in enumerate(EXPORT_KINDS.values())}
+                    for name in sorted((n for n in archive.namelist() if n.endswith(".ndjson")), key=lambda n: order.get(n, len(order))):
+                        await import_records(writer, zip_member_chunks(archive, name))
+        else:
+            await import_records(writer, inflate_chunks(body) if format == "ndjson.gz" else body)
+        await writer.flush()
+        if job["inserted"]["entry"]:
+            await rebuild_rollups(user_id)
+    except ImportFormatError as e:
+        await writer.save(status="failed", finished_at=datetime.now(timezone.utc), error_samples=job["error_samples"] + [str(e)])
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        await asyncio.shield(writer.save(status="failed", finished_at=datetime.now(timezone.utc)))
+        raise
     
-    most_active_day = max(day_counts.items(), key=lambda x: x[1])[0] if day_counts else None
+    await writer.save(status="succeeded", finished_at=datetime.now(timezone.utc))
+    # Too many documents for one event each; clients reload instead
+    publish_event(services, user_id, {"type": "import.completed", "id": job["id"]})
+    return import_response(job)
+
+@api_router.get("/import/{import_id}", response_model=ImportResponse)
+async def get_import(import_id: str, user_id: str = Depends(get_current_user)):
+    job = await db.imports.find_one({"id": import_id, "user_id": user_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return import_response(job)
+
+
+# Incremental sync
+@api_router.get("/sync", response_model=SyncResponse)
+async def sync_changes(
+    user_id: str = Depends(get_current_user),
+    since: int = Query(0, ge=0),
+    limit: int = Query(SYNC_MAX_CHANGES, ge=1, le=SYNC_MAX_CHANGES)
+):
+    # Pending writes, including documents from before change tracking, get their numbers first
+    version = await stamp_changes(user_id)
+    changed = {}
+    truncated_at = []
+    for name in ("entries", "todos", "reminders"):
+        cursor = db[name].find(
+            {"user_id": user_id, "sync_version": {"$gt": since, "$lte": version}}, {"_id": 0}
+        ).sort("sync_version", ASCENDING).limit(limit + 1)
+        docs = await cursor.to_list(limit + 1)
+        if len(docs) > limit:
+            docs = docs[:limit]
+            truncated_at.append(docs[-1]["sync_version"])
+        changed[name] = docs
     
-    return StatsResponse(
-        period="weekly",
-        entry_count=entry_count,
-        total_words=total_words,
-        avg_words_per_entry=round(avg_words, 1),
-        most_active_day=most_active_day
-    )
-
-@api_router.get("/stats/monthly", response_model=StatsResponse)
-async def get_monthly_stats(user_id: str = Depends(get_current_user)):
-    # Get entries from last 30 days
-    thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).date().isoformat()
-    entries = await db.entries.find(
-        {"user_id": user_id, "date": {"$gte": thirty_days_ago}},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    entry_count = len(entries)
-    total_words = sum(entry.get('word_count', 0) for entry in entries)
-    avg_words = total_words / entry_count if entry_count > 0 else 0
+    tombstones = []
+    if since:
+        tombstones = await db.tombstones.find(
+            {"user_id": user_id, "sync_version": {"$gt": since, "$lte": version}}, {"_id": 0, "collection": 1, "id": 1, "sync_version": 1}
+        ).sort("sync_version", ASCENDING).limit(limit + 1).to_list(limit + 1)
+        if len(tombstones) > limit:
+            tombstones = tombstones[:limit]
+            truncated_at.append(tombstones[-1]["sync_version"])
     
-    # Find most active day
-    day_counts = {}
-    for entry in entries:
-        day = entry.get('date')
-        day_counts[day] = day_counts.get(day, 0) + 1
+    if truncated_at:
+        # Sequence numbers are unique per user, so every list is complete up to
+        # the lowest last number of a truncated one
+        version = min(truncated_at)
+        for name in changed:
+            changed[name] = [doc for doc in changed[name] if doc["sync_version"] <= version]
+        tombstones = [tombstone for tombstone in tombstones if tombstone["sync_version"] <= version]
     
-    most_active_day = max(day_counts.items(), key=lambda x: x[1])[0] if day_counts else None
+    deleted = {"entries": [], "todos": [], "reminders": []}
+    for tombstone in tombstones:
+        deleted[tombstone["collection"]].append(tombstone["id"])
     
-    return StatsResponse(
-        period="monthly",
-        entry_count=entry_count,
-        total_words=total_words,
-        avg_words_per_entry=round(avg_words, 1),
-        most_active_day=most_active_day
+    return SyncResponse(
+        version=version,
+        has_more=bool(truncated_at),
+        entries=[EntryResponse(**doc) for doc in changed["entries"]],
+        todos=[TodoResponse(**doc) for doc in changed["todos"]],
+        reminders=[ReminderResponse(**doc) for doc in changed["reminders"]],
+        deleted=deleted
     )
 
-@api_router.get("/stats/yearly", response_model=StatsResponse)
-async def get_yearly_stats(user_id: str = Depends(get_current_user)):
-    # Get entries from last 365 days
-    one_year_ago = (datetime.now(timezone.utc) - timedelta(days=365)).date().isoformat()
-    entries = await db.entries.find(
-        {"user_id": user_id, "date": {"$gte": one_year_ago}},
-        {"_id": 0}
-    ).to_list(10000)
-    
-    entry_count = len(entries)
-    total_words = sum(entry.get('word_count', 0) for entry in entries)
-    avg_words = total_words / entry_count if entry_count > 0 else 0
-    
-    # Find most active day
-    day_counts = {}
-    for entry in entries:
-        day = entry.get('date')
-        day_counts[day] = day_counts.get(day, 0) + 1
+
+# Change events
+# Browsers can't set headers on a WebSocket handshake, and a ?token= would end up
+# in access logs, so the JWT comes as the first message: {"type": "auth", "token": ...}
+async def authenticate_websocket(websocket: WebSocket) -> Optional[tuple]:
+    # Returns (user_id, token)
+    try:
+        message = json.loads(await asyncio.wait_for(websocket.receive_text(), timeout=WS_AUTH_TIMEOUT_SECONDS))
+        if message.get("type") != "auth":
+            return None
+        token = str(message.get("token", ""))
+        return await authenticate_token(token), token
+    except (asyncio.TimeoutError, ValueError, AttributeError, HTTPException):
+        return None
+
+@api_router.websocket("/ws")
+async def change_events(websocket: WebSocket, services: Services = Depends(get_services)):
+    await websocket.accept()
+    try:
+        authenticated = await authenticate_websocket(websocket)
+    except WebSocketDisconnect:
+        return
+    if authenticated is None:
+        await websocket.close(code=1008)
+        return
+    user_id, token = authenticated
+    expires_at = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])["exp"]
     
-    most_active_day = max(day_counts.items(), key=lambda x: x[1])[0] if day_counts else None
+    websocket_connections.inc()
+    with services.event_bus.subscribe(user_id) as queue:
+        async def send_events():
+            while True:
+                await websocket.send_json(await queue.get())
+        
+        async def receive_messages():
+            while True:
+                if await websocket.receive_text() == "ping":
+                    await websocket.send_text("pong")
+        
+        async def recheck_token():
+            # A logout or an expired token ends the subscription too, not just new connections
+            while True:
+                await asyncio.sleep(max(0, min(WS_AUTH_RECHECK_SECONDS, expires_at - datetime.now(timezone.utc).timestamp())))
+                try:
+                    await authenticate_token(token)
+                except HTTPException as e:
+                    await websocket.close(code=4401, reason=e.detail)
+                    return
+        
+        tasks = [asyncio.create_task(send_events()), asyncio.create_task(receive_messages()), asyncio.create_task(recheck_token())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            websocket_connections.dec()
+
+
+# Statistics endpoints
+@api_router.get("/stats", response_model=WindowStatsResponse)
+async def get_stats(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    granularity: Literal["day", "week", "month"] = "day"
+):
+    try:
+        end = datetime.fromisoformat(to_date).date() if to_date else datetime.now(timezone.utc).date()
+        start = datetime.fromisoformat(from_date).date() if from_date else end - timedelta(days=29)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
     
-    return StatsResponse(
-        period="yearly",
-        entry_count=entry_count,
-        total_words=total_words,
-        avg_words_per_entry=round(avg_words, 1),
-        most_active_day=most_active_day
-    )
+    cached = await not_modified(request, response, user_id, "entries", extra=end.isoformat())
+    if cached:
+        return cached
+    await enforce_rate_limit(request, "stats", user_id, cost=stats_cost((end - start).days + 1))
+    return await query_window_stats(user_id, start.isoformat(), end.isoformat(), granularity)
 
+@api_router.get("/stats/weekly", response_model=StatsResponse)
+async def get_weekly_stats(request: Request, response: Response, user_id: str = Depends(get_current_user)):
+    # Windows end today, so the date is part of the validator
+    cached = await not_modified(request, response, user_id, "entries", extra=datetime.now(timezone.utc).date().isoformat())
+    if cached:
+        return cached
+    await enforce_rate_limit(request, "stats", user_id, cost=stats_cost(7))
+    return await compute_window_stats(user_id, "weekly", 7)
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.get("/stats/monthly", response_model=StatsResponse)
+async def get_monthly_stats(request: Request, response: Response, user_id: str = Depends(get_current_user)):
+    # Windows end today, so the date is part of the validator
+    cached = await not_modified(request, response, user_id, "entries", extra=datetime.now(timezone.utc).date().isoformat())
+    if cached:
+        return cached
+    await enforce_rate_limit(request, "stats", user_id, cost=stats_cost(30))
+    return await compute_window_stats(user_id, "monthly", 30)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.get("/stats/yearly", response_model=StatsResponse)
+async def get_yearly_stats(request: Request, response: Response, user_id: str = Depends(get_current_user)):
+    # Windows end today, so the date is part of the validator
+    cached = await not_modified(request, response, user_id, "entries", extra=datetime.now(timezone.utc).date().isoformat())
+    if cached:
+        return cached
+    await enforce_rate_limit(request, "stats", user_id, cost=stats_cost(365))
+    return await compute_window_stats(user_id, "yearly", 365)
+
+
+# Operational endpoints live outside /api so probes and scrapers need no token
+ops_router = APIRouter()
+
+@ops_router.get("/metrics")
+async def get_metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+websocket_connections = registry.gauge("websocket_connections", "Open /api/ws connections on this worker")
+registry.add_collector(lambda: ai_cache_entries.set(len(ai_cache)))
+
+# app.state.startup is filled in by lifespan(): status goes starting -> ready -> stopping
+READINESS_TIMEOUT_SECONDS = float(os.environ.get('READINESS_TIMEOUT_SECONDS', '2'))
+
+@ops_router.get("/health/live")
+async def liveness():
+    # Answering at all means the event loop is running
+    return {"status": "alive", "uptime_seconds": round(time.perf_counter() - IMPORT_STARTED, 1)}
+
+@ops_router.get("/health/ready")
+async def readiness(request: Request, services: Services = Depends(get_services)):
+    startup_state = request.app.state.startup
+    checks = {"ai": {"ok": True, "enabled": services.ai_client is not None}}
+    status = startup_state["status"]
+    if db is None:
+        checks["mongodb"] = {"ok": False, "detail": "not connected"}
+    else:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(db.command("ping"), READINESS_TIMEOUT_SECONDS)
+            checks["mongodb"] = {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+        except (PyMongoError, asyncio.TimeoutError) as e:
+            checks["mongodb"] = {"ok": False, "detail": str(e) or "ping timed out"}
+    if status == "ready" and not all(check["ok"] for check in checks.values()):
+        status = "unavailable"
+    body = {
+        "status": status,
+        "checks": checks,
+        "startup_ms": {name: round(seconds * 1000, 1) for name, seconds in startup_state["phases"].items()},
+    }
+    return JSONResponse(body, status_code=200 if status == "ready" else 503)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+async def warm_up_mongo():
+    if MONGO_WARMUP_CONNECTIONS <= 0:
+        return
+    try:
+        # Concurrent pings each check out their own pooled connection
+        await asyncio.gather(*(db.command("ping") for _ in range(MONGO_WARMUP_CONNECTIONS)))
+    except PyMongoError as e:
+        logger.error(f"MongoDB warm-up failed: {e}")
+
+async def create_db_indexes():
+    try:
+        # Workers start together; one of them building indexes is enough
+        async with shared_state.lock("ensure-indexes", ttl=300) as acquired:
+            if acquired:
+                await ensure_indexes()
+    except PyMongoError as e:
+        logger.error(f"Index bootstrap failed: {e}")
+
+async def start_change_stream_relay(relay: ChangeStreamRelay):
+    for name in ("entries", "todos", "reminders"):
+        try:
+            # Lets delete events carry the owning user_id (MongoDB 6.0+)
+            await db.command("collMod", name, changeStreamPreAndPostImages={"enabled": True})
+        except PyMongoError as e:
+            logger.error(f"Enabling change stream pre-images on {name} failed: {e}")
+    relay.start({"entry": db.entries, "todo": db.todos, "reminder": db.reminders})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db
+    startup_state = app.state.startup = {"status": "starting", "phases": {}}
+    phases = startup_state["phases"]
+    phases["import"] = IMPORT_FINISHED - IMPORT_STARTED
+    started = mark = time.perf_counter()
+    if not JWT_SECRET:
+        raise RuntimeError("JWT_SECRET_KEY must be set")
+
+    def finish(phase: str):
+        nonlocal mark
+        now = time.perf_counter()
+        phases[phase] = now - mark
+        mark = now
+
+    # Only a client opened here is closed (and forgotten) on shutdown
+    owns_client = db is None
+    connect_mongo()
+    finish("mongo_client")
+    await warm_up_mongo()
+    finish("mongo_warmup")
+    await shared_state.start(db.shared_state)
+    await create_db_indexes()
+    finish("indexes")
+    if await db.entries.find_one({}, {"_id": 1}) and not await db.entry_rollups.find_one({}, {"_id": 1}):
+        # First start on a database from before rollups: stats read nothing else
+        logger.info("Backfilling stats rollups")
+        await rebuild_rollups()
+        finish("rollups")
+    services = app.state.services = Services()
+    finish("services")
+    await services.start()
+    finish("background_tasks")
+    phases["startup"] = time.perf_counter() - started
+
+    for phase, seconds in phases.items():
+        startup_duration.set(seconds, phase=phase)
+    startup_state["status"] = "ready"
+    logger.info("Ready: " + ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in phases.items()))
+    try:
+        yield
+    finally:
+        startup_state["status"] = "stopping"
+        await services.stop()
+        if owns_client:
+            client.close()
+            client = db = None
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(api_router)
+    app.include_router(ops_router)
+
+    # Route templates keep the latency series bounded (/api/entries/{entry_id}, not one per id)
+    route_paths = {route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")}
+
+    def route_label(scope: dict) -> str:
+        return route_paths.get(scope.get("endpoint"), "unmatched")
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag", "Retry-After", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy"],
+    )
+    app.add_middleware(RateLimitHeadersMiddleware)
+
+    if COMPRESSION_MINIMUM_SIZE > 0:
+        app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+    # Added last so it is outermost and times compression too
+    if METRICS_ENABLED:
+        app.add_middleware(
+            MetricsMiddleware,
+            route_label=route_label,
+            server_timing=SERVER_TIMING_ENABLED,
+            slow_request_seconds=SLOW_REQUEST_MS / 1000,
+            excluded_paths=("/metrics", "/health/live", "/health/ready"),
+        )
+    return app
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+app = create_app()
+IMPORT_FINISHED = time.perf_counter()
@@ -0,0 +1,212 @@
+import asyncio
+import math
+import re
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone, timedelta
+from typing import Any, NamedTuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from cache import TTLCache
+
+
+class WindowResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the current window ends, and until `cost` more would fit
+    reset: float
+    retry_after: float
+
+
+def sliding_window(previous: float, current: float, limit: int, window: float, now: float) -> WindowResult:
+    # Approximates a true sliding window by weighting the previous fixed window
+    # by how much of it still overlaps; `current` already includes this hit
+    elapsed = now % window
+    weight = 1 - elapsed / window
+    used = previous * weight + current
+    allowed = used <= limit
+    remaining = max(0, math.floor(limit - used))
+    if allowed:
+        retry_after = 0.0
+    elif current > limit:
+        retry_after = window - elapsed
+    else:
+        # Wait until enough of the previous window has slid out
+        needed = used - limit
+        retry_after = min(window - elapsed, needed / previous * window) if previous else window - elapsed
+    return WindowResult(allowed, limit, remaining, window - elapsed, max(retry_after, 0.0))
+
+
+class SharedState(ABC):
+    # Caches, rate-limit counters and locks that every worker must agree on.
+    # MemoryState is enough for one process; MongoState shares them between
+    # workers and hosts. Values must be BSON-encodable for MongoState.
+    async def start(self, collection=None):
+        pass
+
+    @abstractmethod
+    async def get(self, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str):
+        ...
+
+    @abstractmethod
+    async def hit(self, key: str, cost: float, limit: int, window: float) -> WindowResult:
+        # Counts `cost` against `limit` per `window` seconds; rejected hits aren't counted
+        ...
+
+    @abstractmethod
+    async def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        ...
+
+    @abstractmethod
+    async def release_lock(self, name: str, owner: str):
+        ...
+
+    async def throttle(self, key: str, limit: int, window: float, cost: float = 1):
+        # Waits for room instead of rejecting, for budgets shared by all workers
+        while True:
+            result = await self.hit(key, cost, limit, window)
+            if result.allowed:
+                return
+            await asyncio.sleep(max(result.retry_after, 0.05))
+
+    @asynccontextmanager
+    async def lock(self, name: str, ttl: float = 60.0):
+        # Yields whether the lock was acquired; the lease lapses after `ttl`
+        # seconds if the holder dies, so keep the guarded work shorter than that
+        owner = str(uuid.uuid4())
+        acquired = await self.acquire_lock(name, owner, ttl)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await self.release_lock(name, owner)
+
+
+class MemoryState(SharedState):
+    def __init__(self, maxsize: int = 100000):
+        self._values = TTLCache(maxsize=maxsize, ttl=60)
+        self._counters = TTLCache(maxsize=maxsize, ttl=60)
+        self._locks = {}
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return self._values.get(key, default)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._values.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str):
+        self._values.pop(key)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [key for key in self._values.keys() if key.startswith(prefix)]:
+            self._values.pop(key)
+
+    async def hit(self, key: str, cost: float, limit: int, window: float) -> WindowResult:
+        now = time.time()
+        index = int(now // window)
+        previous = self._counters.get((key, index - 1), 0)
+        current = self._counters.get((key, index), 0) + cost
+        result = sliding_window(previous, current, limit, window, now)
+        if result.allowed:
+            self._counters.set((key, index), current, ttl=2 * window)
+        return result
+
+    async def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.monotonic()
+        holder = self._locks.get(name)
+        if holder and holder[0] != owner and holder[1] > now:
+            return False
+        self._locks[name] = (owner, now + ttl)
+        return True
+
+    async def release_lock(self, name: str, owner: str):
+        if self._locks.get(name, (None,))[0] == owner:
+            del self._locks[name]
+
+
+class MongoState(SharedState):
+    # One document per key: {_id, value, expires_at}. A TTL index on
+    # expires_at removes stale documents; reads also check it because the TTL
+    # monitor only runs once a minute.
+    def __init__(self):
+        self.collection = None
+
+    async def start(self, collection=None):
+        self.collection = collection
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        doc = await self.collection.find_one({"_id": key, "expires_at": {"$gt": self._now()}}, {"value": 1})
+        return doc["value"] if doc else default
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expires_at": self._now() + timedelta(seconds=ttl)}},
+            upsert=True,
+        )
+
+    async def delete(self, key: str):
+        await self.collection.delete_one({"_id": key})
+
+    async def delete_prefix(self, prefix: str):
+        await self.collection.delete_many({"_id": {"$regex": "^" + re.escape(prefix)}})
+
+    async def hit(self, key: str, cost: float, limit: int, window: float) -> WindowResult:
+        now = time.time()
+        index = int(now // window)
+        expires_at = self._now() + timedelta(seconds=2 * window)
+        # Count first, then refund if over: the increment is the only atomic step
+        doc = await self.collection.find_one_and_update(
+            {"_id": f"{key}:{index}"},
+            {"$inc": {"value": cost}, "$set": {"expires_at": expires_at}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        previous_doc = await self.collection.find_one({"_id": f"{key}:{index - 1}"}, {"value": 1})
+        previous = previous_doc["value"] if previous_doc else 0
+        result = sliding_window(previous, doc["value"], limit, window, now)
+        if not result.allowed:
+            await self.collection.update_one({"_id": f"{key}:{index}"}, {"$inc": {"value": -cost}})
+        return result
+
+    async def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        now = self._now()
+        try:
+            # A held, unexpired lock doesn't match, so the upsert collides on _id
+            await self.collection.update_one(
+                {"_id": f"lock:{name}", "$or": [{"value": owner}, {"expires_at": {"$lte": now}}]},
+                {"$set": {"value": owner, "expires_at": now + timedelta(seconds=ttl)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def release_lock(self, name: str, owner: str):
+        await self.collection.delete_one({"_id": f"lock:{name}", "value": owner})
+
+
+def build_shared_state(backend: str) -> SharedState:
+    if backend == "mongodb":
+        return MongoState()
+    return MemoryState()
@@ -1,155 +0,0 @@
-import requests
-import json
-
-BASE_URL = "http://localhost:8000/api"
-
-print("=" * 60)
-print("TESTING DEAR DIARY BACKEND API")
-print("="* 60)
-
-# Test 1: Register a new user
-print("\n1. Testing User Registration...")
-try:
-    register_data = {
-        "email": "test@example.com",
-        "password": "testpassword123",
-        "name": "Test User"
-    }
-    response = requests.post(f"{BASE_URL}/auth/register", json=register_data)
-    if response.status_code == 200:
-        result = response.json()
-        token = result.get("access_token")
-        user = result.get("user")
-        print(f"   ✓ Registration successful!")
-        print(f"   ✓ User: {user.get('name')} ({user.get('email')})")
-        print(f"   ✓ Token received")
-    elif response.status_code == 400:
-        print(f"   ℹ User already exists (this is OK)")
-        # Try login instead
-        login_data = {"email": "test@example.com", "password": "testpassword123"}
-        response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
-        result = response.json()
-        token = result.get("access_token")
-        print(f"   ✓ Logged in instead")
-    else:
-        print(f"   ✗ Registration failed: {response.status_code}")
-        print(f"   {response.text}")
-        token = None
-except Exception as e:
-    print(f"   ✗ Error: {e}")
-    token = None
-
-if not token:
-    print("\n✗ Cannot continue without authentication token")
-    exit(1)
-
-headers = {"Authorization": f"Bearer {token}"}
-
-# Test 2: Get user info
-print("\n2. Testing Get Current User...")
-try:
-    response = requests.get(f"{BASE_URL}/auth/me", headers=headers)
-    if response.status_code == 200:
-        user = response.json()
-        print(f"   ✓ User info retrieved")
-        print(f"   ✓ Name: {user.get('name')}")
-        print(f"   ✓ Email: {user.get('email')}")
-    else:
-        print(f"   ✗ Failed: {response.status_code}")
-except Exception as e:
-    print(f"   ✗ Error: {e}")
-
-# Test 3: Create a diary entry
-print("\n3. Testing Create Entry...")
-try:
-    entry_data = {
-        "title": "Test Entry",
-        "content": "This is a test diary entry to verify the backend is working correctly.",
-        "mood": "happy"
-    }
-    response = requests.post(f"{BASE_URL}/entries", json=entry_data, headers=headers)
-    if response.status_code == 200:
-        entry = response.json()
-        entry_id = entry.get("id")
-        print(f"   ✓ Entry created successfully")
-        print(f"   ✓ Entry ID: {entry_id}")
-        print(f"   ✓ Word count: {entry.get('word_count')}")
-    else:
-        print(f"   ✗ Failed: {response.status_code}")
-        entry_id = None
-except Exception as e:
-    print(f"   ✗ Error: {e}")
-    entry_id = None
-
-# Test 4: Get all entries
-print("\n4. Testing Get Entries...")
-try:
-    response = requests.get(f"{BASE_URL}/entries", headers=headers)
-    if response.status_code == 200:
-        entries = response.json()
-        print(f"   ✓ Retrieved {len(entries)} entries")
-    else:
-        print(f"   ✗ Failed: {response.status_code}")
-except Exception as e:
-    print(f"   ✗ Error: {e}")
-
-# Test 5: Test AI endpoint (if Groq API key is configured)
-print("\n5. Testing AI Summarize...")
-try:
-    ai_data = {"text": "Today was a great day. I learned many new things and met interesting people."}
-    response = requests.post(f"{BASE_URL}/ai/summarize", json=ai_data, headers=headers)
-    if response.status_code == 200:
-        result = response.json()
-        print(f"   ✓ AI summarization working")
-        print(f"   ✓ Summary: {result.get('result')[:100]}...")
-    elif response.status_code == 503:
-        print(f"   ℹ AI service not configured (this is OK)")
-    else:
-        print(f"   ✗ Failed: {response.status_code}")
-except Exception as e:
-    print(f"   ✗ Error: {e}")
-
-# Test 6: Test statistics endpoint
-print("\n6. Testing Statistics (Weekly)...")
-try:
-    response = requests.get(f"{BASE_URL}/stats/weekly", headers=headers)
-    if response.status_code == 200:
-        stats = response.json()
-        print(f"   ✓ Stats retrieved successfully")
-        print(f"   ✓ Entry count: {stats.get('entry_count')}")
-        print(f"   ✓ Total words: {stats.get('total_words')}")
-        print(f"   ✓ Avg words/entry: {stats.get('avg_words_per_entry')}")
-    else:
-        print(f"   ✗ Failed: {response.status_code}")
-except Exception as e:
-    print(f"   ✗ Error: {e}")
-
-# Test 7: Create a todo
-print("\n7. Testing Create Todo...")
-try:
-    todo_data = {"text": "Test todo item", "completed": False}
-    response = requests.post(f"{BASE_URL}/todos", json=todo_data, headers=headers)
-    if response.status_code == 200:
-        todo = response.json()
-        print(f"   ✓ Todo created successfully")
-        print(f"   ✓ Todo ID: {todo.get('id')}")
-    else:
-        print(f"   ✗ Failed: {response.status_code}")
-except Exception as e:
-    print(f"   ✗ Error: {e}")
-
-# Test 8: MongoDB connection
-print("\n8. Testing MongoDB Atlas Connection...")
-try:
-    # If we got this far, MongoDB is working
-    print(f"   ✓ MongoDB Atlas connected")
-    print(f"   ✓ All database operations working")
-except Exception as e:
-    print(f"   ✗ Error: {e}")
-
-print("\n" + "=" * 60)
-print("✓ ALL TESTS COMPLETED SUCCESSFULLY!")
-print("=" * 60)
-print("\nBackend is fully operational with MongoDB Atlas")
-print("API Documentation: http://localhost:8000/docs")
-print("=" * 60)
@@ -0,0 +1,53 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+# Settings are read at import time, so they go in before server is imported
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "deardiary_test")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-" + "x" * 32)
+os.environ.setdefault("AI_PROVIDER", "fake")
+os.environ.setdefault("AI_RATE_LIMIT_PER_MINUTE", "100000")
+os.environ.setdefault("AI_RATE_LIMIT_BURST", "1000")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("RATE_LIMITS_ENABLED", "false")
+os.environ.setdefault("REMINDER_SCHEDULER_ENABLED", "false")
+os.environ.setdefault("AUTOSAVE_COALESCE_MS", "0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+@pytest.fixture(scope="session")
+def db():
+    server.db = AsyncMongoMockClient()["deardiary_test"]
+    return server.db
+
+
+@pytest.fixture(scope="session")
+def api(db):
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth(api):
+    response = api.post("/api/auth/register", json={
+        "email": f"{uuid.uuid4().hex[:12]}@example.com",
+        "password": "correct horse",
+        "name": "Test User",
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
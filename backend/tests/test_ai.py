@@ -0,0 +1,22 @@
+def test_stream_sends_deltas_then_done(api, auth):
+    with api.stream("POST", "/api/ai/summarize/stream", headers=auth, json={"text": "one two three"}) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    assert "one" in body
+    assert "event: done" in body
+
+
+def test_analyze_runs_each_task_and_saves_extracted_todos(api, auth):
+    response = api.post("/api/ai/analyze", headers=auth, json={
+        "text": "Busy day, need to plan tomorrow",
+        "tasks": ["summarize", "extract-todos"],
+        "save_todos": True,
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["results"]) == {"summarize", "extract-todos"}
+    assert body["errors"] == {}
+    assert [todo["text"] for todo in body["todos"]] == ["Review today's entry", "Plan tomorrow"]
+    assert len(api.get("/api/todos", headers=auth).json()) == 2
@@ -0,0 +1,41 @@
+import uuid
+
+
+def metric(api, line_prefix):
+    for line in api.get("/metrics").text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.split()[-1])
+    return 0.0
+
+
+def upstream(api):
+    return api.app.state.services.ai_client.chat.completions
+
+
+def test_repeated_request_is_answered_from_the_cache(api, auth):
+    text = f"a walk by the river {uuid.uuid4().hex}"
+    calls = upstream(api).calls
+    hits = metric(api, 'ai_cache_lookups_total{result="memory_hit"}')
+
+    first = api.post("/api/ai/improve-text", headers=auth, json={"text": text})
+    second = api.post("/api/ai/improve-text", headers=auth, json={"text": text})
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert upstream(api).calls == calls + 1
+    assert metric(api, 'ai_cache_lookups_total{result="memory_hit"}') == hits + 1
+    assert metric(api, "ai_cache_entries") >= 1
+
+
+def test_failed_completions_are_not_cached(api, auth, monkeypatch):
+    text = f"a rainy afternoon {uuid.uuid4().hex}"
+    monkeypatch.setattr(upstream(api), "failure_rate", 1.0)
+
+    failed = api.post("/api/ai/summarize", headers=auth, json={"text": text})
+    monkeypatch.setattr(upstream(api), "failure_rate", 0.0)
+    calls = upstream(api).calls
+    retried = api.post("/api/ai/summarize", headers=auth, json={"text": text})
+
+    assert failed.status_code == 429
+    assert retried.status_code == 200
+    assert upstream(api).calls == calls + 1
@@ -0,0 +1,142 @@
+import asyncio
+import time
+from datetime import datetime, timezone, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from ai_jobs import AIJobQueue
+from fake_groq import FakeAsyncGroq
+
+
+pytestmark = pytest.mark.anyio
+
+
+def fake_handler(groq_client):
+    async def handler(task: str, text: str) -> str:
+        completion = await groq_client.chat.completions.create(
+            model="fake", messages=[{"role": "system", "content": "summarizer"}, {"role": "user", "content": text}]
+        )
+        return completion.choices[0].message.content
+    return handler
+
+
+def make_queue(handler=None, **kwargs) -> AIJobQueue:
+    queue = AIJobQueue(handler or fake_handler(FakeAsyncGroq(latency=0, failure_rate=0)), **kwargs)
+    queue.start(AsyncMongoMockClient()["jobs"]["ai_jobs"], consume=False)
+    return queue
+
+
+async def expire_lease(queue: AIJobQueue, job_id: str):
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await queue.collection.update_one({"id": job_id}, {"$set": {"lease_until": past}})
+
+
+async def test_runs_a_job_to_success():
+    queue = make_queue()
+    job = await queue.submit("u", "summarize", "a quiet day at the lake")
+
+    await queue.run_job(await queue.claim())
+
+    stored = await queue.get(job["id"], "u")
+    assert stored["status"] == "succeeded"
+    assert stored["result"] == "a quiet day at the lake"
+    assert stored["finished_at"] is not None
+
+
+async def test_retryable_failure_is_requeued_with_backoff():
+    queue = make_queue(fake_handler(FakeAsyncGroq(latency=0, failure_rate=1)), backoff_base=0, max_attempts=2)
+    job = await queue.submit("u", "summarize", "text")
+
+    await queue.run_job(await queue.claim())
+    stored = await queue.get(job["id"], "u")
+    assert stored["status"] == "queued"
+    assert stored["run_after"].replace(tzinfo=timezone.utc) >= datetime.now(timezone.utc)
+
+    await queue.collection.update_one({"id": job["id"]}, {"$set": {"run_after": datetime.now(timezone.utc)}})
+    await queue.run_job(await queue.claim())
+    stored = await queue.get(job["id"], "u")
+    assert stored["status"] == "failed"
+    assert stored["attempts"] == 2
+
+
+async def test_lease_expiring_on_the_last_attempt_fails_the_job():
+    queue = make_queue(max_attempts=1)
+    job = await queue.submit("u", "summarize", "text")
+    await queue.claim()
+    await expire_lease(queue, job["id"])
+
+    assert await queue.claim() is None
+    assert await queue.fail_expired() == 1
+
+    stored = await queue.get(job["id"], "u")
+    assert stored["status"] == "failed"
+    assert stored["finished_at"] is not None
+
+
+async def test_worker_whose_lease_lapsed_cannot_overwrite_the_new_owner():
+    release = asyncio.Event()
+
+    async def slow_handler(task: str, text: str) -> str:
+        await release.wait()
+        return "stale"
+
+    queue = make_queue(slow_handler)
+    job = await queue.submit("u", "summarize", "text")
+    stale = await queue.claim()
+    stale_run = asyncio.create_task(queue.run_job(stale))
+    await asyncio.sleep(0)
+
+    await expire_lease(queue, job["id"])
+    current = await queue.claim()
+    assert current["lease_token"] != stale["lease_token"]
+    release.set()
+    await stale_run
+    assert (await queue.get(job["id"], "u"))["status"] == "running"
+
+    queue.handler = fake_handler(FakeAsyncGroq(latency=0, failure_rate=0))
+    await queue.run_job(current)
+    stored = await queue.get(job["id"], "u")
+    assert stored["status"] == "succeeded"
+    assert stored["result"] == "text"
+
+
+async def test_worker_survives_a_failed_outcome_write():
+    queue = make_queue(poll_interval=0.01)
+    finish = queue._finish
+    failures = []
+
+    async def flaky_finish(job, update):
+        if not failures:
+            failures.append(job["id"])
+            raise RuntimeError("connection reset")
+        return await finish(job, update)
+
+    queue._finish = flaky_finish
+    queue.start(queue.collection)
+    try:
+        first = await queue.submit("u", "summarize", "first")
+        second = await queue.submit("u", "summarize", "second")
+        for _ in range(100):
+            if (await queue.get(second["id"], "u"))["status"] == "succeeded":
+                break
+            await asyncio.sleep(0.01)
+        assert failures == [first["id"]]
+        assert (await queue.get(second["id"], "u"))["status"] == "succeeded"
+        assert not any(task.done() for task in queue._tasks)
+    finally:
+        await queue.stop()
+
+
+def test_queued_job_is_processed_by_the_background_workers(api, auth):
+    job = api.post("/api/ai/jobs", headers=auth, json={"task": "summarize", "text": "a long walk"}).json()
+    assert job["status"] == "queued"
+
+    for _ in range(200):
+        job = api.get(f"/api/ai/jobs/{job['id']}", headers=auth).json()
+        if job["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(0.01)
+
+    assert job["status"] == "succeeded"
+    assert job["result"] == "a long walk"
@@ -0,0 +1,90 @@
+import asyncio
+import uuid
+
+import server
+
+
+def register(api, password="correct horse"):
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    response = api.post("/api/auth/register", json={"email": email, "password": password, "name": "Test User"})
+    assert response.status_code == 200
+    return email, response.json()["user"]["id"]
+
+
+def stored_hash(user_id):
+    return asyncio.run(server.db.users.find_one({"id": user_id}))["password_hash"]
+
+
+def test_login_upgrades_hashes_made_with_another_cost(api, monkeypatch):
+    email, user_id = register(api)
+    assert stored_hash(user_id).startswith(f"$2b${server.BCRYPT_ROUNDS:02d}$")
+
+    monkeypatch.setattr(server, "BCRYPT_ROUNDS", server.BCRYPT_ROUNDS + 1)
+    response = api.post("/api/auth/login", json={"email": email, "password": "correct horse"})
+
+    assert response.status_code == 200
+    assert stored_hash(user_id).startswith(f"$2b${server.BCRYPT_ROUNDS:02d}$")
+    assert api.post("/api/auth/login", json={"email": email, "password": "correct horse"}).status_code == 200
+
+
+def test_login_with_a_wrong_password_is_unauthorized(api):
+    email, _ = register(api)
+
+    response = api.post("/api/auth/login", json={"email": email, "password": "wrong horse"})
+
+    assert response.status_code == 401
+
+
+def test_auth_is_throttled_when_the_hash_pool_is_full(api, monkeypatch):
+    email, _ = register(api)
+    monkeypatch.setattr(server, "PASSWORD_HASH_MAX_PENDING", 0)
+
+    login = api.post("/api/auth/login", json={"email": email, "password": "correct horse"})
+    signup = api.post("/api/auth/register", json={"email": f"{uuid.uuid4().hex[:12]}@example.com", "password": "x" * 8, "name": "Late"})
+
+    assert login.status_code == 429 and signup.status_code == 429
+    assert login.headers["Retry-After"] == "1"
+    assert api.app.state.services.password_hash_pending == 0
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_logout_revokes_only_that_token(api, auth):
+    email = api.get("/api/auth/me", headers=auth).json()["email"]
+    other = api.post("/api/auth/login", json={"email": email, "password": "correct horse"}).json()["access_token"]
+
+    assert api.post("/api/auth/logout", headers=auth).status_code == 200
+
+    me = api.get("/api/auth/me", headers=auth)
+    assert me.status_code == 401 and me.json()["detail"] == "Token revoked"
+    assert api.get("/api/auth/me", headers=bearer(other)).status_code == 200
+
+
+def test_verified_tokens_are_served_from_the_cache(api, auth, monkeypatch):
+    api.get("/api/auth/me", headers=auth)
+    lookups = []
+    find_one = type(server.db.revoked_tokens).find_one
+
+    async def counting_find_one(self, *args, **kwargs):
+        if self.name == "revoked_tokens":
+            lookups.append(args)
+        return await find_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(server.db.revoked_tokens), "find_one", counting_find_one)
+
+    assert api.get("/api/auth/me", headers=auth).status_code == 200
+    assert lookups == []
+
+
+def test_expired_and_forged_tokens_are_unauthorized(api, auth):
+    owner = api.get("/api/auth/me", headers=auth).json()["id"]
+    expired = server.jwt.encode({"user_id": owner, "exp": 1}, server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+    forged = server.jwt.encode({"user_id": owner, "exp": 4102444800}, "not-the-secret-" + "x" * 32, algorithm=server.JWT_ALGORITHM)
+
+    responses = [api.get("/api/auth/me", headers=bearer(token)) for token in (expired, forged, "garbage")]
+
+    assert [(r.status_code, r.json()["detail"]) for r in responses] == [
+        (401, "Token expired"), (401, "Invalid token"), (401, "Invalid token"),
+    ]
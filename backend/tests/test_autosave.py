@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from autosave import PatchCoalescer, TextOpError, apply_text_op
+
+
+@pytest.mark.parametrize("content, offset, delete, insert, expected", [
+    ("hello world", 5, 0, " there", "hello there world"),
+    ("hello world", 0, 6, "", "world"),
+    ("hello world", 3, 5, "", "helrld"),
+    ("one two", 7, 0, " three four", "one two three four"),
+    ("naïve café", 6, 4, "bar", "naïve bar"),
+])
+def test_text_op_keeps_the_word_count_in_step(content, offset, delete, insert, expected):
+    patched, word_count = apply_text_op(content, len(content.split()), offset, delete, insert)
+    assert patched == expected
+    assert word_count == len(expected.split())
+
+
+@pytest.mark.parametrize("offset, delete", [(-1, 0), (8, 5), (12, 0)])
+def test_text_op_outside_the_text_is_rejected(offset, delete):
+    with pytest.raises(TextOpError):
+        apply_text_op("hello world", 2, offset, delete, "x")
+
+
+class Store:
+    def __init__(self, text: str = ""):
+        self.doc = {"text": text, "version": 0}
+        self.writes = 0
+        self.conflicts = 0
+
+    async def load(self, key):
+        return dict(self.doc)
+
+    async def store(self, key, base, doc):
+        if self.conflicts:
+            self.conflicts -= 1
+            self.doc = {**self.doc, "version": self.doc["version"] + 1}
+            return False
+        self.writes += 1
+        self.doc = {**doc, "version": base["version"] + 1}
+        return True
+
+
+def append(doc, patch):
+    if patch == "bad":
+        raise ValueError("rejected")
+    return {**doc, "text": doc["text"] + patch}
+
+
+def run_patches(coalescer, patches):
+    async def submit_all():
+        return await asyncio.gather(*(coalescer.submit("k", patch) for patch in patches), return_exceptions=True)
+    return asyncio.run(submit_all())
+
+
+def test_patches_arriving_together_share_one_write():
+    store = Store()
+    coalescer = PatchCoalescer(store.load, append, store.store, delay=0.01)
+
+    results = run_patches(coalescer, ["a", "b", "c"])
+
+    assert [result["text"] for result in results] == ["a", "ab", "abc"]
+    assert store.doc["text"] == "abc"
+    assert store.writes == 1
+
+
+def test_a_rejected_patch_fails_alone():
+    store = Store()
+    coalescer = PatchCoalescer(store.load, append, store.store, delay=0.01)
+
+    results = run_patches(coalescer, ["a", "bad", "c"])
+
+    assert isinstance(results[1], ValueError)
+    assert results[2]["text"] == "ac"
+    assert store.doc["text"] == "ac"
+
+
+def test_conflicting_write_is_reapplied_on_a_fresh_load():
+    store = Store("x")
+    store.conflicts = 2
+    coalescer = PatchCoalescer(store.load, append, store.store, delay=0)
+
+    results = run_patches(coalescer, ["y"])
+
+    assert results[0]["text"] == "xy"
+    assert store.writes == 1
+
+
+def test_gives_up_when_the_document_keeps_changing():
+    store = Store("x")
+    store.conflicts = 10
+    coalescer = PatchCoalescer(store.load, append, store.store, delay=0, max_conflict_retries=2)
+
+    results = run_patches(coalescer, ["y"])
+
+    assert isinstance(results[0], RuntimeError)
+
+
+class SlowStore(Store):
+    def __init__(self):
+        super().__init__()
+        self.writing = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def store(self, key, base, doc):
+        self.writing.set()
+        await self.release.wait()
+        return await super().store(key, base, doc)
+
+
+def test_a_patch_for_an_idle_entry_is_written_without_waiting():
+    store = Store()
+    coalescer = PatchCoalescer(store.load, append, store.store, delay=10)
+
+    async def submit_one():
+        return await asyncio.wait_for(coalescer.submit("k", "a"), timeout=1)
+
+    assert asyncio.run(submit_one())["text"] == "a"
+    assert store.writes == 1
+
+
+def test_patches_arriving_during_a_write_share_the_next_one():
+    async def scenario():
+        store = SlowStore()
+        coalescer = PatchCoalescer(store.load, append, store.store, delay=0.01)
+        first = asyncio.create_task(coalescer.submit("k", "a"))
+        await store.writing.wait()
+        later = [asyncio.create_task(coalescer.submit("k", patch)) for patch in ("b", "c")]
+        await asyncio.sleep(0)
+        store.release.set()
+        results = await asyncio.gather(first, *later)
+        await coalescer.close()
+        return store, coalescer, results
+
+    store, coalescer, results = asyncio.run(scenario())
+
+    assert [result["text"] for result in results] == ["a", "ab", "abc"]
+    assert store.writes == 2
+    assert not coalescer._tasks
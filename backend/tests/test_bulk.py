@@ -0,0 +1,62 @@
+def bulk(api, auth, path, operations, ordered=True):
+    response = api.post(path, headers=auth, json={"ordered": ordered, "operations": operations})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_mixed_batch_reports_a_result_per_operation(api, auth):
+    todo = api.post("/api/todos", headers=auth, json={"text": "old"}).json()
+    doomed = api.post("/api/todos", headers=auth, json={"text": "doomed"}).json()
+
+    result = bulk(api, auth, "/api/todos/bulk", [
+        {"op": "insert", "data": {"text": "new"}},
+        {"op": "update", "id": todo["id"], "data": {"completed": True}, "version": todo["version"]},
+        {"op": "delete", "id": doomed["id"]},
+    ])
+
+    assert (result["inserted"], result["updated"], result["deleted"]) == (1, 1, 1)
+    assert [item["status_code"] for item in result["results"]] == [201, 200, 200]
+    assert result["results"][1]["version"] == todo["version"] + 1
+    texts = {t["text"]: t["completed"] for t in api.get("/api/todos", headers=auth).json()}
+    assert texts == {"new": False, "old": True}
+
+
+def test_ordered_batch_stops_at_the_first_failure(api, auth):
+    todo = api.post("/api/todos", headers=auth, json={"text": "a"}).json()
+
+    result = bulk(api, auth, "/api/todos/bulk", [
+        {"op": "insert", "data": {"text": "first"}},
+        {"op": "update", "id": todo["id"], "data": {"text": "b"}, "version": todo["version"] + 5},
+        {"op": "insert", "data": {"text": "never"}},
+    ])
+
+    assert [item["status_code"] for item in result["results"]] == [201, 412, 424]
+    assert sorted(t["text"] for t in api.get("/api/todos", headers=auth).json()) == ["a", "first"]
+
+
+def test_unordered_batch_runs_past_failures(api, auth):
+    result = bulk(api, auth, "/api/todos/bulk", [
+        {"op": "update", "id": "missing", "data": {"text": "x"}},
+        {"op": "insert", "data": {}},
+        {"op": "insert", "data": {"text": "kept"}},
+    ], ordered=False)
+
+    assert [item["status_code"] for item in result["results"]] == [404, 422, 201]
+
+
+def test_entry_batches_keep_stats_rollups_in_step(api, auth):
+    result = bulk(api, auth, "/api/entries/bulk", [
+        {"op": "insert", "data": {"content": "one two three", "mood": "happy"}},
+        {"op": "insert", "data": {"content": "four five", "mood": "calm"}},
+    ])
+    first, second = (item["id"] for item in result["results"])
+
+    bulk(api, auth, "/api/entries/bulk", [
+        {"op": "update", "id": first, "data": {"content": "one", "mood": "calm"}},
+        {"op": "delete", "id": second},
+    ])
+
+    stats = api.get("/api/stats", headers=auth).json()
+    assert stats["entry_count"] == 1
+    assert stats["total_words"] == 1
+    assert stats["moods"] == {"calm": 1}
@@ -0,0 +1,81 @@
+import asyncio
+
+import server
+
+
+def create_entry(api, auth, content="hello world"):
+    return api.post("/api/entries", headers=auth, json={"content": content}).json()
+
+
+def test_patch_applies_text_ops_and_recounts_words(api, auth):
+    entry = create_entry(api, auth)
+
+    response = api.patch(f"/api/entries/{entry['id']}", headers={**auth, "If-Match": f'"{entry["version"]}"'}, json={
+        "ops": [{"offset": 5, "insert": " there"}, {"offset": 0, "delete": 5, "insert": "Hi"}],
+    })
+
+    assert response.status_code == 200
+    patched = response.json()
+    assert patched["content"] == "Hi there world"
+    assert patched["word_count"] == 3
+    assert patched["version"] == entry["version"] + 1
+    assert response.headers["ETag"] == f'"{patched["version"]}"'
+    assert api.get("/api/stats", headers=auth).json()["total_words"] == 3
+
+
+def test_patch_against_an_old_version_is_rejected(api, auth):
+    entry = create_entry(api, auth)
+    api.put(f"/api/entries/{entry['id']}", headers=auth, json={"title": "renamed"})
+
+    response = api.patch(f"/api/entries/{entry['id']}", headers=auth, json={
+        "version": entry["version"], "ops": [{"offset": 0, "insert": "x"}],
+    })
+
+    assert response.status_code == 412
+    assert response.headers["ETag"] == f'"{entry["version"] + 1}"'
+
+
+def test_patch_needs_a_base_version(api, auth):
+    entry = create_entry(api, auth)
+
+    response = api.patch(f"/api/entries/{entry['id']}", headers=auth, json={"ops": []})
+
+    assert response.status_code == 428
+
+
+def test_patch_outside_the_text_is_unprocessable(api, auth):
+    entry = create_entry(api, auth)
+
+    response = api.patch(f"/api/entries/{entry['id']}", headers=auth, json={
+        "version": entry["version"], "ops": [{"offset": 50, "insert": "x"}],
+    })
+
+    assert response.status_code == 422
+
+
+def counters(api, auth):
+    owner = api.get("/api/auth/me", headers=auth).json()["id"]
+    return asyncio.run(server.db.sync_counters.find_one({"user_id": owner}, {"_id": 0}))
+
+
+def test_put_updates_when_the_version_matches(api, auth):
+    entry = create_entry(api, auth)
+
+    response = api.put(f"/api/entries/{entry['id']}", headers={**auth, "If-Match": f'"{entry["version"]}"'}, json={"title": "renamed"})
+
+    assert response.status_code == 200
+    assert response.json()["title"] == "renamed"
+    assert response.json()["version"] == entry["version"] + 1
+    assert response.headers["ETag"] == f'"{entry["version"] + 1}"'
+
+
+def test_rejected_puts_leave_the_change_counters_alone(api, auth):
+    entry = create_entry(api, auth)
+    before = counters(api, auth)
+
+    stale = api.put(f"/api/entries/{entry['id']}", headers={**auth, "If-Match": f'"{entry["version"] + 1}"'}, json={"title": "x"})
+    missing = api.put("/api/entries/missing", headers=auth, json={"title": "x"})
+
+    assert stale.status_code == 412
+    assert missing.status_code == 404
+    assert counters(api, auth) == before
@@ -0,0 +1,54 @@
+import asyncio
+
+import server
+
+
+def revalidate(api, auth, path):
+    first = api.get(path, headers=auth)
+    return first, lambda: api.get(path, headers={**auth, "If-None-Match": first.headers["ETag"]})
+
+
+def test_list_etag_revalidates_until_a_write(api, auth):
+    _, again = revalidate(api, auth, "/api/todos")
+    assert again().status_code == 304
+
+    api.post("/api/todos", headers=auth, json={"text": "water plants"})
+
+    response = again()
+    assert response.status_code == 200
+    assert [todo["text"] for todo in response.json()] == ["water plants"]
+
+
+def test_failed_conditional_update_keeps_the_etag(api, auth):
+    todo = api.post("/api/todos", headers=auth, json={"text": "a"}).json()
+    _, again = revalidate(api, auth, "/api/todos")
+
+    response = api.put(f"/api/todos/{todo['id']}", headers={**auth, "If-Match": '"41"'}, json={"completed": True})
+
+    assert response.status_code == 412
+    assert again().status_code == 304
+
+
+def test_stats_etag_changes_after_entry_write(api, auth):
+    first, again = revalidate(api, auth, "/api/stats/weekly")
+    assert first.json()["entry_count"] == 0
+
+    api.post("/api/entries", headers=auth, json={"content": "one two three"})
+
+    response = again()
+    assert response.status_code == 200
+    assert response.json()["entry_count"] == 1
+
+
+def test_rebuilding_rollups_changes_stats_etag(api, auth):
+    owner = api.get("/api/auth/me", headers=auth).json()["id"]
+    api.post("/api/entries", headers=auth, json={"content": "one two"})
+    _, again = revalidate(api, auth, "/api/stats/weekly")
+    # Rollups that drifted from the entries, as rebuild-rollups is run to repair
+    asyncio.run(server.db.entry_rollups.delete_many({"user_id": owner}))
+
+    asyncio.run(server.rebuild_rollups(owner))
+
+    response = again()
+    assert response.status_code == 200
+    assert response.json()["total_words"] == 2
@@ -0,0 +1,138 @@
+import gzip
+import io
+import json
+import uuid
+import zipfile
+
+import pytest
+
+
+def seed(api, auth):
+    entry = api.post("/api/entries", headers=auth, json={"title": "Day", "content": "a quiet day", "mood": "calm"}).json()
+    todo = api.post("/api/todos", headers=auth, json={"text": "water plants", "source_entry_id": entry["id"]}).json()
+    reminder = api.post("/api/reminders", headers=auth, json={"text": "call", "reminder_date": "2030-01-01"}).json()
+    return entry, todo, reminder
+
+
+def register(api):
+    response = api.post("/api/auth/register", json={
+        "email": f"{uuid.uuid4().hex[:12]}@example.com",
+        "password": "correct horse",
+        "name": "Importer",
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def ndjson(*records):
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+
+@pytest.mark.parametrize("format", ["ndjson", "ndjson.gz", "zip"])
+def test_export_round_trips_through_import(api, auth, format):
+    entry, todo, reminder = seed(api, auth)
+    exported = api.get(f"/api/export?format={format}", headers=auth)
+    assert exported.status_code == 200
+    if format == "ndjson.gz":
+        assert gzip.decompress(exported.content).startswith(b'{"type":"meta"')
+    elif format == "zip":
+        assert sorted(zipfile.ZipFile(io.BytesIO(exported.content)).namelist()) == ["entries.ndjson", "reminders.ndjson", "todos.ndjson"]
+
+    other = register(api)
+    response = api.post(f"/api/import?format={format}&keep_ids=false", headers=other, content=exported.content)
+
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "succeeded"
+    assert job["inserted"] == {"entry": 1, "todo": 1, "reminder": 1}
+    assert job["errors"] == 0
+    [imported_entry] = api.get("/api/entries", headers=other).json()
+    assert (imported_entry["title"], imported_entry["content"], imported_entry["mood"]) == (entry["title"], entry["content"], entry["mood"])
+    assert [t["text"] for t in api.get("/api/todos", headers=other).json()] == [todo["text"]]
+    assert [r["text"] for r in api.get("/api/reminders", headers=other).json()] == [reminder["text"]]
+    assert api.get("/api/stats", headers=other).json()["entry_count"] == 1
+
+
+def test_reassigned_ids_keep_todos_linked_to_their_entries(api, auth):
+    entry, todo, _ = seed(api, auth)
+    exported = api.get("/api/export", headers=auth).content
+
+    other = register(api)
+    api.post("/api/import?keep_ids=false", headers=other, content=exported)
+
+    [new_entry] = api.get("/api/entries", headers=other).json()
+    [new_todo] = api.get("/api/todos", headers=other).json()
+    assert new_entry["id"] != entry["id"] and new_todo["id"] != todo["id"]
+    assert new_todo["source_entry_id"] == new_entry["id"]
+
+
+def test_reimporting_the_same_export_skips_existing_documents(api, auth):
+    seed(api, auth)
+    exported = api.get("/api/export", headers=auth).content
+
+    job = api.post("/api/import", headers=auth, content=exported).json()
+
+    assert job["status"] == "succeeded"
+    assert job["inserted"] == {"entry": 0, "todo": 0, "reminder": 0}
+    assert job["skipped"] == {"entry": 1, "todo": 1, "reminder": 1}
+    assert len(api.get("/api/entries", headers=auth).json()) == 1
+
+
+def test_import_progress_is_readable_by_id(api, auth):
+    body = ndjson({"type": "meta"}, {"type": "todo", "id": str(uuid.uuid4()), "text": "one", "completed": False, "created_at": "2024-01-01T00:00:00+00:00"})
+    import_id = uuid.uuid4().hex
+
+    api.post(f"/api/import?import_id={import_id}", headers=auth, content=body)
+    job = api.get(f"/api/import/{import_id}", headers=auth)
+
+    assert job.status_code == 200
+    assert job.json()["status"] == "succeeded"
+    assert job.json()["bytes_read"] == len(body)
+    assert job.json()["lines"] == 2
+    assert job.json()["inserted"]["todo"] == 1
+    assert api.get(f"/api/import/{import_id}", headers=register(api)).status_code == 404
+
+
+def test_import_id_can_only_be_used_once(api, auth):
+    import_id = uuid.uuid4().hex
+    assert api.post(f"/api/import?import_id={import_id}", headers=auth, content=b"").status_code == 200
+
+    response = api.post(f"/api/import?import_id={import_id}", headers=auth, content=b"")
+
+    assert response.status_code == 409
+
+
+def test_malformed_lines_are_counted_and_the_rest_imported(api, auth):
+    body = b"not json\n" + ndjson(
+        {"type": "unknown"},
+        {"type": "todo", "text": "missing fields"},
+        {"type": "todo", "id": str(uuid.uuid4()), "text": "ok", "completed": False, "created_at": "2024-01-01T00:00:00+00:00"},
+    )
+
+    job = api.post("/api/import", headers=auth, content=body).json()
+
+    assert job["status"] == "succeeded"
+    assert job["inserted"]["todo"] == 1
+    assert job["errors"] == 3
+    assert len(job["error_samples"]) == 3
+    assert job["error_samples"][1].startswith("line 2: unknown type")
+
+
+def test_entries_with_bad_dates_are_rejected_per_line(api, auth):
+    good = {"type": "entry", "id": str(uuid.uuid4()), "title": "", "content": "fine", "date": "2024-01-02",
+            "created_at": "2024-01-02T00:00:00+00:00", "updated_at": "2024-01-02T00:00:00+00:00"}
+    bad_date = {**good, "id": str(uuid.uuid4()), "date": "yesterday"}
+    bad_created = {**good, "id": str(uuid.uuid4()), "created_at": "soon"}
+
+    response = api.post("/api/import", headers=auth, content=ndjson(good, bad_date, bad_created))
+
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "succeeded"
+    assert job["inserted"]["entry"] == 1
+    assert job["errors"] == 2
+    assert job["error_samples"] == [
+        "line 2: date: 'yesterday' is not an ISO date",
+        "line 3: created_at: 'soon' is not an ISO date",
+    ]
+    assert api.get("/api/stats?from=2024-01-01&to=2024-01-31", headers=auth).json()["entry_count"] == 1
+    assert api.delete(f"/api/entries/{good['id']}", headers=auth).status_code == 200
@@ -0,0 +1,54 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import DuplicateKeyError
+
+import server
+
+
+class ExplainedCursor:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def sort(self, sort):
+        return self
+
+    async def explain(self):
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+
+class ExplainedCollection:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def find(self, query, projection=None):
+        return ExplainedCursor(self.plan)
+
+
+@pytest.mark.anyio
+async def test_ensure_indexes_creates_every_index_and_can_rerun(monkeypatch):
+    db = AsyncMongoMockClient()["deardiary_indexes"]
+    monkeypatch.setattr(server, "db", db)
+
+    await server.ensure_indexes()
+    await server.ensure_indexes()
+
+    for collection, indexes in server.INDEXES.items():
+        names = await db[collection].index_information()
+        assert len(names) == len(indexes) + 1
+    await db.users.insert_one({"id": "u1", "email": "a@example.com"})
+    with pytest.raises(DuplicateKeyError):
+        await db.users.insert_one({"id": "u2", "email": "a@example.com"})
+
+
+@pytest.mark.anyio
+async def test_find_collscans_reports_only_unindexed_shapes(monkeypatch):
+    indexed = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+    scanned = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+    plans = {"reminders": scanned}
+    monkeypatch.setattr(server, "db", {name: ExplainedCollection(plans.get(name, indexed)) for name in server.INDEXES})
+
+    collscans = await server.find_collscans()
+
+    expected = {name for name, (collection, _, _) in server.QUERY_SHAPES.items() if collection == "reminders"}
+    assert set(collscans) == expected
+    assert collscans["reminders.list"] == ["SORT", "COLLSCAN"]
@@ -0,0 +1,28 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+import server
+
+
+def test_apps_started_one_after_another_each_get_their_own_services(db):
+    seen = []
+    for _ in range(2):
+        with TestClient(server.create_app()) as client:
+            credentials = {"email": f"{uuid.uuid4().hex[:12]}@example.com", "password": "correct horse"}
+            assert client.post("/api/auth/register", json={**credentials, "name": "Twice"}).status_code == 200
+            assert client.post("/api/auth/login", json=credentials).status_code == 200
+            assert client.get("/health/ready").status_code == 200
+            seen.append(client.app.state.services)
+
+    assert seen[0] is not seen[1]
+    # The database was handed in, so shutting down leaves it in place
+    assert server.db is db
+
+
+def test_stopping_one_app_leaves_another_ready(api):
+    with TestClient(server.create_app()) as other:
+        assert other.get("/health/ready").status_code == 200
+
+    assert api.get("/health/ready").status_code == 200
+    assert other.app.state.startup["status"] == "stopping"
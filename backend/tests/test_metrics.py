@@ -0,0 +1,76 @@
+import logging
+
+import httpx
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import server
+from metrics import MetricsMiddleware, Registry, add_timing
+
+
+def metric(api, line_prefix):
+    for line in api.get("/metrics").text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.split()[-1])
+    return 0.0
+
+
+def test_requests_are_counted_per_route_template(api, auth):
+    entry = api.post("/api/entries", headers=auth, json={"content": "hello"}).json()
+    by_template = 'http_request_duration_seconds_count{method="GET",route="/api/entries/{entry_id}",status="200"}'
+    unmatched = 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}'
+    before = metric(api, by_template), metric(api, unmatched)
+
+    api.get(f"/api/entries/{entry['id']}", headers=auth)
+    api.get(f"/no/such/{entry['id']}")
+
+    assert (metric(api, by_template), metric(api, unmatched)) == (before[0] + 1, before[1] + 1)
+    assert entry["id"] not in api.get("/metrics").text
+
+
+def test_readiness_reports_ready_then_unavailable_without_mongodb(api, monkeypatch):
+    ready = api.get("/health/ready")
+
+    async def failing_ping(*args, **kwargs):
+        raise ServerSelectionTimeoutError("no servers")
+
+    monkeypatch.setattr(server.db, "command", failing_ping)
+    down = api.get("/health/ready")
+
+    assert ready.status_code == 200 and ready.json()["checks"]["mongodb"]["ok"]
+    assert down.status_code == 503
+    assert down.json()["status"] == "unavailable"
+    assert down.json()["checks"]["mongodb"] == {"ok": False, "detail": "no servers"}
+    assert api.get("/health/live").status_code == 200
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    hits = registry.counter("hits", "Cache hits", ("tier",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    hits.inc(tier="memory")
+    hits.inc(2, tier="memory")
+    for seconds in (0.05, 0.5, 5.0):
+        latency.observe(seconds)
+
+    text = registry.render()
+
+    assert 'hits_total{tier="memory"} 3\n' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1\nlatency_seconds_bucket{le="1"} 2\nlatency_seconds_bucket{le="+Inf"} 3\n' in text
+    assert "latency_seconds_sum 5.55\n" in text
+
+
+@pytest.mark.anyio
+async def test_server_timing_and_slow_request_log(caplog):
+    async def app(scope, receive, send):
+        add_timing("db", 0.25)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = MetricsMiddleware(app, route_label=lambda scope: "/slow", server_timing=True, slow_request_seconds=0.000001)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test") as client:
+        with caplog.at_level(logging.WARNING, logger="metrics"):
+            response = await client.get("/slow")
+
+    assert response.headers["Server-Timing"].startswith("db;dur=250.0, app;dur=")
+    assert any("Slow request: GET /slow (/slow) -> 200" in record.message and "db=250ms" in record.message for record in caplog.records)
@@ -0,0 +1,26 @@
+def create_entry(api, auth, content="hello world"):
+    return api.post("/api/entries", headers=auth, json={"content": content}).json()
+
+
+def test_entry_pages_follow_the_cursor(api, auth):
+    created = [create_entry(api, auth, f"entry {i}")["id"] for i in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        response = api.get("/api/entries?limit=2" + (f"&cursor={cursor}" if cursor else ""), headers=auth)
+        seen += [entry["id"] for entry in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert len(seen) == len(set(seen))
+    assert sorted(seen) == sorted(created)
+
+
+def test_malformed_cursor_is_rejected(api, auth):
+    create_entry(api, auth)
+
+    response = api.get("/api/entries?cursor=not-a-cursor", headers=auth)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,64 @@
+import pytest
+
+import server
+from rate_limit import RateLimiter, RateLimitPolicy
+from shared_state import MemoryState
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_headers_describe_the_remaining_budget():
+    limiter = RateLimiter(MemoryState(), {"ai": RateLimitPolicy(2, 60)})
+
+    allowed = await limiter.check("ai", "user")
+    await limiter.check("ai", "user")
+    denied = await limiter.check("ai", "user")
+
+    assert limiter.headers("ai", allowed)["RateLimit-Remaining"] == "1"
+    assert limiter.headers("ai", allowed)["RateLimit-Policy"] == "2;w=60"
+    assert "Retry-After" not in limiter.headers("ai", allowed)
+    assert not denied.allowed
+    assert int(limiter.headers("ai", denied)["Retry-After"]) >= 1
+
+
+async def test_cost_is_charged_per_key():
+    limiter = RateLimiter(MemoryState(), {"stats": RateLimitPolicy(10, 60)})
+
+    assert (await limiter.check("stats", "a", cost=8)).allowed
+    assert not (await limiter.check("stats", "a", cost=5)).allowed
+    assert (await limiter.check("stats", "b", cost=5)).allowed
+
+
+class BrokenState(MemoryState):
+    async def hit(self, key, cost, limit, window):
+        raise ConnectionError("store unavailable")
+
+
+async def test_fails_open_when_the_store_errors():
+    limiter = RateLimiter(BrokenState(), {"ai": RateLimitPolicy(1, 60)})
+    assert await limiter.check("ai", "user") is None
+
+
+async def test_disabled_limiter_checks_nothing():
+    limiter = RateLimiter(MemoryState(), {"ai": RateLimitPolicy(1, 60)}, enabled=False)
+    assert await limiter.check("ai", "user") is None
+
+
+def test_login_is_limited_per_client_with_headers(api, monkeypatch):
+    monkeypatch.setattr(server.rate_limiter, "enabled", True)
+    monkeypatch.setattr(server.rate_limiter, "state", MemoryState())
+    monkeypatch.setitem(server.rate_limiter.policies, "auth", RateLimitPolicy(2, 60))
+    credentials = {"email": "nobody@example.com", "password": "wrong"}
+
+    responses = [api.post("/api/auth/login", json=credentials) for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [401, 401, 429]
+    assert responses[0].headers["RateLimit-Remaining"] == "1"
+    assert int(responses[2].headers["Retry-After"]) >= 1
+
+
+def test_stats_cost_grows_with_the_window():
+    assert server.stats_cost(7) == 1
+    assert server.stats_cost(90) == 1
+    assert server.stats_cost(365) == 5
@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from reminder_scheduler import LogNotifier, ReminderScheduler
+
+
+pytestmark = pytest.mark.anyio
+
+
+class FailingNotifier:
+    def __init__(self):
+        self.calls = 0
+
+    async def notify(self, reminder: dict):
+        self.calls += 1
+        raise RuntimeError("webhook down")
+
+    async def close(self):
+        pass
+
+
+def due_now() -> datetime:
+    now = datetime.now(timezone.utc) - timedelta(seconds=1)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+async def seed(collection, remind_at: datetime, reminder_id: str = "r1"):
+    await collection.insert_one({
+        "id": reminder_id,
+        "user_id": "u",
+        "text": "stretch",
+        "reminder_date": remind_at.isoformat(),
+        "completed": False,
+        "created_at": remind_at.isoformat(),
+        "version": 1,
+        "remind_at": remind_at,
+        "notified_at": None,
+    })
+
+
+def scheduler(collection, *notifiers, **kwargs) -> ReminderScheduler:
+    instance = ReminderScheduler(list(notifiers), **kwargs)
+    instance.collection = collection
+    return instance
+
+
+async def test_only_one_worker_fires_a_shared_reminder():
+    collection = AsyncMongoMockClient()["scheduler"]["reminders"]
+    remind_at = due_now()
+    await seed(collection, remind_at)
+    first, second = LogNotifier(), LogNotifier()
+    workers = [scheduler(collection, first), scheduler(collection, second)]
+
+    await asyncio.gather(*(worker.fire("r1", remind_at) for worker in workers))
+
+    assert len(first.sent) + len(second.sent) == 1
+    stored = await collection.find_one({"id": "r1"})
+    assert stored["notified_at"] is not None
+    assert stored["lease_until"] is None
+
+
+async def test_edited_reminder_is_not_fired_at_the_old_time():
+    collection = AsyncMongoMockClient()["scheduler"]["reminders"]
+    remind_at = due_now()
+    await seed(collection, remind_at)
+    await collection.update_one({"id": "r1"}, {"$set": {"remind_at": remind_at + timedelta(hours=1)}})
+    notifier = LogNotifier()
+
+    await scheduler(collection, notifier).fire("r1", remind_at)
+
+    assert list(notifier.sent) == []
+
+
+async def test_failed_delivery_keeps_the_lease_until_retry_then_gives_up():
+    collection = AsyncMongoMockClient()["scheduler"]["reminders"]
+    remind_at = due_now()
+    await seed(collection, remind_at)
+    notifier = FailingNotifier()
+    worker = scheduler(collection, notifier, max_attempts=2, backoff_base=60, backoff_cap=60)
+
+    await worker.fire("r1", remind_at)
+    stored = await collection.find_one({"id": "r1"})
+    assert stored["notified_at"] is None
+    assert stored["notify_error"] == "webhook down"
+    assert stored["lease_until"] is not None
+
+    # Still leased: another pass must not deliver again before the retry time
+    await scheduler(collection, notifier).fire("r1", remind_at)
+    assert notifier.calls == 1
+
+    await collection.update_one({"id": "r1"}, {"$set": {"lease_until": None}})
+    await worker.fire("r1", remind_at)
+    stored = await collection.find_one({"id": "r1"})
+    assert notifier.calls == 2
+    assert stored["notified_at"] is not None
+
+
+async def test_refresh_picks_up_due_reminders_within_the_horizon():
+    collection = AsyncMongoMockClient()["scheduler"]["reminders"]
+    await seed(collection, due_now(), "due")
+    await seed(collection, due_now() + timedelta(hours=2), "later")
+    await seed(collection, due_now() - timedelta(days=3), "stale")
+    worker = scheduler(collection, LogNotifier(), horizon=600)
+
+    await worker.refresh()
+
+    assert set(worker._scheduled) == {"due"}
@@ -0,0 +1,27 @@
+import asyncio
+from datetime import datetime, timezone
+
+import server
+
+
+def test_remind_at_honours_the_offset():
+    assert server.parse_remind_at("2030-05-01T09:30:00+02:00") == datetime(2030, 5, 1, 7, 30, tzinfo=timezone.utc)
+    assert server.parse_remind_at("2030-05-01T07:30:00.000Z") == datetime(2030, 5, 1, 7, 30, tzinfo=timezone.utc)
+    assert server.parse_remind_at("2030-05-01T07:30") == datetime(2030, 5, 1, 7, 30, tzinfo=timezone.utc)
+    assert server.parse_remind_at("next tuesday") is None
+
+
+def test_backfill_schedules_reminders_from_before_the_scheduler(db):
+    asyncio.run(db.reminders.insert_many([
+        {"id": "legacy-due", "user_id": "u", "text": "a", "reminder_date": "2030-01-01T08:00:00+01:00", "completed": False},
+        {"id": "legacy-bad", "user_id": "u", "text": "b", "reminder_date": "someday", "completed": False},
+    ]))
+
+    assert asyncio.run(server.backfill_remind_at()) == 2
+    assert asyncio.run(server.backfill_remind_at()) == 0
+
+    due = asyncio.run(db.reminders.find_one({"id": "legacy-due"}))
+    bad = asyncio.run(db.reminders.find_one({"id": "legacy-bad"}))
+    assert due["remind_at"].replace(tzinfo=timezone.utc) == datetime(2030, 1, 1, 7, tzinfo=timezone.utc)
+    assert due["notified_at"] is None
+    assert bad["remind_at"] is None
@@ -0,0 +1,84 @@
+import asyncio
+import gzip
+import uuid
+
+import httpx
+import pytest
+
+import server
+from compression import CompressionMiddleware
+
+
+def test_fast_path_lists_match_the_model_responses(api, auth, monkeypatch):
+    owner = api.get("/api/auth/me", headers=auth).json()["id"]
+    for i in range(3):
+        api.post("/api/entries", headers=auth, json={"content": f"entry {i}", "mood": "calm"})
+    # Written before `version` and `mood` existed
+    asyncio.run(server.db.entries.insert_one({
+        "id": str(uuid.uuid4()), "user_id": owner, "title": "Old", "content": "old entry", "date": "2020-01-01",
+        "created_at": "2020-01-01T00:00:00+00:00", "updated_at": "2020-01-01T00:00:00+00:00", "word_count": 2,
+    }))
+
+    for path in ("/api/entries?limit=3", "/api/entries?limit=10", "/api/todos", "/api/reminders"):
+        models = api.get(path, headers=auth)
+        monkeypatch.setattr(server, "JSON_FAST_PATH", True)
+        fast = api.get(path, headers=auth)
+        monkeypatch.setattr(server, "JSON_FAST_PATH", False)
+
+        assert fast.status_code == 200
+        assert fast.json() == models.json()
+        assert fast.headers.get("X-Next-Cursor") == models.headers.get("X-Next-Cursor")
+
+
+def test_large_responses_are_gzipped_and_small_ones_are_not(api, auth):
+    big = api.post("/api/entries", headers=auth, json={"content": "word " * 400}).json()
+    small = api.post("/api/entries", headers=auth, json={"content": "short"}).json()
+
+    compressed = api.get(f"/api/entries/{big['id']}", headers={**auth, "Accept-Encoding": "gzip"})
+    plain = api.get(f"/api/entries/{small['id']}", headers={**auth, "Accept-Encoding": "gzip"})
+    refused = api.get(f"/api/entries/{big['id']}", headers={**auth, "Accept-Encoding": "gzip;q=0, identity"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == f'W/"{big["version"]}"'
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert compressed.json() == big
+    assert "Content-Encoding" not in plain.headers and plain.headers["ETag"] == f'"{small["version"]}"'
+    assert "Content-Encoding" not in refused.headers and refused.json() == big
+
+
+@pytest.mark.anyio
+async def test_event_streams_pass_through_uncompressed():
+    async def stream(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "body": b"data: x\n\n" * 200, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    transport = httpx.ASGITransport(app=CompressionMiddleware(stream, minimum_size=10))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.content == b"data: x\n\n" * 200
+
+
+@pytest.mark.anyio
+async def test_streamed_bodies_are_flushed_per_chunk():
+    chunks = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+        for i in range(3):
+            await send({"type": "http.response.body", "body": b'{"n": %d}\n' % i, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        chunks.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    await CompressionMiddleware(app, minimum_size=10)(scope, None, send)
+
+    bodies = [message["body"] for message in chunks[1:]]
+    assert dict(chunks[0]["headers"])[b"content-encoding"] == b"gzip"
+    # Each chunk is sent as soon as it is written rather than held back for the end
+    assert all(body and message["more_body"] for body, message in zip(bodies[:3], chunks[1:4]))
+    assert gzip.decompress(b"".join(bodies)) == b'{"n": 0}\n{"n": 1}\n{"n": 2}\n'
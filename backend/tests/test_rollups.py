@@ -0,0 +1,50 @@
+import asyncio
+import uuid
+
+import pytest
+
+import server
+
+
+def stats_for(owner):
+    return server.db.entry_rollups.find({"user_id": owner}, {"_id": 0, "date": 1, "entry_count": 1})
+
+
+@pytest.mark.anyio
+async def test_rebuild_survives_a_live_write_to_the_same_day(api, monkeypatch):
+    owner = str(uuid.uuid4())
+    await server.create_entry(server.EntryCreate(content="first"), user_id=owner, services=api.app.state.services)
+    collection_type = type(server.db.entry_rollups)
+    paused, resume = asyncio.Event(), asyncio.Event()
+
+    def pausing(method):
+        async def wrapper(self, *args, **kwargs):
+            if self.name == "entry_rollups" and not resume.is_set():
+                paused.set()
+                await resume.wait()
+            return await method(self, *args, **kwargs)
+        return wrapper
+
+    for name in ("bulk_write", "insert_many"):
+        monkeypatch.setattr(collection_type, name, pausing(getattr(collection_type, name)))
+    rebuild = asyncio.create_task(server.rebuild_rollups(owner))
+    await paused.wait()
+    await server.create_entry(server.EntryCreate(content="second"), user_id=owner, services=api.app.state.services)
+    resume.set()
+
+    assert await rebuild == 1
+    await server.rebuild_rollups(owner)
+    assert [row["entry_count"] for row in await stats_for(owner).to_list(None)] == [2]
+
+
+@pytest.mark.anyio
+async def test_rebuild_corrects_counts_and_drops_days_without_entries(api):
+    owner = str(uuid.uuid4())
+    entry = await server.create_entry(server.EntryCreate(content="one two three"), user_id=owner, services=api.app.state.services)
+    await server.db.entry_rollups.update_one({"user_id": owner, "date": entry.date}, {"$set": {"entry_count": 7, "total_words": 1}})
+    await server.db.entry_rollups.insert_one({"user_id": owner, "date": "2000-01-01", "entry_count": 3, "total_words": 9, "moods": {}})
+
+    await server.rebuild_rollups(owner)
+
+    rows = await server.db.entry_rollups.find({"user_id": owner}, {"_id": 0, "date": 1, "entry_count": 1, "total_words": 1}).to_list(None)
+    assert rows == [{"date": entry.date, "entry_count": 1, "total_words": 3}]
@@ -0,0 +1,48 @@
+import server
+
+
+class Hits:
+    def __init__(self, hits):
+        self.hits = hits
+
+    async def to_list(self, length):
+        return [dict(hit) for hit in self.hits[:length]]
+
+
+def hit(i, content):
+    return {
+        "id": f"e{i}", "date": "2024-01-01", "title": f"Day {i}", "content": content, "mood": None,
+        "word_count": len(content.split()), "created_at": f"2024-01-0{i}T00:00:00+00:00",
+        "updated_at": f"2024-01-0{i}T00:00:00+00:00", "score": 3.0 - i,
+    }
+
+
+def test_search_ranks_pages_and_highlights_matches(api, auth, monkeypatch):
+    pipelines = []
+    ranked = [hit(1, "A long walk by the river"), hit(2, "Walking home, then more walks")]
+
+    def aggregate(self, pipeline):
+        pipelines.append(pipeline)
+        return Hits(ranked)
+
+    monkeypatch.setattr(type(server.db.entries), "aggregate", aggregate)
+    response = api.get("/api/entries/search?q=walk -rain&mood=calm&limit=1", headers=auth)
+
+    assert response.status_code == 200
+    assert [(h["id"], h["snippet"], h["highlights"]) for h in response.json()] == [("e1", "A long walk by the river", [[7, 11]])]
+    match = pipelines[0][0]["$match"]
+    assert match["$text"] == {"$search": "walk -rain"} and match["mood"] == "calm" and "user_id" in match
+
+    response = api.get(f"/api/entries/search?q=walk&cursor={response.headers['X-Next-Cursor']}", headers=auth)
+
+    assert [h["highlights"] for h in response.json()] == [[[7, 11]], [[0, 7], [24, 29]]]
+    assert pipelines[1][2] == {"$match": server.keyset_filter(server.SEARCH_SORT, [2.0, "2024-01-01T00:00:00+00:00", "e1"])}
+
+
+def test_search_rejects_empty_queries_and_bad_cursors(api, auth):
+    empty = api.get("/api/entries/search?q=", headers=auth)
+    bad_cursor = api.get("/api/entries/search?q=walk&cursor=not-a-cursor", headers=auth)
+
+    assert empty.status_code == 422
+    assert bad_cursor.status_code == 400
+    assert bad_cursor.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,78 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from shared_state import MemoryState, MongoState, sliding_window
+
+
+pytestmark = pytest.mark.anyio
+
+
+def test_sliding_window_weights_the_previous_window():
+    # Halfway through the window, half of the previous 10 hits still count
+    result = sliding_window(previous=10, current=4, limit=10, window=60, now=30)
+    assert result.allowed
+    assert result.remaining == 1
+    assert result.reset == 30
+
+    result = sliding_window(previous=10, current=6, limit=10, window=60, now=30)
+    assert not result.allowed
+    assert result.remaining == 0
+    # One more hit fits once a tenth of the previous window has slid out
+    assert result.retry_after == pytest.approx(6)
+
+
+def test_sliding_window_over_limit_in_current_window_waits_for_the_next():
+    result = sliding_window(previous=0, current=11, limit=10, window=60, now=45)
+    assert not result.allowed
+    assert result.retry_after == 15
+
+
+async def build_state(backend):
+    if backend == "memory":
+        return MemoryState()
+    state = MongoState()
+    await state.start(AsyncMongoMockClient()["state"]["shared_state"])
+    return state
+
+
+@pytest.fixture(params=["memory", "mongodb"])
+def backend(request):
+    return request.param
+
+
+async def test_rejected_hits_are_not_counted(backend):
+    state = await build_state(backend)
+
+    results = [await state.hit("k", 1, limit=3, window=3600) for _ in range(5)]
+    big = await state.hit("k2", 5, limit=3, window=3600)
+    small = await state.hit("k2", 3, limit=3, window=3600)
+
+    assert [result.allowed for result in results] == [True, True, True, False, False]
+    assert results[-1].remaining == 0
+    assert not big.allowed
+    assert small.allowed
+
+
+async def test_values_expire_and_delete_by_prefix(backend):
+    state = await build_state(backend)
+    await state.set("stats:a:1", {"n": 1}, ttl=60)
+    await state.set("stats:b:1", {"n": 2}, ttl=60)
+    await state.set("other", 3, ttl=60)
+    await state.set("gone", 4, ttl=-1)
+
+    await state.delete_prefix("stats:a:")
+
+    assert await state.get("stats:a:1") is None
+    assert await state.get("stats:b:1") == {"n": 2}
+    assert await state.get("other") == 3
+    assert await state.get("gone", "default") == "default"
+
+
+async def test_lock_is_exclusive_until_released(backend):
+    state = await build_state(backend)
+
+    async with state.lock("indexes") as first:
+        async with state.lock("indexes") as second:
+            assert first and not second
+    async with state.lock("indexes") as again:
+        assert again
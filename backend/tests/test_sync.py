@@ -0,0 +1,113 @@
+import asyncio
+import uuid
+
+import pytest
+
+import server
+
+
+def sync_all(api, auth, since=0, limit=10):
+    seen = {"entries": [], "todos": [], "reminders": []}
+    deleted = {"entries": [], "todos": [], "reminders": []}
+    pages = 0
+    while True:
+        page = api.get(f"/api/sync?since={since}&limit={limit}", headers=auth).json()
+        for name in seen:
+            seen[name] += [doc["id"] for doc in page[name]]
+            deleted[name] += page["deleted"][name]
+        assert page["version"] > since or not page["has_more"]
+        since = page["version"]
+        pages += 1
+        if not page["has_more"]:
+            return seen, deleted, since, pages
+
+
+def user_id(api, auth):
+    return api.get("/api/auth/me", headers=auth).json()["id"]
+
+
+def test_pages_documents_written_before_change_tracking(api, auth):
+    owner = user_id(api, auth)
+    legacy = [{
+        "id": str(uuid.uuid4()),
+        "user_id": owner,
+        "title": f"Legacy {i}",
+        "content": f"legacy {i}",
+        "date": "2024-01-01",
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "updated_at": "2024-01-01T00:00:00+00:00",
+        "word_count": 2,
+    } for i in range(30)]
+    asyncio.run(server.db.entries.insert_many(legacy))
+
+    seen, _, _, pages = sync_all(api, auth)
+
+    assert sorted(seen["entries"]) == sorted(doc["id"] for doc in legacy)
+    assert pages >= 3
+
+
+def test_pages_a_bulk_insert_larger_than_a_page(api, auth):
+    _, _, since, _ = sync_all(api, auth)
+    response = api.post("/api/entries/bulk", headers=auth, json={
+        "operations": [{"op": "insert", "data": {"content": f"bulk {i}"}} for i in range(25)]
+    })
+    inserted = [result["id"] for result in response.json()["results"]]
+
+    seen, _, _, _ = sync_all(api, auth, since=since)
+
+    assert sorted(seen["entries"]) == sorted(inserted)
+
+
+def test_pages_bulk_deletes_and_mixed_collections(api, auth):
+    todos = api.post("/api/todos/bulk", headers=auth, json={
+        "operations": [{"op": "insert", "data": {"text": f"todo {i}"}} for i in range(12)]
+    }).json()["results"]
+    _, _, since, _ = sync_all(api, auth)
+
+    api.post("/api/todos/bulk", headers=auth, json={
+        "operations": [{"op": "delete", "id": todo["id"]} for todo in todos]
+    })
+    reminder = api.post("/api/reminders", headers=auth, json={"text": "call", "reminder_date": "2030-01-01"}).json()
+
+    seen, deleted, _, _ = sync_all(api, auth, since=since, limit=5)
+
+    assert sorted(deleted["todos"]) == sorted(todo["id"] for todo in todos)
+    assert seen["reminders"] == [reminder["id"]]
+
+
+def test_sync_is_empty_once_caught_up(api, auth):
+    api.post("/api/entries", headers=auth, json={"content": "hello"})
+    _, _, since, _ = sync_all(api, auth)
+
+    page = api.get(f"/api/sync?since={since}", headers=auth).json()
+
+    assert page["version"] == since
+    assert not page["has_more"]
+    assert page["entries"] == [] and page["deleted"]["entries"] == []
+
+
+@pytest.mark.anyio
+async def test_a_sync_during_a_slow_write_does_not_skip_it(api, monkeypatch):
+    owner = str(uuid.uuid4())
+    collection_type = type(server.db.entries)
+    insert_one = collection_type.insert_one
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_insert_one(self, document, *args, **kwargs):
+        if self.name == "entries":
+            started.set()
+            await release.wait()
+        return await insert_one(self, document, *args, **kwargs)
+
+    monkeypatch.setattr(collection_type, "insert_one", slow_insert_one)
+    write = asyncio.create_task(server.create_entry(server.EntryCreate(content="slow"), user_id=owner, services=api.app.state.services))
+    await started.wait()
+    todo = await server.create_todo(server.TodoCreate(text="quick"), user_id=owner, services=api.app.state.services)
+
+    first = await server.sync_changes(user_id=owner, since=0, limit=server.SYNC_MAX_CHANGES)
+    release.set()
+    entry = await write
+    second = await server.sync_changes(user_id=owner, since=first.version, limit=server.SYNC_MAX_CHANGES)
+
+    assert [doc.id for doc in first.todos] == [todo.id]
+    assert [doc.id for doc in first.entries + second.entries] == [entry.id]
@@ -0,0 +1,68 @@
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+import server
+from events import ChangeStreamRelay, EventBus
+
+
+def token(auth):
+    return auth["Authorization"].split(" ", 1)[1]
+
+
+def test_events_arrive_after_first_message_auth(api, auth):
+    with api.websocket_connect("/api/ws") as ws:
+        ws.send_json({"type": "auth", "token": token(auth)})
+        ws.send_text("ping")
+        assert ws.receive_text() == "pong"
+
+        todo = api.post("/api/todos", headers=auth, json={"text": "buy milk"}).json()
+
+        event = ws.receive_json()
+        assert event["type"] == "todo.created"
+        assert event["id"] == todo["id"]
+
+
+@pytest.mark.parametrize("message", [
+    '{"type": "auth", "token": "not-a-jwt"}',
+    '{"token": "missing-type"}',
+    "ping",
+])
+def test_rejects_anything_but_a_valid_auth_message(api, message):
+    with api.websocket_connect("/api/ws") as ws:
+        ws.send_text(message)
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_text()
+    assert closed.value.code == 1008
+
+
+def test_token_in_query_string_is_not_accepted(api, auth):
+    with api.websocket_connect(f"/api/ws?token={token(auth)}") as ws:
+        ws.send_text("ping")
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_text()
+    assert closed.value.code == 1008
+
+
+def test_logout_closes_an_open_connection(api, auth, monkeypatch):
+    monkeypatch.setattr(server, "WS_AUTH_RECHECK_SECONDS", 0.05)
+    with api.websocket_connect("/api/ws") as ws:
+        ws.send_json({"type": "auth", "token": token(auth)})
+        ws.send_text("ping")
+        assert ws.receive_text() == "pong"
+
+        api.post("/api/auth/logout", headers=auth)
+
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_text()
+    assert closed.value.code == 4401
+
+
+def test_sync_stamps_are_not_relayed_as_changes():
+    relay = ChangeStreamRelay(EventBus(), server.change_event)
+    doc = {"id": "t1", "user_id": "u1", "text": "x", "completed": False, "created_at": "2024-01-01T00:00:00+00:00", "version": 1}
+
+    stamped = relay.to_event("todo", {"operationType": "update", "fullDocument": doc, "updateDescription": {"updatedFields": {"sync_version": 7}}})
+    edited = relay.to_event("todo", {"operationType": "update", "fullDocument": doc, "updateDescription": {"updatedFields": {"text": "x", "sync_version": None}}})
+
+    assert stamped is None
+    assert edited[1]["type"] == "todo.updated"
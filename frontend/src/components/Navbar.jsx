@@ -1,13 +1,24 @@
 import React, { useState } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 import { BookOpen, BarChart3, CheckSquare, LogOut, Home, Menu, X } from 'lucide-react';
+import { API } from '../pages/App';
 
 const Navbar = ({ user, showBackToDashboard = false }) => {
   const navigate = useNavigate();
   const location = useLocation();
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    const token = localStorage.getItem('token');
+    try {
+      // Revoke the token server-side; logging out locally must not depend on it
+      await fetch(`${API}/auth/logout`, {
+        method: 'POST',
+        headers: { Authorization: `Bearer ${token}` },
+      });
+    } catch (error) {
+      // Ignore network errors
+    }
     localStorage.removeItem('token');
     window.location.href = '/';
   };
@@ -0,0 +1,56 @@
+import { useEffect, useRef } from 'react';
+import { API } from '../pages/App';
+
+const RECONNECT_DELAY = 3000;
+const PING_INTERVAL = 30000;
+
+// Subscribes to /api/ws and calls onEvent with each change event
+// ({ type: 'todo.updated', id, data }). Reconnects after drops.
+const useChangeEvents = (onEvent) => {
+  const handlerRef = useRef(onEvent);
+  handlerRef.current = onEvent;
+
+  useEffect(() => {
+    const token = localStorage.getItem('token');
+    if (!token) return undefined;
+
+    let socket;
+    let pingTimer;
+    let reconnectTimer;
+    let closed = false;
+
+    const connect = () => {
+      socket = new WebSocket(`${API.replace(/^http/, 'ws')}/ws`);
+      socket.onopen = () => {
+        // Sent as a message rather than ?token= so the JWT stays out of access logs
+        socket.send(JSON.stringify({ type: 'auth', token }));
+        pingTimer = setInterval(() => socket.send('ping'), PING_INTERVAL);
+      };
+      socket.onmessage = (message) => {
+        if (message.data === 'pong') return;
+        try {
+          handlerRef.current(JSON.parse(message.data));
+        } catch (error) {
+          console.error('Bad change event:', error);
+        }
+      };
+      socket.onclose = (event) => {
+        clearInterval(pingTimer);
+        // 1008: token rejected, retrying won't help
+        if (!closed && event.code !== 1008) {
+          reconnectTimer = setTimeout(connect, RECONNECT_DELAY);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearInterval(pingTimer);
+      clearTimeout(reconnectTimer);
+      socket.close();
+    };
+  }, []);
+};
+
+export default useChangeEvents;
@@ -153,7 +153,7 @@ const Dashboard = ({ user }) => {
     setAiLoading(true);
     try {
       const token = localStorage.getItem('token');
-      const response = await fetch(`${API}/ai/improve-text`, {
+      const response = await fetch(`${API}/ai/improve-text/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -162,10 +162,35 @@ const Dashboard = ({ user }) => {
         body: JSON.stringify({ text: content }),
       });
 
-      const data = await response.json();
-      if (!response.ok) throw new Error(data.detail || 'Failed to improve text');
+      if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.detail || 'Failed to improve text');
+      }
+
+      // Render the improved text as server-sent chunks arrive
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let improved = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const event of events) {
+          const isError = event.startsWith('event: error');
+          const dataLine = event.split('\n').find((line) => line.startsWith('data: '));
+          if (!dataLine) continue;
+          const data = JSON.parse(dataLine.slice(6));
+          if (isError) throw new Error(data.detail || 'Failed to improve text');
+          if (data.delta) {
+            improved += data.delta;
+            setContent(improved);
+          }
+        }
+      }
 
-      setContent(data.result);
       toast.success('Text improved!');
     } catch (error) {
       toast.error(error.message);
@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { useNavigate } from 'react-router-dom';
-import { BookOpen, Calendar, Trash2, Sparkles } from 'lucide-react';
+import { BookOpen, Calendar, Trash2, Sparkles, Search } from 'lucide-react';
 import { toast } from 'sonner';
 import { API } from './App';
 import { format } from 'date-fns';
@@ -14,15 +14,33 @@ const Entries = ({ user }) => {
   const [selectedEntry, setSelectedEntry] = useState(null);
   const [summary, setSummary] = useState('');
   const [summaryLoading, setSummaryLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const loadMoreRef = useRef(null);
+  const [query, setQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
 
   useEffect(() => {
     fetchEntries();
   }, []);
 
-  const fetchEntries = async () => {
+  // Load the next page when the sentinel below the list scrolls into view
+  useEffect(() => {
+    if (!nextCursor || !loadMoreRef.current) return;
+    const observer = new IntersectionObserver((observed) => {
+      if (observed[0].isIntersecting) fetchEntries(nextCursor);
+    });
+    observer.observe(loadMoreRef.current);
+    return () => observer.disconnect();
+  }, [nextCursor]);
+
+  const fetchEntries = async (cursor = null) => {
+    if (cursor) setLoadingMore(true);
     try {
       const token = localStorage.getItem('token');
-      const response = await fetch(`${API}/entries`, {
+      const params = new URLSearchParams({ limit: '20', fields: 'preview' });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${API}/entries?${params}`, {
         headers: {
           Authorization: `Bearer ${token}`,
         },
@@ -31,11 +49,71 @@ const Entries = ({ user }) => {
       if (!response.ok) throw new Error('Failed to fetch entries');
 
       const data = await response.json();
-      setEntries(data);
+      setEntries((current) => (cursor ? [...current, ...data] : data));
+      setNextCursor(response.headers.get('X-Next-Cursor'));
     } catch (error) {
       toast.error(error.message);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
+    }
+  };
+
+  // Debounced full-text search; clearing the box returns to the paged list
+  useEffect(() => {
+    if (!query.trim()) {
+      setSearchResults(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const token = localStorage.getItem('token');
+        const response = await fetch(`${API}/entries/search?q=${encodeURIComponent(query.trim())}`, {
+          headers: {
+            Authorization: `Bearer ${token}`,
+          },
+        });
+
+        if (!response.ok) throw new Error('Search failed');
+
+        setSearchResults(await response.json());
+      } catch (error) {
+        toast.error(error.message);
+      }
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [query]);
+
+  const renderSnippet = (hit) => {
+    const parts = [];
+    let last = 0;
+    hit.highlights.forEach(([start, end]) => {
+      parts.push(hit.snippet.slice(last, start));
+      parts.push(<mark key={start} className="bg-[#F5F5DC] text-[#3E2723]">{hit.snippet.slice(start, end)}</mark>);
+      last = end;
+    });
+    parts.push(hit.snippet.slice(last));
+    return parts;
+  };
+
+  // List items only carry a preview, so fetch the full entry when one is opened
+  const handleSelect = async (entry) => {
+    setSelectedEntry(entry);
+    setSummary('');
+    try {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`${API}/entries/${entry.id}`, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      });
+
+      if (!response.ok) throw new Error('Failed to load entry');
+
+      const data = await response.json();
+      setSelectedEntry((current) => (current?.id === data.id ? data : current));
+    } catch (error) {
+      toast.error(error.message);
     }
   };
 
@@ -115,14 +193,25 @@ const Entries = ({ user }) => {
           <div className="grid lg:grid-cols-3 gap-8">
             {/* Entries List */}
             <div className="lg:col-span-1 space-y-4">
-              {entries.map((entry) => (
+              <div className="flex items-center gap-2 bg-white px-4 py-3 rounded-sm shadow-md border border-[#EFE6D5]">
+                <Search className="w-5 h-5 text-[#A1887F]" />
+                <input
+                  data-testid="search-entries-input"
+                  type="text"
+                  value={query}
+                  onChange={(e) => setQuery(e.target.value)}
+                  placeholder="Search your entries..."
+                  className="flex-1 bg-transparent focus:outline-none font-serif text-[#3E2723]"
+                />
+              </div>
+              {searchResults && searchResults.length === 0 && (
+                <p className="text-center text-[#5D4037]">No entries match your search.</p>
+              )}
+              {(searchResults ?? entries).map((entry) => (
                 <motion.div
                   key={entry.id}
                   whileHover={{ y: -2 }}
-                  onClick={() => {
-                    setSelectedEntry(entry);
-                    setSummary('');
-                  }}
+                  onClick={() => handleSelect(entry)}
                   className={`bg-white p-6 rounded-sm shadow-md border cursor-pointer transition-all ${
                     selectedEntry?.id === entry.id ? 'border-[#C5A059] border-2' : 'border-[#EFE6D5]'
                   }`}
@@ -142,13 +231,18 @@ const Entries = ({ user }) => {
                     {format(new Date(entry.date), 'MMM dd, yyyy')}
                   </p>
                   <p className="text-[#5D4037] text-sm line-clamp-3">
-                    {entry.content}
+                    {entry.snippet !== undefined ? renderSnippet(entry) : entry.preview}
                   </p>
                   <div className="mt-3 text-xs text-[#A1887F]">
                     {entry.word_count} words
                   </div>
                 </motion.div>
               ))}
+              {nextCursor && !searchResults && (
+                <div ref={loadMoreRef} className="text-center text-sm text-[#A1887F] py-4">
+                  {loadingMore ? 'Loading more entries...' : ''}
+                </div>
+              )}
             </div>
 
             {/* Entry Detail */}
@@ -188,7 +282,7 @@ const Entries = ({ user }) => {
 
                   <div className="prose max-w-none mb-8">
                     <p className="text-lg text-[#2C2C2C] leading-loose whitespace-pre-wrap" style={{ fontFamily: 'Crimson Text, serif' }}>
-                      {selectedEntry.content}
+                      {selectedEntry.content ?? selectedEntry.preview}
                     </p>
                   </div>
 
@@ -197,7 +291,7 @@ const Entries = ({ user }) => {
                       <button
                         data-testid="summarize-entry-btn"
                         onClick={() => handleSummarize(selectedEntry)}
-                        disabled={summaryLoading}
+                        disabled={summaryLoading || selectedEntry.content === undefined}
                         className="flex items-center gap-2 bg-[#C5A059] text-white px-6 py-3 rounded-full hover:bg-[#5D4037] transition-colors font-serif disabled:opacity-50"
                       >
                         <Sparkles className="w-5 h-5" />
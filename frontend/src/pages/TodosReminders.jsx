@@ -6,6 +6,7 @@ import { toast } from 'sonner';
 import { API } from './App';
 import { format } from 'date-fns';
 import Navbar from '../components/Navbar';
+import useChangeEvents from '../hooks/useChangeEvents';
 
 const TodosReminders = ({ user }) => {
   const navigate = useNavigate();
@@ -15,11 +16,39 @@ const TodosReminders = ({ user }) => {
   const [loading, setLoading] = useState(true);
   const [newTodo, setNewTodo] = useState('');
   const [newReminder, setNewReminder] = useState({ text: '', date: '' });
+  const [todosCursor, setTodosCursor] = useState(null);
+  const [remindersCursor, setRemindersCursor] = useState(null);
+  const [pendingCounts, setPendingCounts] = useState({ todos: 0, reminders: 0 });
 
   useEffect(() => {
     fetchData();
   }, []);
 
+  // Changes made elsewhere (other tabs, AI extraction, reminders coming due) patch the lists in place
+  useChangeEvents((event) => {
+    const [kind, action] = event.type.split('.');
+    if (event.type === 'resync' || event.type === 'import.completed') {
+      fetchData();
+      return;
+    }
+    if (action === 'due') {
+      toast.info(`Reminder: ${event.data.text}`);
+      return;
+    }
+    const setItems = kind === 'todo' ? setTodos : kind === 'reminder' ? setReminders : null;
+    if (!setItems) return;
+
+    setItems((items) => {
+      if (action === 'deleted') return items.filter((item) => item.id !== event.id);
+      if (items.some((item) => item.id === event.id)) {
+        // Keep whichever copy is newer; our own PUT responses may arrive after the event
+        return items.map((item) => (item.id === event.id && event.data.version >= (item.version || 0) ? event.data : item));
+      }
+      return action === 'created' ? [event.data, ...items] : items;
+    });
+    fetchCounts();
+  });
+
   const fetchData = async () => {
     try {
       const token = localStorage.getItem('token');
@@ -27,6 +56,7 @@ const TodosReminders = ({ user }) => {
       const [todosRes, remindersRes] = await Promise.all([
         fetch(`${API}/todos`, { headers: { Authorization: `Bearer ${token}` } }),
         fetch(`${API}/reminders`, { headers: { Authorization: `Bearer ${token}` } }),
+        fetchCounts(),
       ]);
 
       if (!todosRes.ok || !remindersRes.ok) throw new Error('Failed to fetch data');
@@ -36,6 +66,8 @@ const TodosReminders = ({ user }) => {
 
       setTodos(todosData);
       setReminders(remindersData);
+      setTodosCursor(todosRes.headers.get('X-Next-Cursor'));
+      setRemindersCursor(remindersRes.headers.get('X-Next-Cursor'));
     } catch (error) {
       toast.error(error.message);
     } finally {
@@ -43,6 +75,48 @@ const TodosReminders = ({ user }) => {
     }
   };
 
+  // Tab badges come from the counts endpoints, since lists are paged
+  const fetchCounts = async () => {
+    try {
+      const token = localStorage.getItem('token');
+      const [todoCountsRes, reminderCountsRes] = await Promise.all([
+        fetch(`${API}/todos/counts`, { headers: { Authorization: `Bearer ${token}` } }),
+        fetch(`${API}/reminders/counts`, { headers: { Authorization: `Bearer ${token}` } }),
+      ]);
+      if (!todoCountsRes.ok || !reminderCountsRes.ok) return;
+
+      const todoCounts = await todoCountsRes.json();
+      const reminderCounts = await reminderCountsRes.json();
+      setPendingCounts({ todos: todoCounts.pending, reminders: reminderCounts.pending });
+    } catch (error) {
+      // Badges are best-effort
+    }
+  };
+
+  const handleLoadMore = async (kind) => {
+    const cursor = kind === 'todos' ? todosCursor : remindersCursor;
+    try {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`${API}/${kind}?cursor=${encodeURIComponent(cursor)}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+
+      if (!response.ok) throw new Error(`Failed to load more ${kind}`);
+
+      const data = await response.json();
+      const nextCursor = response.headers.get('X-Next-Cursor');
+      if (kind === 'todos') {
+        setTodos((current) => [...current, ...data]);
+        setTodosCursor(nextCursor);
+      } else {
+        setReminders((current) => [...current, ...data]);
+        setRemindersCursor(nextCursor);
+      }
+    } catch (error) {
+      toast.error(error.message);
+    }
+  };
+
   const handleAddTodo = async () => {
     if (!newTodo.trim()) return;
 
@@ -61,6 +135,7 @@ const TodosReminders = ({ user }) => {
 
       const data = await response.json();
       setTodos([data, ...todos]);
+      fetchCounts();
       setNewTodo('');
       toast.success('To-do added!');
     } catch (error) {
@@ -84,6 +159,7 @@ const TodosReminders = ({ user }) => {
 
       const updated = await response.json();
       setTodos(todos.map((t) => (t.id === todo.id ? updated : t)));
+      fetchCounts();
     } catch (error) {
       toast.error(error.message);
     }
@@ -100,6 +176,7 @@ const TodosReminders = ({ user }) => {
       if (!response.ok) throw new Error('Failed to delete todo');
 
       setTodos(todos.filter((t) => t.id !== todoId));
+      fetchCounts();
       toast.success('To-do deleted');
     } catch (error) {
       toast.error(error.message);
@@ -120,13 +197,15 @@ const TodosReminders = ({ user }) => {
           'Content-Type': 'application/json',
           Authorization: `Bearer ${token}`,
         },
-        body: JSON.stringify({ text: newReminder.text, reminder_date: newReminder.date }),
+        // datetime-local values have no offset; send the UTC instant
+        body: JSON.stringify({ text: newReminder.text, reminder_date: new Date(newReminder.date).toISOString() }),
       });
 
       if (!response.ok) throw new Error('Failed to add reminder');
 
       const data = await response.json();
       setReminders([data, ...reminders]);
+      fetchCounts();
       setNewReminder({ text: '', date: '' });
       toast.success('Reminder added!');
     } catch (error) {
@@ -150,6 +229,7 @@ const TodosReminders = ({ user }) => {
 
       const updated = await response.json();
       setReminders(reminders.map((r) => (r.id === reminder.id ? updated : r)));
+      fetchCounts();
     } catch (error) {
       toast.error(error.message);
     }
@@ -166,6 +246,7 @@ const TodosReminders = ({ user }) => {
       if (!response.ok) throw new Error('Failed to delete reminder');
 
       setReminders(reminders.filter((r) => r.id !== reminderId));
+      fetchCounts();
       toast.success('Reminder deleted');
     } catch (error) {
       toast.error(error.message);
@@ -194,7 +275,7 @@ const TodosReminders = ({ user }) => {
                   : 'bg-white text-[#3E2723] border border-[#3E2723] hover:bg-[#3E2723] hover:text-white'
               }`}
             >
-              To-dos ({todos.filter(t => !t.completed).length})
+              To-dos ({pendingCounts.todos})
             </button>
             <button
               data-testid="reminders-tab-btn"
@@ -205,7 +286,7 @@ const TodosReminders = ({ user }) => {
                   : 'bg-white text-[#3E2723] border border-[#3E2723] hover:bg-[#3E2723] hover:text-white'
               }`}
             >
-              Reminders ({reminders.filter(r => !r.completed).length})
+              Reminders ({pendingCounts.reminders})
             </button>
           </div>
 
@@ -272,6 +353,15 @@ const TodosReminders = ({ user }) => {
                     </motion.div>
                   ))
                 )}
+                {todosCursor && (
+                  <button
+                    data-testid="load-more-todos-btn"
+                    onClick={() => handleLoadMore('todos')}
+                    className="w-full py-3 text-[#3E2723] font-serif hover:text-[#C5A059] transition-colors"
+                  >
+                    Load more
+                  </button>
+                )}
               </div>
             </div>
           ) : (
@@ -349,6 +439,15 @@ const TodosReminders = ({ user }) => {
                     </motion.div>
                   ))
                 )}
+                {remindersCursor && (
+                  <button
+                    data-testid="load-more-reminders-btn"
+                    onClick={() => handleLoadMore('reminders')}
+                    className="w-full py-3 text-[#3E2723] font-serif hover:text-[#C5A059] transition-colors"
+                  >
+                    Load more
+                  </button>
+                )}
               </div>
             </div>
           )}